@@ -34,6 +34,79 @@ class Config:
     # Parking Configuration
     DEFAULT_PARKING_RATE = float(os.getenv('DEFAULT_PARKING_RATE', 100.0))  # per hour
     GRACE_PERIOD_MINUTES = int(os.getenv('GRACE_PERIOD_MINUTES', 10))
+    # Overtime payment intents older than this are re-issued at the current amount
+    OVERTIME_INTENT_REFRESH_MINUTES = int(os.getenv('OVERTIME_INTENT_REFRESH_MINUTES', 30))
+    RECURRING_MAX_OCCURRENCES = int(os.getenv('RECURRING_MAX_OCCURRENCES', 100))
+    BULK_BOOKING_MAX_CARS = int(os.getenv('BULK_BOOKING_MAX_CARS', 100))
+    # Times a bulk booking reallocates when a concurrent request claims one of its slots first
+    BULK_BOOKING_CLAIM_ATTEMPTS = int(os.getenv('BULK_BOOKING_CLAIM_ATTEMPTS', 3))
+    # Read availability from bookings_by_day. Writes always keep the partitions current, so
+    # deploy, run scripts/backfill_booking_partitions.py, and only then set this to true
+    BOOKING_PARTITIONS_ENABLED = os.getenv('BOOKING_PARTITIONS_ENABLED', 'false').lower() == 'true'
+    
+    # Maintenance Configuration
+    PENDING_PAYMENT_TIMEOUT_MINUTES = int(os.getenv('PENDING_PAYMENT_TIMEOUT_MINUTES', 30))
+    ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', 30))
+    ARCHIVE_TARGET = os.getenv('ARCHIVE_TARGET', 'rtdb')  # 'rtdb' or 'local'
+    ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', 'archive')
+    MAINTENANCE_BATCH_SIZE = int(os.getenv('MAINTENANCE_BATCH_SIZE', 500))
+    MAINTENANCE_INTERVAL_SECONDS = int(os.getenv('MAINTENANCE_INTERVAL_SECONDS', 900))
+    
+    # Payment reconciliation: pending payments older than this are checked with Paystack. Checkouts
+    # stay open until the pending timeout, so checking earlier only finds them still in progress
+    RECONCILE_AFTER_MINUTES = int(os.getenv('RECONCILE_AFTER_MINUTES', PENDING_PAYMENT_TIMEOUT_MINUTES))
+    RECONCILE_WORKERS = int(os.getenv('RECONCILE_WORKERS', 4))
+    PAYSTACK_RATE_LIMIT_PER_SECOND = float(os.getenv('PAYSTACK_RATE_LIMIT_PER_SECOND', 5))
+    
+    # Slot catalog cache lifetime; slot changes made through this process reload it at once
+    SLOT_CATALOG_TTL_SECONDS = int(os.getenv('SLOT_CATALOG_TTL_SECONDS', 60))
+    # Slots are reread when the slots_version stamp moves; every API write bumps it. This is only a
+    # backstop for edits made outside the API that skip the stamp: run scripts/bump_slots_version.py
+    # after those to have them picked up within the TTL
+    SLOT_CATALOG_MAX_AGE_SECONDS = int(os.getenv('SLOT_CATALOG_MAX_AGE_SECONDS', 86400))
+    # Warm caches are checkpointed here so recycled workers start warm; empty disables it
+    CACHE_SNAPSHOT_DIR = os.getenv('CACHE_SNAPSHOT_DIR', '/tmp/parking-api-cache')
+    CACHE_SNAPSHOT_INTERVAL_SECONDS = int(os.getenv('CACHE_SNAPSHOT_INTERVAL_SECONDS', 300))
+    # SQLite file shared by all workers on a host; empty keeps every cache per process
+    SHARED_CACHE_PATH = os.getenv('SHARED_CACHE_PATH', '/tmp/parking-api-cache/shared.sqlite3')
+    SHARED_CACHE_TIMEOUT_SECONDS = float(os.getenv('SHARED_CACHE_TIMEOUT_SECONDS', 1.0))
+    SPATIAL_CELL_METERS = float(os.getenv('SPATIAL_CELL_METERS', 500))
+    DEFAULT_SEARCH_RADIUS_METERS = float(os.getenv('DEFAULT_SEARCH_RADIUS_METERS', 2000))
+    MAX_SEARCH_RADIUS_METERS = float(os.getenv('MAX_SEARCH_RADIUS_METERS', 50000))
+    
+    # Occupancy sensors authenticate with X-Sensor-Key. Debouncing is per process, so sensors
+    # must post to a single process (WEB_CONCURRENCY=1 on the instance that ingests)
+    SENSOR_API_KEY = os.getenv('SENSOR_API_KEY')
+    SENSOR_DEBOUNCE_SECONDS = float(os.getenv('SENSOR_DEBOUNCE_SECONDS', 5))
+    SENSOR_FLUSH_INTERVAL_SECONDS = float(os.getenv('SENSOR_FLUSH_INTERVAL_SECONDS', 2))
+    SENSOR_MAX_READINGS = int(os.getenv('SENSOR_MAX_READINGS', 1000))
+    
+    # Live events (/parking/events)
+    SSE_HEARTBEAT_SECONDS = float(os.getenv('SSE_HEARTBEAT_SECONDS', 15))
+    SSE_QUEUE_SIZE = int(os.getenv('SSE_QUEUE_SIZE', 100))
+    SSE_HISTORY_SIZE = int(os.getenv('SSE_HISTORY_SIZE', 256))
+    SSE_MAX_SUBSCRIBERS = int(os.getenv('SSE_MAX_SUBSCRIBERS', 200))
+    # Streams end after this long so worker threads are recycled; clients reconnect with Last-Event-ID
+    SSE_MAX_STREAM_SECONDS = int(os.getenv('SSE_MAX_STREAM_SECONDS', 300))
+    
+    # Pagination
+    PAGE_SIZE_DEFAULT = int(os.getenv('PAGE_SIZE_DEFAULT', 50))
+    PAGE_SIZE_MAX = int(os.getenv('PAGE_SIZE_MAX', 500))
+    
+    # Reverse proxies in front of the app (Render has one). The client address is read from the
+    # X-Forwarded-For entries they appended; 0 ignores the header
+    TRUSTED_PROXY_HOPS = int(os.getenv('TRUSTED_PROXY_HOPS', 1))
+    
+    # Parking Lot Configuration
+    DEFAULT_LOT_ID = os.getenv('DEFAULT_LOT_ID', '')  # empty = original flat layout at the root
+    # Lots handled by this instance, comma separated ('default' for the root lot); empty = all
+    SERVED_LOTS = [lot.strip() for lot in os.getenv('SERVED_LOTS', '').split(',') if lot.strip()]
+    # How long registered lot IDs are cached when checking the lot a request names
+    LOT_REGISTRY_TTL_SECONDS = int(os.getenv('LOT_REGISTRY_TTL_SECONDS', 60))
+    
+    # Admin access: these user IDs plus users flagged is_admin in the database
+    ADMIN_USER_IDS = [user.strip() for user in os.getenv('ADMIN_USER_IDS', '').split(',') if user.strip()]
+    EXPORT_PAGE_SIZE = int(os.getenv('EXPORT_PAGE_SIZE', 500))
     
     # CORS Configuration - Enhanced for your Vercel frontend
     ALLOWED_ORIGINS_ENV = os.getenv('ALLOWED_ORIGINS', 'https://pes-park.vercel.app,http://localhost:3000,http://localhost:3001')
@@ -43,6 +116,60 @@ class Config:
     # Logging Configuration
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
     LOG_FILE_PATH = os.getenv('LOG_FILE_PATH', 'logs/app.log')
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')  # 'json' or 'text'
+    LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))
+    # Share of requests given an access log line; errors and slow requests are always logged
+    ACCESS_LOG_SAMPLE_RATE = float(os.getenv('ACCESS_LOG_SAMPLE_RATE', 1.0))
+    # Per-endpoint overrides, e.g. "health_check=0.01,parking.validate_qr=1"
+    ACCESS_LOG_ROUTE_SAMPLE_RATES = os.getenv('ACCESS_LOG_ROUTE_SAMPLE_RATES', 'health_check=0.01')
+    ACCESS_LOG_SLOW_MS = float(os.getenv('ACCESS_LOG_SLOW_MS', 1000))
+
+    # Metrics: /metrics asks for this bearer token when set
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+    
+    # Request tracing of Firebase, Paystack and QR calls
+    TRACE_SERVER_TIMING = os.getenv('TRACE_SERVER_TIMING', 'true').lower() == 'true'
+    # Allow X-Debug-Trace requests to get the per-operation summary outside debug mode
+    TRACE_DEBUG_HEADER = os.getenv('TRACE_DEBUG_HEADER', 'false').lower() == 'true'
+    TRACE_MEASURE_BYTES = os.getenv('TRACE_MEASURE_BYTES', 'true').lower() == 'true'
+    TRACE_LOG_CALLS = int(os.getenv('TRACE_LOG_CALLS', 25))
+    TRACE_LOG_BYTES = int(os.getenv('TRACE_LOG_BYTES', 1000000))
+    
+    # Profiling: admins can send X-Profile: cpu on any request; these sample the rest
+    PROFILE_DIR = os.getenv('PROFILE_DIR', 'logs/profiles')
+    PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+    # Endpoints the sample is drawn from; empty samples every endpoint
+    PROFILE_ENDPOINTS = os.getenv('PROFILE_ENDPOINTS', 'booking.get_available_slots,payment.payment_callback')
+    # Trace allocations from startup instead of from the first memory snapshot
+    PROFILE_TRACEMALLOC = os.getenv('PROFILE_TRACEMALLOC', 'false').lower() == 'true'
+    PROFILE_TRACEMALLOC_FRAMES = int(os.getenv('PROFILE_TRACEMALLOC_FRAMES', 10))
+    
+    # Admission control: requests handled at once per worker, defaulting to its thread count
+    ADMISSION_ENABLED = os.getenv('ADMISSION_ENABLED', 'true').lower() == 'true'
+    ADMISSION_MAX_IN_FLIGHT = int(os.getenv('ADMISSION_MAX_IN_FLIGHT', os.getenv('GUNICORN_THREADS', 8)))
+    # Slots only gate validation and sensors may use, so browsing can't starve the barriers
+    ADMISSION_GATE_RESERVE = int(os.getenv('ADMISSION_GATE_RESERVE', 2))
+    # Concurrency budget per route class (gate, stream, admin, write, browse); raise stream under gevent.
+    # Streams have their own pool outside ADMISSION_MAX_IN_FLIGHT, served by GUNICORN_STREAM_THREADS
+    ADMISSION_CLASS_LIMITS = os.getenv('ADMISSION_CLASS_LIMITS', 'gate=8,stream=4,admin=2,write=4,browse=4')
+    # Per-client token bucket: sustained requests per second and burst size
+    ADMISSION_CLIENT_RATE = float(os.getenv('ADMISSION_CLIENT_RATE', 5))
+    ADMISSION_CLIENT_BURST = float(os.getenv('ADMISSION_CLIENT_BURST', 20))
+    ADMISSION_MAX_CLIENTS = int(os.getenv('ADMISSION_MAX_CLIENTS', 10000))
+    ADMISSION_RETRY_AFTER_SECONDS = int(os.getenv('ADMISSION_RETRY_AFTER_SECONDS', 1))
+    
+    # Request deadlines: time budget per request, shared by its Firebase and Paystack calls
+    DEADLINE_DEFAULT_SECONDS = float(os.getenv('DEADLINE_DEFAULT_SECONDS', 15))
+    # Per-endpoint overrides; 0 disables the deadline (live streams, exports)
+    DEADLINE_ROUTE_SECONDS = os.getenv(
+        'DEADLINE_ROUTE_SECONDS',
+        'parking.validate_qr=5,parking.ingest_occupancy=5,booking.get_available_slots=8,'
+        'payment.payment_callback=25,parking.slot_events=0,admin.export_records=0'
+    )
+    # Floor for budgets clients ask for with X-Request-Timeout
+    DEADLINE_MIN_SECONDS = float(os.getenv('DEADLINE_MIN_SECONDS', 1))
+    # Upper bound on any single RTDB call, which the SDK can't take per call
+    FIREBASE_HTTP_TIMEOUT_SECONDS = float(os.getenv('FIREBASE_HTTP_TIMEOUT_SECONDS', 30))
 
     # URLs
     FRONTEND_URL = os.environ.get('FRONTEND_URL', 'https://pes-park.vercel.app')
\ No newline at end of file
@@ -0,0 +1,49 @@
+"""Gunicorn settings; command line flags take precedence over these.
+
+Almost all request time is spent waiting on Firebase and Paystack, so
+workers run concurrent requests instead of one at a time:
+
+- gthread (default): GUNICORN_THREADS requests per worker on OS threads,
+  plus GUNICORN_STREAM_THREADS for /parking/events streams, which hold a
+  thread for up to SSE_MAX_STREAM_SECONDS. Keep the latter equal to the
+  stream budget in ADMISSION_CLASS_LIMITS, so open streams never take the
+  threads short requests are admitted against.
+- gevent: GUNICORN_WORKER_CONNECTIONS greenlets per worker, cheap enough
+  for many live streams. The worker monkey-patches the standard library
+  before the app is imported.
+- sync: the old one-request-per-worker mode, kept for debugging.
+"""
+import os
+import shutil
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+workers = int(os.getenv('WEB_CONCURRENCY', 1))
+threads = int(os.getenv('GUNICORN_THREADS', 8)) + int(os.getenv('GUNICORN_STREAM_THREADS', 4))
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 200))
+
+# Workers no longer block on a slow backend, so a stuck worker can be detected much sooner
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+# Recycle workers to bound memory growth; jitter keeps them from restarting together
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+accesslog = '-'
+errorlog = '-'
+
+# Workers share metrics through files in this directory (prometheus_client multiprocess mode).
+# It has to be set before the app, and so prometheus_client, is imported by a worker.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/parking-api-metrics')
+
+def on_starting(server):
+    # Samples from a previous run would otherwise be added to this one's
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -1,6 +1,8 @@
 from functools import wraps
+import hmac
 from flask import request, jsonify, g
 from services.auth_service import AuthService
+from config import Config
 import logging
 
 logger = logging.getLogger(__name__)
@@ -26,4 +28,32 @@ def token_required(f):
         
         return f(*args, **kwargs)
     
-    return decorated
\ No newline at end of file
+    return decorated
+
+def admin_required(f):
+    @wraps(f)
+    @token_required
+    def decorated(*args, **kwargs):
+        try:
+            if not AuthService().is_admin(g.current_user_id):
+                return jsonify({'error': 'Admin access required'}), 403
+        except Exception as e:
+            logger.error(f"Admin check error: {str(e)}")
+            return jsonify({'error': 'Authorization failed'}), 403
+        
+        return f(*args, **kwargs)
+    
+    return decorated
+
+def sensor_key_required(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        key = request.headers.get('X-Sensor-Key', '')
+        
+        # Without a configured key sensor endpoints stay closed
+        if not Config.SENSOR_API_KEY or not hmac.compare_digest(key, Config.SENSOR_API_KEY):
+            return jsonify({'error': 'Invalid sensor key'}), 401
+        
+        return f(*args, **kwargs)
+    
+    return decorated
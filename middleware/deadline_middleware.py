@@ -0,0 +1,73 @@
+from flask import g, jsonify, request
+from utils.deadline import end_deadline, start_deadline
+from config import Config
+import logging
+
+logger = logging.getLogger(__name__)
+
+def _route_deadlines():
+    """Per-endpoint budgets in seconds from DEADLINE_ROUTE_SECONDS; 0 means no deadline"""
+    deadlines = {}
+    for item in Config.DEADLINE_ROUTE_SECONDS.split(','):
+        if '=' in item:
+            endpoint, seconds = item.split('=', 1)
+            deadlines[endpoint.strip()] = float(seconds)
+    return deadlines
+
+def request_budget(route_seconds):
+    """Budget of the current request; a client's X-Request-Timeout can only shorten it"""
+    requested = request.headers.get('X-Request-Timeout')
+    if not requested:
+        return route_seconds
+    try:
+        seconds = float(requested)
+    except ValueError:
+        return route_seconds
+    return min(route_seconds, max(seconds, Config.DEADLINE_MIN_SECONDS))
+
+def register_deadlines(app):
+    """Give every request a time budget that Firebase and Paystack calls draw from
+
+    Outbound calls check the budget before they start (see track_backend),
+    and Paystack timeouts are cut to what is left. A request that runs out
+    is answered with 504 instead of holding its worker until a client that
+    has long given up.
+    """
+    route_deadlines = _route_deadlines()
+
+    @app.before_request
+    def start_request_deadline():
+        seconds = route_deadlines.get(request.endpoint, Config.DEADLINE_DEFAULT_SECONDS)
+        if seconds <= 0:
+            return
+        g.deadline, g.deadline_token = start_deadline(request_budget(seconds))
+
+    @app.after_request
+    def enforce_request_deadline(response):
+        deadline = g.get('deadline')
+        if deadline is None:
+            return response
+
+        # A streamed body has started; its own limits (page sizes, stream duration) apply from here
+        if response.is_streamed:
+            deadline.lift()
+            return response
+
+        # The handler caught DeadlineExceeded as a generic failure; report it as what it was
+        if deadline.exceeded_by and response.status_code >= 400:
+            logger.warning(
+                f"Deadline of {deadline.budget:g}s exceeded on {request.method} {request.path} before {deadline.exceeded_by}",
+                extra={'fields': {'endpoint': request.endpoint, 'budget_seconds': deadline.budget,
+                                  'exceeded_by': deadline.exceeded_by}}
+            )
+            # Rewritten in place so headers other hooks already added (CORS, tracing) stay
+            response.set_data(jsonify({'error': 'Request deadline exceeded'}).get_data())
+            response.mimetype = 'application/json'
+            response.status_code = 504
+        return response
+
+    @app.teardown_request
+    def finish_request_deadline(error=None):
+        token = g.pop('deadline_token', None)
+        if token is not None:
+            end_deadline(token)
@@ -1,4 +1,5 @@
 from flask import jsonify
+from utils.deadline import DeadlineExceeded
 import logging
 
 logger = logging.getLogger(__name__)
@@ -21,6 +22,10 @@ def register_error_handlers(app):
         logger.error(f"Internal error: {str(error)}")
         return jsonify({'error': 'Internal server error'}), 500
     
+    @app.errorhandler(DeadlineExceeded)
+    def deadline_exceeded(error):
+        return jsonify({'error': 'Request deadline exceeded'}), 504
+    
     @app.errorhandler(Exception)
     def handle_exception(e):
         logger.error(f"Unhandled exception: {str(e)}")
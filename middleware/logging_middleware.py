@@ -1,26 +1,137 @@
+import atexit
+import datetime
+import json
 import logging
 import os
-from logging.handlers import RotatingFileHandler
+import queue
+import random
+import sys
+import time
+import uuid
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from flask import g, has_request_context, request
 from config import Config
 
+access_logger = logging.getLogger('access')
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with any `fields` passed through `extra`"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.datetime.utcfromtimestamp(record.created).isoformat(timespec='milliseconds') + 'Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        if getattr(record, 'request_id', None):
+            entry['request_id'] = record.request_id
+        entry.update(getattr(record, 'fields', None) or {})
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class RequestContextFilter(logging.Filter):
+    """Stamp records with the current request's ID while still on the request thread"""
+
+    def filter(self, record):
+        if not hasattr(record, 'request_id'):
+            record.request_id = g.get('request_id') if has_request_context() else None
+        return True
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+def _route_sample_rates():
+    """Per-endpoint access log sample rates from ACCESS_LOG_ROUTE_SAMPLE_RATES"""
+    rates = {}
+    for item in Config.ACCESS_LOG_ROUTE_SAMPLE_RATES.split(','):
+        if '=' in item:
+            endpoint, rate = item.split('=', 1)
+            rates[endpoint.strip()] = float(rate)
+    return rates
+
+def _build_formatter():
+    if Config.LOG_FORMAT == 'json':
+        return JsonFormatter()
+    return logging.Formatter('%(asctime)s %(levelname)s %(name)s [%(request_id)s]: %(message)s')
+
 def setup_logging(app):
-    if not app.debug:
+    """Send all logging through a queue drained by a background thread, and log each request once"""
+    formatter = _build_formatter()
+    handlers = []
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(formatter)
+    handlers.append(stream_handler)
+
+    if not app.debug and Config.LOG_FILE_PATH:
         # Create logs directory if it doesn't exist
         log_dir = os.path.dirname(Config.LOG_FILE_PATH)
         if log_dir and not os.path.exists(log_dir):
             os.makedirs(log_dir)
-        
-        # Setup file handler
-        file_handler = RotatingFileHandler(
-            Config.LOG_FILE_PATH, 
-            maxBytes=10240000, 
-            backupCount=10
-        )
-        file_handler.setFormatter(logging.Formatter(
-            '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
-        ))
-        file_handler.setLevel(getattr(logging, Config.LOG_LEVEL))
-        
-        app.logger.addHandler(file_handler)
-        app.logger.setLevel(getattr(logging, Config.LOG_LEVEL))
-        app.logger.info('Parking API startup')
\ No newline at end of file
+
+        file_handler = RotatingFileHandler(Config.LOG_FILE_PATH, maxBytes=10240000, backupCount=10)
+        file_handler.setFormatter(formatter)
+        handlers.append(file_handler)
+
+    # Request threads only enqueue; formatting and I/O happen on the listener thread
+    queue_handler = DroppingQueueHandler(queue.Queue(maxsize=Config.LOG_QUEUE_SIZE))
+    queue_handler.addFilter(RequestContextFilter())
+    listener = QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, DroppingQueueHandler):
+            root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(getattr(logging, Config.LOG_LEVEL))
+
+    app.logger.handlers = []
+    app.logger.propagate = True
+    app.extensions['log_listener'] = listener
+
+    route_rates = _route_sample_rates()
+
+    @app.before_request
+    def start_request_log():
+        g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def write_access_log(response):
+        started = g.get('request_started')
+        duration_ms = round((time.perf_counter() - started) * 1000, 2) if started else None
+        response.headers['X-Request-ID'] = g.get('request_id', '')
+
+        # Errors and slow requests are always kept; the rest is sampled per endpoint
+        rate = route_rates.get(request.endpoint or '', Config.ACCESS_LOG_SAMPLE_RATE)
+        slow = duration_ms is not None and duration_ms >= Config.ACCESS_LOG_SLOW_MS
+        if response.status_code < 500 and not slow and random.random() >= rate:
+            return response
+
+        access_logger.info(f"{request.method} {request.path} {response.status_code}", extra={'fields': {
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint,
+            'status': response.status_code,
+            'duration_ms': duration_ms,
+            'origin': request.headers.get('Origin'),
+            'remote_addr': request.remote_addr,
+            'sample_rate': rate
+        }})
+        return response
+
+    app.logger.info('Parking API startup')
@@ -0,0 +1,41 @@
+from flask import request, jsonify
+from services.lot_service import LotService
+from config import Config
+
+# Blueprints whose requests are scoped to a single parking lot
+LOT_SCOPED_BLUEPRINTS = ['booking', 'parking']
+
+def get_request_lot_id():
+    """Lot a request targets, from the X-Lot-Id header, query string or JSON body"""
+    lot_id = request.headers.get('X-Lot-Id') or request.args.get('lot_id')
+    
+    if not lot_id and request.is_json:
+        data = request.get_json(silent=True)
+        if isinstance(data, dict):
+            lot_id = data.get('lot_id')
+    
+    return LotService().require_lot(lot_id or Config.DEFAULT_LOT_ID)
+
+def lot_explicitly_requested():
+    """Check if the client named a lot rather than relying on the default"""
+    if request.headers.get('X-Lot-Id') or request.args.get('lot_id'):
+        return True
+    data = request.get_json(silent=True) if request.is_json else None
+    return isinstance(data, dict) and bool(data.get('lot_id'))
+
+def register_lot_routing(app):
+    @app.before_request
+    def check_served_lot():
+        if request.method == 'OPTIONS' or request.blueprint not in LOT_SCOPED_BLUEPRINTS:
+            return None
+        
+        try:
+            lot_id = get_request_lot_id()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Lots can be split across instances; send clients to the right one
+        if not LotService.is_served(lot_id):
+            return jsonify({'error': 'Parking lot is not served by this instance', 'lot_id': lot_id}), 421
+        
+        return None
@@ -0,0 +1,39 @@
+import hmac
+import time
+from flask import Response, g, jsonify, request
+from utils.metrics import REQUEST_COUNT, REQUEST_LATENCY, REQUESTS_IN_FLIGHT, render_metrics
+from config import Config
+
+def register_metrics(app):
+    """Record latency, status and concurrency per endpoint and serve them on /metrics"""
+
+    @app.before_request
+    def start_request_metrics():
+        g.metrics_endpoint = request.endpoint or 'unmatched'
+        g.metrics_started = time.perf_counter()
+        REQUESTS_IN_FLIGHT.labels(g.metrics_endpoint).inc()
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.get('metrics_started')
+        if started is not None:
+            labels = (request.blueprint or 'app', g.metrics_endpoint, request.method)
+            REQUEST_LATENCY.labels(*labels).observe(time.perf_counter() - started)
+            REQUEST_COUNT.labels(*labels, str(response.status_code)).inc()
+        return response
+
+    @app.teardown_request
+    def finish_request_metrics(error=None):
+        # Runs even when a handler raised, so the gauge can't drift upwards
+        if g.pop('metrics_started', None) is not None:
+            REQUESTS_IN_FLIGHT.labels(g.metrics_endpoint).dec()
+
+    @app.route('/metrics')
+    def metrics():
+        if Config.METRICS_TOKEN:
+            token = request.headers.get('Authorization', '').replace('Bearer ', '', 1)
+            if not hmac.compare_digest(token, Config.METRICS_TOKEN):
+                return jsonify({'error': 'Unauthorized'}), 401
+
+        body, content_type = render_metrics()
+        return Response(body, content_type=content_type)
@@ -0,0 +1,73 @@
+import os
+import random
+import tracemalloc
+from flask import g, request
+from services.auth_service import AuthService
+from utils.profiling import CpuProfile
+from config import Config
+import logging
+
+logger = logging.getLogger(__name__)
+
+def _sampled_endpoints():
+    return {endpoint.strip() for endpoint in Config.PROFILE_ENDPOINTS.split(',') if endpoint.strip()}
+
+def _admin_request():
+    """Check if the request carries a valid admin token, without failing it"""
+    token = request.headers.get('Authorization')
+    if not token:
+        return False
+    try:
+        auth_service = AuthService()
+        return auth_service.is_admin(auth_service.verify_token(token)['user_id'])
+    except Exception:
+        return False
+
+def register_profiling(app):
+    """Profile requests an admin asks for with X-Profile: cpu, plus a configured sample of traffic
+
+    Profiles are dumped under PROFILE_DIR; summarize them with
+    scripts/summarize_profiles.py.
+    """
+    endpoints = _sampled_endpoints()
+
+    if Config.PROFILE_TRACEMALLOC and not tracemalloc.is_tracing():
+        tracemalloc.start(Config.PROFILE_TRACEMALLOC_FRAMES)
+
+    @app.before_request
+    def start_request_profile():
+        requested = request.headers.get('X-Profile') == 'cpu'
+        if requested:
+            if not _admin_request():
+                return
+        elif not (
+            Config.PROFILE_SAMPLE_RATE > 0
+            and (not endpoints or request.endpoint in endpoints)
+            and random.random() < Config.PROFILE_SAMPLE_RATE
+        ):
+            return
+
+        profile = CpuProfile()
+        if profile.start():
+            g.cpu_profile = profile
+            g.cpu_profile_requested = requested
+
+    @app.after_request
+    def dump_request_profile(response):
+        profile = g.pop('cpu_profile', None)
+        if profile is None:
+            return response
+        try:
+            path = profile.stop(request.endpoint or 'unmatched')
+            if g.get('cpu_profile_requested'):
+                response.headers['X-Profile-Dump'] = os.path.basename(path)
+        except Exception as e:
+            logger.error(f"Failed to write request profile: {str(e)}")
+        return response
+
+    @app.teardown_request
+    def release_request_profile(error=None):
+        # A request that raised never reached after_request; don't leave the profiler on
+        profile = g.pop('cpu_profile', None)
+        if profile is not None:
+            profile.stop()
@@ -0,0 +1,43 @@
+import json
+from flask import g, request
+from utils.tracing import end_trace, start_trace
+from config import Config
+import logging
+
+logger = logging.getLogger(__name__)
+
+def register_tracing(app):
+    """Trace the backend calls of each request into Server-Timing and slow-request logs"""
+
+    @app.before_request
+    def begin_request_trace():
+        g.trace, g.trace_token = start_trace()
+
+    @app.after_request
+    def report_request_trace(response):
+        trace = g.get('trace')
+        if trace is None:
+            return response
+
+        if Config.TRACE_SERVER_TIMING:
+            response.headers['Server-Timing'] = ', '.join(
+                f'{backend};dur={total["ms"]:.1f};desc="{total["count"]} calls"'
+                for backend, total in sorted(trace.by_backend().items())
+            ) or 'backend;dur=0'
+
+        # The full breakdown is only sent when asked for, and only where enabled
+        if (app.debug or Config.TRACE_DEBUG_HEADER) and request.headers.get('X-Debug-Trace'):
+            response.headers['X-Trace-Summary'] = json.dumps(trace.summary(), separators=(',', ':'))
+
+        if trace.calls > Config.TRACE_LOG_CALLS or trace.bytes > Config.TRACE_LOG_BYTES:
+            logger.warning(
+                f"Heavy backend traffic on {request.method} {request.path}: {trace.calls} calls, {trace.bytes} bytes",
+                extra={'fields': dict(trace.summary(), endpoint=request.endpoint)}
+            )
+        return response
+
+    @app.teardown_request
+    def finish_request_trace(error=None):
+        token = g.pop('trace_token', None)
+        if token is not None:
+            end_trace(token)
@@ -0,0 +1,175 @@
+import datetime
+import os
+import tracemalloc
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from services.export_service import ExportService, BOOKING_EXPORT_FIELDS, PAYMENT_EXPORT_FIELDS, parse_export_bound
+from services.lot_service import LotService
+from services.overtime_service import OvertimeService
+from services.rollup_service import RollupService
+from middleware.auth_middleware import admin_required
+from middleware.lot_middleware import get_request_lot_id, lot_explicitly_requested
+from utils.pagination import csv_lines, ndjson_lines
+from utils.profiling import memory_diff, resolve_dump, take_memory_snapshot
+import logging
+
+logger = logging.getLogger(__name__)
+admin_bp = Blueprint('admin', __name__)
+
+ANALYTICS_MAX_DAYS = 366
+
+EXPORT_KINDS = {
+    'bookings': BOOKING_EXPORT_FIELDS,
+    'payments': PAYMENT_EXPORT_FIELDS
+}
+
+@admin_bp.route('/export/<kind>', methods=['GET'])
+@admin_required
+def export_records(kind):
+    try:
+        if kind not in EXPORT_KINDS:
+            return jsonify({'error': 'kind must be bookings or payments'}), 404
+        
+        export_format = request.args.get('format', 'csv')
+        if export_format not in ['csv', 'jsonl']:
+            return jsonify({'error': 'format must be csv or jsonl'}), 400
+        
+        start = parse_export_bound(request.args.get('from'), 'from')
+        end = parse_export_bound(request.args.get('to'), 'to')
+        statuses = [status.strip() for status in request.args.get('status', '').split(',') if status.strip()]
+        
+        # Without an explicit lot the export covers every lot
+        lot_ids = [get_request_lot_id()] if lot_explicitly_requested() else None
+        
+        export_service = ExportService()
+        if kind == 'bookings':
+            rows = export_service.iter_booking_rows(lot_ids or LotService().get_lot_ids(), start, end, statuses)
+        else:
+            rows = export_service.iter_payment_rows(lot_ids, start, end, statuses)
+        
+        if export_format == 'csv':
+            body, mimetype = csv_lines(rows, EXPORT_KINDS[kind]), 'text/csv'
+        else:
+            body, mimetype = ndjson_lines(rows), 'application/x-ndjson'
+        
+        filename = f"{kind}-{datetime.datetime.utcnow().strftime('%Y%m%dT%H%M%S')}.{export_format}"
+        return Response(
+            stream_with_context(body),
+            mimetype=mimetype,
+            headers={'Content-Disposition': f'attachment; filename={filename}'}
+        )
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Export error: {str(e)}")
+        return jsonify({'error': 'Failed to export records'}), 500
+
+@admin_bp.route('/analytics/daily', methods=['GET'])
+@admin_required
+def daily_analytics():
+    try:
+        start_day, end_day = _analytics_range()
+        rollup_service = RollupService(get_request_lot_id())
+        result = rollup_service.get_daily(start_day, end_day)
+        
+        return jsonify(dict(result, start=start_day, end=end_day)), 200
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Daily analytics error: {str(e)}")
+        return jsonify({'error': 'Failed to get analytics'}), 500
+
+@admin_bp.route('/analytics/slots', methods=['GET'])
+@admin_required
+def slot_analytics():
+    try:
+        start_day, end_day = _analytics_range()
+        rollup_service = RollupService(get_request_lot_id())
+        slots = rollup_service.get_slot_usage(start_day, end_day, request.args.get('slot_id'))
+        
+        return jsonify({'slots': slots, 'start': start_day, 'end': end_day}), 200
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Slot analytics error: {str(e)}")
+        return jsonify({'error': 'Failed to get analytics'}), 500
+
+@admin_bp.route('/overtime', methods=['GET'])
+@admin_required
+def overdue_bookings():
+    try:
+        lot_ids = [get_request_lot_id()] if lot_explicitly_requested() else LotService().get_lot_ids()
+        
+        overdue = []
+        for lot_id in lot_ids:
+            overdue.extend(OvertimeService(lot_id).get_overdue())
+        overdue.sort(key=lambda item: item['overtime_minutes'], reverse=True)
+        
+        return jsonify({
+            'overdue': overdue,
+            'count': len(overdue),
+            'total_amount': round(sum(item['amount'] for item in overdue if not item['overtime_paid']), 2)
+        }), 200
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Overdue report error: {str(e)}")
+        return jsonify({'error': 'Failed to get overdue bookings'}), 500
+
+@admin_bp.route('/profiling/memory/snapshot', methods=['POST'])
+@admin_required
+def memory_snapshot():
+    try:
+        # Snapshots cover the worker process that served this request only
+        snapshot = take_memory_snapshot(request.args.get('label'))
+        return jsonify(dict(snapshot, pid=os.getpid())), 201
+        
+    except Exception as e:
+        logger.error(f"Memory snapshot error: {str(e)}")
+        return jsonify({'error': 'Failed to take memory snapshot'}), 500
+
+@admin_bp.route('/profiling/memory/diff', methods=['GET'])
+@admin_required
+def memory_snapshot_diff():
+    try:
+        key_type = request.args.get('group', 'lineno')
+        if key_type not in ['lineno', 'filename', 'traceback']:
+            return jsonify({'error': 'group must be lineno, filename or traceback'}), 400
+        top = min(int(request.args.get('top', 20)), 200)
+        
+        before = resolve_dump(request.args.get('from'))
+        after = resolve_dump(request.args.get('to'))
+        return jsonify({'changes': memory_diff(before, after, top, key_type)}), 200
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Memory diff error: {str(e)}")
+        return jsonify({'error': 'Failed to diff memory snapshots'}), 500
+
+@admin_bp.route('/profiling/memory', methods=['DELETE'])
+@admin_required
+def stop_memory_tracing():
+    # tracemalloc slows every allocation, so switch it off once done
+    was_tracing = tracemalloc.is_tracing()
+    tracemalloc.stop()
+    return jsonify({'stopped': was_tracing, 'pid': os.getpid()}), 200
+
+def _analytics_range():
+    """Inclusive day range from the from/to query args, defaulting to the last 30 days"""
+    today = datetime.datetime.utcnow().date()
+    try:
+        end = datetime.date.fromisoformat(request.args['to']) if request.args.get('to') else today
+        start = datetime.date.fromisoformat(request.args['from']) if request.args.get('from') else end - datetime.timedelta(days=29)
+    except ValueError:
+        raise ValueError('from and to must be dates (YYYY-MM-DD)')
+    
+    if start > end:
+        raise ValueError('from must not be after to')
+    if (end - start).days + 1 > ANALYTICS_MAX_DAYS:
+        raise ValueError(f'Range must not exceed {ANALYTICS_MAX_DAYS} days')
+    
+    return start.isoformat(), end.isoformat()
@@ -1,9 +1,15 @@
 from datetime import datetime
-from flask import Blueprint, request, jsonify, g
+from flask import Blueprint, Response, request, jsonify, g, stream_with_context
 from services.booking_service import BookingService
+from services.payment_service import PaymentService
 from services.qr_service import QRService
 import io
 from middleware.auth_middleware import token_required
+from middleware.lot_middleware import get_request_lot_id, lot_explicitly_requested
+from services.lot_service import LotService
+from utils.geo import validate_coordinates
+from utils.pagination import ndjson_lines, parse_limit
+from config import Config
 import logging
 
 logger = logging.getLogger(__name__)
@@ -18,8 +24,38 @@ def get_available_slots():
         if not all([start_time, end_time]):
             return jsonify({'error': 'start_time and end_time parameters are required'}), 400
         
-        booking_service = BookingService()
-        available_slots = booking_service.get_available_slots(start_time, end_time)
+        # Optional server-side filters, applied before the overlap check
+        try:
+            max_rate = float(request.args['max_rate']) if request.args.get('max_rate') else None
+            limit = int(request.args['limit']) if request.args.get('limit') else None
+        except ValueError:
+            return jsonify({'error': 'max_rate and limit must be numbers'}), 400
+        
+        if limit is not None and limit < 1:
+            return jsonify({'error': 'limit must be at least 1'}), 400
+        
+        # Nearest-slot search around a point
+        near = None
+        radius_m = None
+        if request.args.get('lat') or request.args.get('lng'):
+            near = validate_coordinates(request.args.get('lat'), request.args.get('lng'))
+            try:
+                radius_m = float(request.args.get('radius', Config.DEFAULT_SEARCH_RADIUS_METERS))
+            except ValueError:
+                return jsonify({'error': 'radius must be a number'}), 400
+            if not 0 < radius_m <= Config.MAX_SEARCH_RADIUS_METERS:
+                return jsonify({'error': f'radius must be between 0 and {Config.MAX_SEARCH_RADIUS_METERS:.0f} meters'}), 400
+        
+        booking_service = BookingService(get_request_lot_id())
+        available_slots = booking_service.get_available_slots(
+            start_time, end_time,
+            location=request.args.get('location'),
+            term=request.args.get('q'),
+            max_rate=max_rate,
+            limit=limit,
+            near=near,
+            radius_m=radius_m
+        )
         
         return jsonify({'available_slots': available_slots}), 200
         
@@ -40,12 +76,14 @@ def create_booking():
         slot_id = data.get('slot_id')
         start_time = data.get('start_time')
         end_time = data.get('end_time')
+        auto_assign = bool(data.get('auto_assign', False))
         
-        if not all([slot_id, start_time, end_time]):
-            return jsonify({'error': 'slot_id, start_time, and end_time are required'}), 400
+        # slot_id may be left out when the server picks the slot
+        if not all([start_time, end_time]) or not (slot_id or auto_assign):
+            return jsonify({'error': 'slot_id (or auto_assign), start_time, and end_time are required'}), 400
         
-        booking_service = BookingService()
-        result = booking_service.create_booking(g.current_user_id, slot_id, start_time, end_time)
+        booking_service = BookingService(get_request_lot_id())
+        result = booking_service.create_booking(g.current_user_id, slot_id, start_time, end_time, auto_assign=auto_assign)
         
         return jsonify(result), 201
         
@@ -55,15 +93,106 @@ def create_booking():
         logger.error(f"Create booking error: {str(e)}")
         return jsonify({'error': 'Failed to create booking'}), 500
 
+@booking_bp.route('/bookings/recurring', methods=['POST'])
+@token_required
+def create_recurring_booking():
+    """Book the same slot and time on every occurrence of a recurrence rule"""
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({'error': 'Request body is required'}), 400
+
+        slot_id = data.get('slot_id')
+        start_time = data.get('start_time')
+        end_time = data.get('end_time')
+        recurrence = data.get('recurrence')
+
+        if not all([slot_id, start_time, end_time]) or not isinstance(recurrence, dict) or not recurrence.get('until'):
+            return jsonify({'error': 'slot_id, start_time, end_time, and recurrence.until are required'}), 400
+
+        booking_service = BookingService(get_request_lot_id())
+        result = booking_service.create_recurring_booking(g.current_user_id, slot_id, start_time, end_time, recurrence)
+
+        # Nothing could be booked when every occurrence conflicts
+        return jsonify(result), 201 if result['bookings'] else 409
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Create recurring booking error: {str(e)}")
+        return jsonify({'error': 'Failed to create recurring booking'}), 500
+
+@booking_bp.route('/bookings/bulk', methods=['POST'])
+@token_required
+def create_bulk_booking():
+    """Book many cars over several windows with one combined payment"""
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({'error': 'Request body is required'}), 400
+
+        windows = data.get('windows')
+        email = data.get('email')
+
+        if not isinstance(windows, list) or not windows or not email:
+            return jsonify({'error': 'windows and email are required'}), 400
+
+        booking_service = BookingService(get_request_lot_id())
+        result = booking_service.create_bulk_booking(g.current_user_id, windows)
+
+        # The bookings stay pending if the payment cannot be started, so report both
+        try:
+            payment_service = PaymentService(get_request_lot_id())
+            result['payment'] = payment_service.initiate_group_payment(
+                result['booking_group_id'], result['bookings'], email
+            )
+        except Exception as e:
+            logger.error(f"Bulk booking payment error: {str(e)}")
+            result['payment'] = None
+            result['payment_error'] = 'Payment initiation failed'
+
+        return jsonify(result), 201
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Create bulk booking error: {str(e)}")
+        return jsonify({'error': 'Failed to create bulk booking'}), 500
+
 @booking_bp.route('/user/bookings', methods=['GET'])
 @token_required
 def get_user_bookings():
     try:
-        booking_service = BookingService()
-        bookings = booking_service.get_user_bookings(g.current_user_id)
+        lot_id_filter = get_request_lot_id() if lot_explicitly_requested() else None
+        
+        # format=ndjson streams every booking, one page of reads at a time
+        if request.args.get('format') == 'ndjson':
+            page_size = parse_limit(request.args.get('limit'))
+            records = BookingService().iter_user_bookings(g.current_user_id, page_size, lot_id_filter)
+            return Response(stream_with_context(ndjson_lines(records)), mimetype='application/x-ndjson')
+        
+        # limit or cursor switch to cursor pagination over the user's booking index
+        if request.args.get('limit') or request.args.get('cursor'):
+            bookings, next_cursor = BookingService().get_user_bookings_page(
+                g.current_user_id,
+                parse_limit(request.args.get('limit')),
+                request.args.get('cursor'),
+                lot_id_filter
+            )
+            return jsonify({'bookings': bookings, 'next_cursor': next_cursor}), 200
+        
+        # Without a lot, list the user's bookings from every lot
+        lot_ids = [get_request_lot_id()] if lot_explicitly_requested() else LotService().get_lot_ids()
+        
+        bookings = []
+        for lot_id in lot_ids:
+            bookings.extend(BookingService(lot_id).get_user_bookings(g.current_user_id))
+        bookings.sort(key=lambda x: x.get('created_at', ''), reverse=True)
         
         return jsonify({'bookings': bookings}), 200
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Get user bookings error: {str(e)}")
         return jsonify({'error': 'Failed to get user bookings'}), 500
@@ -73,7 +202,7 @@ def get_user_bookings():
 def get_booking_qr(booking_id):
     """Get QR code for a specific booking"""
     try:
-        booking_service = BookingService()
+        booking_service = BookingService(get_request_lot_id())
         booking = booking_service.get_booking_by_id(booking_id)
         
         # Verify booking belongs to current user
@@ -112,7 +241,7 @@ def download_booking_qr(booking_id):
     try:
         from flask import send_file
         
-        booking_service = BookingService()
+        booking_service = BookingService(get_request_lot_id())
         booking = booking_service.get_booking_by_id(booking_id)
         
         # Verify booking belongs to current user
@@ -166,7 +295,7 @@ def download_booking_qr(booking_id):
 def regenerate_booking_qr(booking_id):
     """Regenerate QR code for a booking (in case of corruption)"""
     try:
-        booking_service = BookingService()
+        booking_service = BookingService(get_request_lot_id())
         booking = booking_service.get_booking_by_id(booking_id)
         
         # Verify booking belongs to current user
@@ -198,8 +327,8 @@ def regenerate_booking_qr(booking_id):
         # Update booking with new QR image
         booking_service.update_booking_status(booking_id, booking['status'], {
             'qr_image_base64': qr_base64,
-            'qr_regenerated_at': datetime.datetime.utcnow().isoformat()
-        })
+            'qr_regenerated_at': datetime.utcnow().isoformat()
+        }, booking=booking)
         
         return jsonify({
             'message': 'QR code regenerated successfully',
@@ -0,0 +1,45 @@
+from flask import Blueprint, request, jsonify
+from services.lot_service import LotService
+from middleware.auth_middleware import admin_required
+import logging
+
+logger = logging.getLogger(__name__)
+lot_bp = Blueprint('lots', __name__)
+
+@lot_bp.route('', methods=['GET'])
+def get_all_lots():
+    try:
+        lot_service = LotService()
+        lots = lot_service.get_all_lots()
+        
+        return jsonify({'lots': lots}), 200
+        
+    except Exception as e:
+        logger.error(f"Get lots error: {str(e)}")
+        return jsonify({'error': 'Failed to get parking lots'}), 500
+
+@lot_bp.route('', methods=['POST'])
+@admin_required
+def create_lot():
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({'error': 'Request body is required'}), 400
+        
+        name = data.get('name')
+        location = data.get('location', '')
+        lot_id = data.get('lot_id')
+        
+        if not name:
+            return jsonify({'error': 'name is required'}), 400
+        
+        lot_service = LotService()
+        result = lot_service.create_lot(name, location, lot_id)
+        
+        return jsonify(result), 201
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Create lot error: {str(e)}")
+        return jsonify({'error': 'Failed to create parking lot'}), 500
@@ -1,6 +1,13 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from services.parking_service import ParkingService
+from services.occupancy_ingestor import OccupancyIngestor
+from services.event_bus import EventBus, format_sse
+from middleware.auth_middleware import sensor_key_required
+from middleware.lot_middleware import get_request_lot_id
+from utils.pagination import ndjson_lines, parse_limit
+from config import Config
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 parking_bp = Blueprint('parking', __name__)
@@ -16,7 +23,7 @@ def validate_qr():
         if not qr_data:
             return jsonify({'error': 'qr_data is required'}), 400
         
-        parking_service = ParkingService()
+        parking_service = ParkingService(get_request_lot_id())
         result = parking_service.validate_qr_code(qr_data)
         
         return jsonify(result), 200
@@ -38,11 +45,28 @@ def validate_qr():
 @parking_bp.route('/slots', methods=['GET'])
 def get_all_slots():
     try:
-        parking_service = ParkingService()
+        parking_service = ParkingService(get_request_lot_id())
+        
+        # format=ndjson streams every slot, one page of reads at a time
+        if request.args.get('format') == 'ndjson':
+            page_size = parse_limit(request.args.get('limit'))
+            records = parking_service.iter_slots(page_size)
+            return Response(stream_with_context(ndjson_lines(records)), mimetype='application/x-ndjson')
+        
+        # limit or cursor switch to cursor pagination
+        if request.args.get('limit') or request.args.get('cursor'):
+            slots, next_cursor = parking_service.get_slots_page(
+                parse_limit(request.args.get('limit')),
+                request.args.get('cursor')
+            )
+            return jsonify({'slots': slots, 'next_cursor': next_cursor}), 200
+        
         slots = parking_service.get_all_slots()
         
         return jsonify({'slots': slots}), 200
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Get slots error: {str(e)}")
         return jsonify({'error': 'Failed to get parking slots'}), 500
@@ -61,8 +85,12 @@ def create_slot():
         if not all([location, rate_per_hour]):
             return jsonify({'error': 'location and rate_per_hour are required'}), 400
         
-        parking_service = ParkingService()
-        result = parking_service.create_slot(location, description, rate_per_hour)
+        parking_service = ParkingService(get_request_lot_id())
+        result = parking_service.create_slot(
+            location, description, rate_per_hour,
+            latitude=data.get('latitude'),
+            longitude=data.get('longitude')
+        )
         
         return jsonify(result), 201
         
@@ -70,4 +98,70 @@ def create_slot():
         return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Create slot error: {str(e)}")
-        return jsonify({'error': 'Failed to create parking slot'}), 500
\ No newline at end of file
+        return jsonify({'error': 'Failed to create parking slot'}), 500
+
+@parking_bp.route('/occupancy', methods=['POST'])
+@sensor_key_required
+def ingest_occupancy():
+    try:
+        data = request.get_json()
+        if not data or not isinstance(data.get('readings'), list):
+            return jsonify({'error': 'readings list is required'}), 400
+        
+        readings = data['readings']
+        if len(readings) > Config.SENSOR_MAX_READINGS:
+            return jsonify({'error': f'At most {Config.SENSOR_MAX_READINGS} readings per request'}), 400
+        
+        ingestor = OccupancyIngestor.for_lot(get_request_lot_id())
+        result = ingestor.ingest(readings)
+        
+        return jsonify(result), 202
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Occupancy ingestion error: {str(e)}")
+        return jsonify({'error': 'Failed to ingest occupancy readings'}), 500
+
+@parking_bp.route('/events', methods=['GET'])
+def slot_events():
+    try:
+        lot_id = get_request_lot_id()
+        last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        subscription = EventBus.subscribe(lot_id)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '30'}
+    
+    def stream():
+        yield 'retry: 3000\n\n'
+        
+        # Catch up from the client's last event, or tell it to refetch if that's gone
+        seen = 0
+        if last_event_id is not None:
+            missed = EventBus.replay(lot_id, last_event_id)
+            if missed is None:
+                yield format_sse({'type': 'resync', 'data': {'lot_id': lot_id}})
+            else:
+                for event in missed:
+                    seen = event['id']
+                    yield format_sse(event)
+        
+        deadline = time.monotonic() + Config.SSE_MAX_STREAM_SECONDS
+        while time.monotonic() < deadline:
+            event = subscription.next_event(Config.SSE_HEARTBEAT_SECONDS)
+            if event is None:
+                yield ': heartbeat\n\n'
+            elif event.get('id') is None or event['id'] > seen:
+                yield format_sse(event)
+    
+    response = Response(stream_with_context(stream()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    response.call_on_close(lambda: EventBus.unsubscribe(subscription))
+    return response
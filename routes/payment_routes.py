@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from services.payment_service import PaymentService
 from services.auth_service import AuthService
+from middleware.lot_middleware import get_request_lot_id
 import logging
 
 logger = logging.getLogger(__name__)
@@ -19,7 +20,7 @@ def initiate_payment():
         if not all([booking_id, email]):
             return jsonify({'error': 'booking_id and email are required'}), 400
         
-        payment_service = PaymentService()
+        payment_service = PaymentService(get_request_lot_id())
         result = payment_service.initiate_payment(booking_id, email)
         
         return jsonify(result), 200
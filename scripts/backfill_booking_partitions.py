@@ -0,0 +1,78 @@
+"""Backfill the bookings_by_day layout and user_bookings index from existing bookings.
+
+Bookings are read in pages ordered by key. Every live booking (pending,
+confirmed or in_use) gets an entry under each day it touches, and every
+booking gets a user_bookings entry. Safe to re-run: entries are
+overwritten with the same values.
+
+Rollout: deploy with BOOKING_PARTITIONS_ENABLED=false (the default) so
+new bookings are partitioned while reads still scan the bookings tree,
+run this script for every lot, then set BOOKING_PARTITIONS_ENABLED=true.
+
+    python scripts/backfill_booking_partitions.py --page-size 500 --dry-run
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config  # noqa: E402
+from services.booking_service import BookingService  # noqa: E402
+from services.firebase_service import FirebaseService  # noqa: E402
+from services.lot_service import LotService  # noqa: E402
+from utils.pagination import iter_by_key  # noqa: E402
+
+LIVE_STATUSES = ['pending', 'confirmed', 'in_use']
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--page-size', type=int, default=Config.MAINTENANCE_BATCH_SIZE)
+    parser.add_argument('--lot-id', help='only backfill this lot (default: every lot)')
+    parser.add_argument('--dry-run', action='store_true', help='count entries without writing them')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=getattr(logging, Config.LOG_LEVEL), format='%(asctime)s %(levelname)s: %(message)s')
+    FirebaseService().initialize()
+
+    lot_ids = [args.lot_id] if args.lot_id else LotService().get_lot_ids()
+    for lot_id in lot_ids:
+        backfill_lot(lot_id, args.page_size, args.dry_run)
+
+def backfill_lot(lot_id, page_size, dry_run):
+    """Backfill the partitions of one lot"""
+    booking_service = BookingService(lot_id)
+    root_ref = FirebaseService.get_db_reference()
+    started = time.monotonic()
+
+    scanned = partitioned = user_indexed = 0
+    updates = {}
+    for booking_id, booking in iter_by_key(booking_service.bookings_ref, page_size):
+        scanned += 1
+        if booking.get('user_id'):
+            updates.update(booking_service._user_index_updates(booking_id, booking))
+            user_indexed += 1
+        if booking.get('status') in LIVE_STATUSES:
+            updates.update(booking_service._partition_entry_updates(booking_id, booking))
+            partitioned += 1
+
+        # Flush on every booking, not just live ones, so terminal-heavy pages stay bounded
+        if len(updates) >= page_size:
+            if not dry_run:
+                root_ref.update(updates)
+            updates = {}
+
+    if updates and not dry_run:
+        root_ref.update(updates)
+
+    elapsed = time.monotonic() - started
+    action = 'Would index' if dry_run else 'Indexed'
+    print(
+        f"[{lot_id or 'default'}] {action} {partitioned} bookings into bookings_by_day and "
+        f"{user_indexed} into user_bookings, of {scanned} scanned, in {elapsed:.1f}s"
+    )
+
+if __name__ == '__main__':
+    main()
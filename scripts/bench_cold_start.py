@@ -0,0 +1,105 @@
+"""Measure how long a fresh process takes to boot the app and serve its first requests.
+
+Each run starts a new interpreter, imports app.py (which creates the app
+and initializes Firebase, so credentials must be configured), then serves
+/health and reports the startup phases. The median boot plus first request
+is checked against a target, and the run also fails if a library meant to
+load lazily was imported at boot.
+
+    python scripts/bench_cold_start.py --runs 7 --target-ms 1500 --importtime
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Render's free plan restarts sleeping services on the first request; keep boot well under its timeout
+DEFAULT_TARGET_MS = 1500
+
+# Loaded on first use by the QR and payment services, never at boot
+LAZY_MODULES = ['qrcode', 'PIL.Image']
+
+CHILD = """
+import json, sys, time
+started = time.perf_counter()
+import app
+booted = time.perf_counter()
+response = app.app.test_client().get('/health')
+served = time.perf_counter()
+print(json.dumps({
+    'boot_ms': round((booted - started) * 1000, 1),
+    'first_request_ms': round((served - booted) * 1000, 1),
+    'status': response.status_code,
+    'phases': app.app.extensions['startup'],
+    'eager_modules': [name for name in %r if name in sys.modules]
+}))
+"""
+
+def run_once(importtime=False):
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', CHILD % (LAZY_MODULES,)]
+    started = time.perf_counter()
+    result = subprocess.run(command, cwd=ROOT, capture_output=True, text=True)
+    wall_ms = round((time.perf_counter() - started) * 1000, 1)
+    if result.returncode != 0:
+        raise RuntimeError(f'App failed to start:\n{result.stderr[-2000:]}')
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    report['process_ms'] = wall_ms
+    return report, result.stderr
+
+def slowest_imports(stderr, top):
+    """Modules with the largest cumulative import time from -X importtime output"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = [part.strip() for part in line[len('import time:'):].split('|')]
+        rows.append((int(cumulative), name))
+    return sorted(rows, reverse=True)[:top]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--target-ms', type=float, default=DEFAULT_TARGET_MS,
+                        help='median boot plus first request must stay under this')
+    parser.add_argument('--importtime', action='store_true', help='list the slowest imports of the first run')
+    args = parser.parse_args()
+
+    reports = []
+    for run in range(args.runs):
+        report, stderr = run_once(importtime=args.importtime and run == 0)
+        print(json.dumps(report), flush=True)
+        if run == 0 and args.importtime:
+            for cumulative, name in slowest_imports(stderr, 15):
+                print(f'  {cumulative / 1000:8.1f} ms  {name}')
+        else:
+            # -X importtime slows imports down, so its run is left out of the figures
+            reports.append(report)
+
+    if not reports:
+        return 0
+
+    cold_ms = [report['boot_ms'] + report['first_request_ms'] for report in reports]
+    median = statistics.median(cold_ms)
+    eager = sorted({name for report in reports for name in report['eager_modules']})
+    print(json.dumps({
+        'runs': len(reports),
+        'median_cold_start_ms': round(median, 1),
+        'max_cold_start_ms': max(cold_ms),
+        'median_process_ms': round(statistics.median(report['process_ms'] for report in reports), 1),
+        'target_ms': args.target_ms,
+        'eager_modules': eager
+    }))
+
+    if eager:
+        print(f'Loaded at boot but meant to be lazy: {", ".join(eager)}', file=sys.stderr)
+    if median > args.target_ms:
+        print(f'Median cold start {median:.1f} ms is over the {args.target_ms:.0f} ms target', file=sys.stderr)
+    return 1 if eager or median > args.target_ms else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
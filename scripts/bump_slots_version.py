@@ -0,0 +1,42 @@
+"""Bump the slots_version stamp of lots whose slots were edited outside the API.
+
+API writes bump the stamp themselves. Run this after changing slots by any
+other route (Firebase console, imports, one-off scripts) so every worker
+rereads them within SLOT_CATALOG_TTL_SECONDS instead of waiting for
+SLOT_CATALOG_MAX_AGE_SECONDS.
+
+    python scripts/bump_slots_version.py --lot-id north
+"""
+import argparse
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config  # noqa: E402
+from services.firebase_service import FirebaseService  # noqa: E402
+from services.lot_service import LotService  # noqa: E402
+from services.slot_catalog import SlotCatalog  # noqa: E402
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lot-id', help="only bump this lot ('default' for the root lot)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=getattr(logging, Config.LOG_LEVEL), format='%(asctime)s %(levelname)s: %(message)s')
+    FirebaseService().initialize()
+
+    if args.lot_id is None:
+        lot_ids = LotService().get_lot_ids()
+    else:
+        lot_ids = [LotService.validate_lot_id(args.lot_id)]
+
+    updates = {}
+    for lot_id in lot_ids:
+        updates.update(SlotCatalog.version_bump(lot_id))
+    FirebaseService.get_db_reference().update(updates)
+    print(f"Bumped slots_version for {len(lot_ids)} lot(s)")
+
+if __name__ == '__main__':
+    main()
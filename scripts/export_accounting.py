@@ -0,0 +1,69 @@
+"""Export bookings or payments, joined by booking_id, as CSV or JSONL.
+
+Reads the database one page at a time and writes rows as they are read,
+so large ranges run in constant memory.
+
+    python scripts/export_accounting.py bookings --from 2024-01-01 --to 2024-02-01 --status completed -o jan.csv
+    python scripts/export_accounting.py payments --format jsonl --lot-id north
+"""
+import argparse
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config  # noqa: E402
+from services.export_service import (  # noqa: E402
+    ExportService, BOOKING_EXPORT_FIELDS, PAYMENT_EXPORT_FIELDS, parse_export_bound
+)
+from services.firebase_service import FirebaseService  # noqa: E402
+from services.lot_service import LotService  # noqa: E402
+from utils.pagination import csv_lines, ndjson_lines  # noqa: E402
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('kind', choices=['bookings', 'payments'])
+    parser.add_argument('--from', dest='start', help='ISO date or datetime, inclusive')
+    parser.add_argument('--to', dest='end', help='ISO date or datetime, exclusive')
+    parser.add_argument('--status', default='', help='comma separated statuses to keep')
+    parser.add_argument('--format', choices=['csv', 'jsonl'], default='csv')
+    parser.add_argument('--lot-id', help="only export this lot ('default' for the root lot)")
+    parser.add_argument('--page-size', type=int, default=Config.EXPORT_PAGE_SIZE)
+    parser.add_argument('-o', '--output', help='output file (default: stdout)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=getattr(logging, Config.LOG_LEVEL), format='%(asctime)s %(levelname)s: %(message)s')
+
+    try:
+        start = parse_export_bound(args.start, '--from')
+        end = parse_export_bound(args.end, '--to')
+        lot_ids = None if args.lot_id is None else [
+            None if args.lot_id == 'default' else LotService.validate_lot_id(args.lot_id)
+        ]
+    except ValueError as e:
+        parser.error(str(e))
+    statuses = [status.strip() for status in args.status.split(',') if status.strip()]
+
+    FirebaseService().initialize()
+    export_service = ExportService(args.page_size)
+
+    if args.kind == 'bookings':
+        rows = export_service.iter_booking_rows(lot_ids or LotService().get_lot_ids(), start, end, statuses)
+        fields = BOOKING_EXPORT_FIELDS
+    else:
+        rows = export_service.iter_payment_rows(lot_ids, start, end, statuses)
+        fields = PAYMENT_EXPORT_FIELDS
+
+    lines = csv_lines(rows, fields) if args.format == 'csv' else ndjson_lines(rows)
+
+    output = open(args.output, 'w', newline='', encoding='utf-8') if args.output else sys.stdout
+    try:
+        for line in lines:
+            output.write(line)
+    finally:
+        if args.output:
+            output.close()
+
+if __name__ == '__main__':
+    main()
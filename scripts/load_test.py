@@ -0,0 +1,120 @@
+"""Measure throughput and latency of a running API at increasing concurrency.
+
+Every level runs the same number of client threads as concurrent
+connections for a fixed time against one or more paths. Because request
+time is dominated by Firebase and Paystack I/O, throughput should grow
+with concurrency under the gthread or gevent workers (see gunicorn.conf.py)
+and stay flat under a single sync worker.
+
+All the load comes from one address, which admission control would rate
+limit into 429s, so the run would measure the limiter rather than the
+workers. Start the target with ADMISSION_ENABLED=false (or an
+ADMISSION_CLIENT_RATE above the request rate). Shed responses (429/503)
+are counted separately and reported.
+
+    ADMISSION_ENABLED=false gunicorn --config gunicorn.conf.py app:app
+    python scripts/load_test.py --base-url http://localhost:5000 --concurrency 1,4,16 --duration 15
+"""
+import argparse
+import http.client
+import json
+import statistics
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+DEFAULT_PATHS = ['/parking/slots?limit=20', '/health']
+
+def worker(base, paths, headers, deadline, results, lock):
+    """Send requests over one keep-alive connection until the deadline"""
+    connection_class = http.client.HTTPSConnection if base.scheme == 'https' else http.client.HTTPConnection
+    connection = connection_class(base.netloc, timeout=30)
+    latencies, errors, shed, index = [], 0, 0, 0
+    while time.monotonic() < deadline:
+        path = paths[index % len(paths)]
+        index += 1
+        started = time.perf_counter()
+        try:
+            connection.request('GET', base.path.rstrip('/') + path, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            if response.status in (429, 503):
+                shed += 1
+            elif response.status >= 400:
+                errors += 1
+            else:
+                latencies.append(time.perf_counter() - started)
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            connection.close()
+            connection = connection_class(base.netloc, timeout=30)
+    connection.close()
+    with lock:
+        results['latencies'].extend(latencies)
+        results['errors'] += errors
+        results['shed'] += shed
+
+def run_level(base, paths, headers, concurrency, duration):
+    results = {'latencies': [], 'errors': 0, 'shed': 0}
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+    threads = [
+        threading.Thread(target=worker, args=(base, paths, headers, deadline, results, lock))
+        for _ in range(concurrency)
+    ]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    latencies = sorted(results['latencies'])
+    return {
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': results['errors'],
+        'shed': results['shed'],
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(statistics.median(latencies) * 1000, 1) if latencies else None,
+        'p95_ms': round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 1) if latencies else None
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--base-url', default='http://localhost:5000')
+    parser.add_argument('--path', action='append', dest='paths', help=f'path to request (repeatable, default {DEFAULT_PATHS})')
+    parser.add_argument('--concurrency', default='1,2,4,8,16', help='comma-separated connection counts')
+    parser.add_argument('--duration', type=float, default=10, help='seconds per level')
+    parser.add_argument('--token', help='Authorization header value for protected paths')
+    parser.add_argument('--min-scaling', type=float,
+                        help='fail unless throughput at the highest level is at least this multiple of the lowest')
+    args = parser.parse_args()
+
+    base = urlsplit(args.base_url)
+    paths = args.paths or DEFAULT_PATHS
+    headers = {'Authorization': args.token} if args.token else {}
+    levels = sorted(int(level) for level in args.concurrency.split(','))
+
+    reports = []
+    for concurrency in levels:
+        report = run_level(base, paths, headers, concurrency, args.duration)
+        if reports and reports[0]['rps']:
+            report['scaling'] = round(report['rps'] / reports[0]['rps'], 2)
+        reports.append(report)
+        print(json.dumps(report), flush=True)
+
+    if any(report['shed'] for report in reports):
+        print('Some requests were shed by admission control; the results measure the limiter, '
+              'not the workers (run the target with ADMISSION_ENABLED=false)', file=sys.stderr)
+
+    scaling = reports[-1].get('scaling')
+    if args.min_scaling and len(reports) > 1 and (scaling or 0) < args.min_scaling:
+        print(f'Throughput scaled {scaling}x from {levels[0]} to {levels[-1]} connections, '
+              f'below the {args.min_scaling}x target', file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,58 @@
+"""Expire stale pending bookings and archive old terminal bookings.
+
+Runs one pass with --once (e.g. from a cron job), otherwise keeps running
+every --interval seconds. --overtime-intents also starts overtime payments
+for cars that have overstayed, before they reach the exit gate.
+
+    python scripts/maintenance_worker.py --once --archive-days 30 --archive-target local
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config  # noqa: E402
+from services.firebase_service import FirebaseService  # noqa: E402
+from services.lot_service import LotService  # noqa: E402
+from services.maintenance_service import MaintenanceService  # noqa: E402
+from services.payment_service import PaymentService  # noqa: E402
+
+logger = logging.getLogger('maintenance_worker')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--once', action='store_true', help='run a single pass and exit')
+    parser.add_argument('--interval', type=int, default=Config.MAINTENANCE_INTERVAL_SECONDS)
+    parser.add_argument('--archive-days', type=int, default=Config.ARCHIVE_AFTER_DAYS)
+    parser.add_argument('--archive-target', choices=['rtdb', 'local'], default=Config.ARCHIVE_TARGET)
+    parser.add_argument('--overtime-intents', action='store_true', help='pre-issue overtime payments for overdue bookings')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=getattr(logging, Config.LOG_LEVEL), format='%(asctime)s %(levelname)s: %(message)s')
+    FirebaseService().initialize()
+
+    while True:
+        failed = False
+        for lot_id in LotService().get_lot_ids():
+            try:
+                report = MaintenanceService(lot_id).run(args.archive_days, args.archive_target)
+                if args.overtime_intents:
+                    report['overtime'] = PaymentService(lot_id).issue_overtime_intents()
+                print(json.dumps({'lot_id': lot_id, **report}), flush=True)
+            except Exception as e:
+                logger.error(f"Maintenance pass failed for lot {lot_id or 'default'}: {str(e)}")
+                failed = True
+
+        if args.once and failed:
+            sys.exit(1)
+
+        if args.once:
+            break
+        time.sleep(args.interval)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""Recompute the daily and per-slot rollup counters from raw bookings and payments.
+
+Run it once after deploying rollups, and whenever the counters are suspected
+to have drifted. Counters written while it runs are overwritten, so pick a
+quiet period.
+
+    python scripts/rebuild_rollups.py --lot-id north --archive-dir archive
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config  # noqa: E402
+from services.firebase_service import FirebaseService  # noqa: E402
+from services.lot_service import LotService  # noqa: E402
+from services.rollup_service import RollupService  # noqa: E402
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--page-size', type=int, default=Config.MAINTENANCE_BATCH_SIZE)
+    parser.add_argument('--lot-id', help="only rebuild this lot ('default' for the root lot)")
+    parser.add_argument('--archive-dir', help='also read local archive segments from this directory')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=getattr(logging, Config.LOG_LEVEL), format='%(asctime)s %(levelname)s: %(message)s')
+    FirebaseService().initialize()
+
+    if args.lot_id is None:
+        lot_ids = LotService().get_lot_ids()
+    else:
+        lot_ids = [None if args.lot_id == 'default' else LotService.validate_lot_id(args.lot_id)]
+
+    for lot_id in lot_ids:
+        stats = RollupService(lot_id).rebuild(args.page_size, args.archive_dir)
+        print(json.dumps({'lot_id': lot_id, **stats}), flush=True)
+
+if __name__ == '__main__':
+    main()
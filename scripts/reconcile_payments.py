@@ -0,0 +1,51 @@
+"""Settle pending payments whose Paystack callback never arrived.
+
+Verifies pending payments older than --older-than minutes with Paystack on a
+bounded worker pool, then completes or fails them in batched writes. Runs
+one pass with --once, otherwise repeats every --interval seconds.
+
+    python scripts/reconcile_payments.py --once --workers 4 --rate 5
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config  # noqa: E402
+from services.firebase_service import FirebaseService  # noqa: E402
+from services.reconciliation_service import ReconciliationService  # noqa: E402
+
+logger = logging.getLogger('reconcile_payments')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--once', action='store_true', help='run a single pass and exit')
+    parser.add_argument('--interval', type=int, default=Config.MAINTENANCE_INTERVAL_SECONDS)
+    parser.add_argument('--older-than', type=int, default=Config.RECONCILE_AFTER_MINUTES, help='minutes')
+    parser.add_argument('--workers', type=int, default=Config.RECONCILE_WORKERS)
+    parser.add_argument('--rate', type=float, default=Config.PAYSTACK_RATE_LIMIT_PER_SECOND, help='Paystack calls per second')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=getattr(logging, Config.LOG_LEVEL), format='%(asctime)s %(levelname)s: %(message)s')
+    FirebaseService().initialize()
+    reconciliation_service = ReconciliationService(args.workers, args.rate)
+
+    while True:
+        try:
+            stats = reconciliation_service.reconcile(args.older_than)
+            print(json.dumps(stats), flush=True)
+        except Exception as e:
+            logger.error(f"Reconciliation pass failed: {str(e)}")
+            if args.once:
+                sys.exit(1)
+
+        if args.once:
+            break
+        time.sleep(args.interval)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Summarize the CPU profiles and memory snapshots written under PROFILE_DIR.
+
+CPU profiles of the same endpoint are merged, so sampled requests add up to
+a picture of where that endpoint spends its time. Memory snapshots are
+compared pairwise.
+
+    python scripts/summarize_profiles.py cpu --endpoint booking.get_available_slots --top 25
+    python scripts/summarize_profiles.py memory memory-A.snap memory-B.snap
+"""
+import argparse
+import glob
+import os
+import pstats
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config  # noqa: E402
+from utils.profiling import memory_diff  # noqa: E402
+
+def summarize_cpu(args):
+    pattern = f"cpu-*-{args.endpoint}.prof" if args.endpoint else 'cpu-*.prof'
+    paths = sorted(glob.glob(os.path.join(args.dir, pattern)))
+    if args.since:
+        # Dump names start with their UTC timestamp, so they compare as strings
+        paths = [path for path in paths if os.path.basename(path)[4:] >= args.since]
+    if not paths:
+        print('No matching CPU profiles', file=sys.stderr)
+        return 1
+
+    stats = pstats.Stats(paths[0])
+    for path in paths[1:]:
+        stats.add(path)
+
+    print(f'{len(paths)} profile(s) from {os.path.basename(paths[0])} to {os.path.basename(paths[-1])}')
+    if args.strip_dirs:
+        stats.strip_dirs()
+    stats.sort_stats(args.sort).print_stats(args.top)
+    if args.callers:
+        stats.print_callers(args.callers)
+    return 0
+
+def summarize_memory(args):
+    before, after = (os.path.join(args.dir, name) if os.sep not in name else name for name in (args.before, args.after))
+    for change in memory_diff(before, after, args.top, args.group):
+        print(f"{change['size_diff'] / 1024:+10.1f} KiB {change['count_diff']:+8d} blocks  {change['location']}")
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--dir', default=Config.PROFILE_DIR)
+    common.add_argument('--top', type=int, default=30)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    cpu = commands.add_parser('cpu', parents=[common], help='merge and print CPU profiles')
+    cpu.add_argument('--endpoint', help='only profiles of this endpoint, e.g. payment.payment_callback')
+    cpu.add_argument('--since', help='only profiles from this UTC time on (YYYYMMDDTHHMMSS)')
+    cpu.add_argument('--sort', default='cumulative', help='pstats sort key (cumulative, tottime, calls, ...)')
+    cpu.add_argument('--callers', help='also print the callers of functions matching this')
+    cpu.add_argument('--strip-dirs', action='store_true')
+
+    memory = commands.add_parser('memory', parents=[common], help='diff two memory snapshots')
+    memory.add_argument('before')
+    memory.add_argument('after')
+    memory.add_argument('--group', default='lineno', choices=['lineno', 'filename', 'traceback'])
+
+    args = parser.parse_args()
+    return summarize_cpu(args) if args.command == 'cpu' else summarize_memory(args)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -126,4 +126,10 @@ class AuthService:
             'created_at': user.get('created_at'),
             'last_login': user.get('last_login')
         }
-        return user_safe
\ No newline at end of file
+        return user_safe
+    
+    def is_admin(self, user_id):
+        """Check if a user may use admin endpoints (ADMIN_USER_IDS or an is_admin flag)"""
+        if user_id in Config.ADMIN_USER_IDS:
+            return True
+        return self.users_ref.child(user_id).child('is_admin').get() is True
@@ -1,16 +1,30 @@
 import datetime
 from hashlib import sha256
+from services.event_bus import EventBus
 from services.firebase_service import FirebaseService
+from services.rollup_service import increment_updates, merge_updates, rollup_day, transition_deltas
+from services.slot_catalog import SlotCatalog
+from utils.intervals import allocate_best_fit, build_busy_intervals, days_touched, find_conflicts, is_free, merge_intervals, overlaps, rank_best_fit
+from utils.deadline import suspended_deadline
+from utils.recurrence import expand_occurrences
+from utils.pagination import decode_cursor, encode_cursor
 from config import Config
 import logging
 
 logger = logging.getLogger(__name__)
 
 class BookingService:
-    def __init__(self):
+    def __init__(self, lot_id=None):
         self.firebase = FirebaseService()
-        self.bookings_ref = self.firebase.get_db_reference('bookings')
-        self.slots_ref = self.firebase.get_db_reference('slots')
+        self.lot_id = lot_id
+        self.bookings_ref = self.firebase.get_db_reference(self._path('bookings'))
+        self.slots_ref = self.firebase.get_db_reference(self._path('slots'))
+        self.locks_ref = self.firebase.get_db_reference(self._path('slot_locks'))
+        self.partitions_ref = self.firebase.get_db_reference(self._path('bookings_by_day'))
+    
+    def _path(self, path):
+        """Database path of a node inside this service's parking lot"""
+        return self.firebase.lot_path(self.lot_id, path)
 
     def _parse_datetime_safe(self, datetime_str):
         """Parse datetime string and handle timezone issues"""
@@ -28,8 +42,15 @@ class BookingService:
                 datetime_str = datetime_str[:-1]  # Remove Z
             return datetime.datetime.fromisoformat(datetime_str)
     
-    def get_available_slots(self, start_time_str, end_time_str):
-        """Get available parking slots for given time range"""
+    def get_available_slots(self, start_time_str, end_time_str, location=None, term=None, max_rate=None, limit=None,
+                            near=None, radius_m=None):
+        """Get available parking slots for given time range
+        
+        Slots are filtered by location prefix, search term and max rate
+        through the catalog indexes before any overlap check, and the scan
+        stops once `limit` free slots are found. With near=(lat, lng) only
+        slots within radius_m are considered, nearest first.
+        """
         try:
             start_dt = self._parse_datetime_safe(start_time_str)
             end_dt = self._parse_datetime_safe(end_time_str)
@@ -44,37 +65,27 @@ class BookingService:
         if start_dt < current_time:
             raise ValueError("Start time cannot be in the past")
         
-        # Get all slots, bookings, and occupancy status
-        all_slots = self.slots_ref.get() or {}
-        all_bookings = self.bookings_ref.get() or {}
-     
+        # Narrow the active slots down with the catalog indexes, then read busy intervals
+        catalog = SlotCatalog.for_lot(self.lot_id)
+        distances = {}
+        if near:
+            nearby = catalog.nearby(near[0], near[1], radius_m or Config.DEFAULT_SEARCH_RADIUS_METERS)
+            distances = {slot_id: distance for distance, slot_id in nearby}
+            candidates = [slot_id for _, slot_id in nearby]
+            if location or term or max_rate is not None:
+                matching = set(catalog.search(location=location, term=term, max_rate=max_rate))
+                candidates = [slot_id for slot_id in candidates if slot_id in matching]
+        else:
+            candidates = catalog.search(location=location, term=term, max_rate=max_rate)
+        busy = self._load_busy_intervals([(start_dt, end_dt)])
         
         available_slots = []
         
-        # FIXED: Properly iterate through slots
-        for slot_id, slot in all_slots.items():
-            # Check if slot is active (assumes slot data has is_active field)
-            if not slot.get('is_active', True):
-                continue
-                
-            is_available = True
+        for slot_id in candidates:
+            slot = catalog.get(slot_id)
             
             # Check if slot is already booked during requested time
-            for booking in all_bookings.values():
-                if (booking['slot_id'] == slot_id and 
-                    booking['status'] in ['confirmed', 'in_use']):
-                    
-                    # FIXED: Use safe datetime parsing for bookings too
-                    booking_start = self._parse_datetime_safe(booking['start_time'])
-                    booking_end = self._parse_datetime_safe(booking['end_time'])
-                    
-                    # Check for time overlap
-                    if not (end_dt <= booking_start or start_dt >= booking_end):
-                        is_available = False
-                        break
-            
-            # FIXED: Moved this inside the slot loop
-            if is_available:
+            if is_free(busy.get(slot_id, []), start_dt, end_dt):
                 # Get current occupancy status (1 = occupied, 0 = empty)
                 is_occupied = slot.get('current_occupancy', 0) == 1
                             
@@ -86,18 +97,136 @@ class BookingService:
                     'current_occupancy': is_occupied,
                     'occupancy_status': 'occupied' if is_occupied else 'empty'
                 })
+                if slot.get('latitude') is not None:
+                    available_slots[-1]['latitude'] = slot['latitude']
+                    available_slots[-1]['longitude'] = slot.get('longitude')
+                if slot_id in distances:
+                    available_slots[-1]['distance_m'] = round(distances[slot_id])
+                
+                if limit and len(available_slots) >= limit:
+                    break
         
         return available_slots
     
-    def create_booking(self, user_id, slot_id, start_time_str, end_time_str):
-        """Create a new parking booking"""
+    def _load_busy_intervals(self, windows):
+        """Index the busy intervals per slot of bookings that can overlap the windows
+        
+        Only the bookings_by_day partitions the windows touch are read. With
+        partitions disabled this falls back to reading every booking.
+        """
+        if not Config.BOOKING_PARTITIONS_ENABLED:
+            all_bookings = self.bookings_ref.get() or {}
+            return build_busy_intervals(all_bookings, self._parse_datetime_safe)
+        
+        days = sorted({day for start_dt, end_dt in windows for day in days_touched(start_dt, end_dt)})
+        
+        # A booking spanning midnight is listed under every day it touches
+        bookings = {}
+        for day in days:
+            partition = self.partitions_ref.child(day).get() or {}
+            for slot_id, slot_bookings in partition.items():
+                for booking_id, entry in slot_bookings.items():
+                    bookings[booking_id] = dict(entry, slot_id=slot_id)
+        
+        return build_busy_intervals(bookings, self._parse_datetime_safe)
+    
+    def _partition_updates(self, booking_id, slot_id, start_time_str, end_time_str, fields):
+        """Build the bookings_by_day updates for a booking, one path per day it touches"""
+        start_dt = self._parse_datetime_safe(start_time_str)
+        end_dt = self._parse_datetime_safe(end_time_str)
+        
+        updates = {}
+        for day in days_touched(start_dt, end_dt):
+            path = self._path(f'bookings_by_day/{day}/{slot_id}/{booking_id}')
+            if fields is None:
+                updates[path] = None
+            else:
+                for field, value in fields.items():
+                    updates[f'{path}/{field}'] = value
+        return updates
+    
+    def _booking_write_updates(self, booking_id, booking_data):
+        """Build the multi-path update that writes a new booking, its day partitions and user index entry"""
+        updates = {self._path(f'bookings/{booking_id}'): booking_data}
+        updates.update(self._partition_entry_updates(booking_id, booking_data))
+        updates.update(self._user_index_updates(booking_id, booking_data))
+        return updates
+    
+    def _user_index_updates(self, booking_id, booking):
+        """Build the user_bookings entry that lets a user's bookings be paged across lots"""
+        return {
+            f'user_bookings/{booking["user_id"]}/{booking_id}': {
+                'lot_id': self.lot_id,
+                'created_at': booking.get('created_at', '')
+            }
+        }
+    
+    def _partition_entry_updates(self, booking_id, booking):
+        """Build the full bookings_by_day entries of a live booking"""
+        return self._partition_updates(
+            booking_id, booking['slot_id'], booking['start_time'], booking['end_time'],
+            {
+                'start_time': booking['start_time'],
+                'end_time': booking['end_time'],
+                'status': booking['status']
+            }
+        )
+    
+    def create_booking(self, user_id, slot_id, start_time_str, end_time_str, auto_assign=False):
+        """Create a new parking booking, optionally auto-assigning the best-fit slot"""
         try:
             start_dt = self._parse_datetime_safe(start_time_str)
             end_dt = self._parse_datetime_safe(end_time_str)
         except ValueError:
             raise ValueError("Invalid datetime format")
         
-        # Validate booking duration
+        duration = self._validate_duration(start_dt, end_dt)
+        
+        if auto_assign:
+            slot_id, slot, booking_id = self._auto_assign_slot(user_id, start_time_str, start_dt, end_dt)
+        else:
+            # Check if slot exists and is available
+            slot = self.slots_ref.child(slot_id).get()
+            if not slot:
+                raise ValueError("Parking slot not found")
+            
+            if not slot.get('is_active', True):
+                raise ValueError("Parking slot is not available")
+            
+            if start_dt < datetime.datetime.utcnow():
+                raise ValueError("Start time cannot be in the past")
+            
+            # Check availability again, against this slot's busy intervals only
+            busy = self._load_busy_intervals([(start_dt, end_dt)])
+            if not is_free(busy.get(slot_id, []), start_dt, end_dt):
+                raise ValueError("Slot is not available for the selected time")
+            
+            booking_id = self._generate_booking_id(user_id, slot_id, start_time_str)
+            self._claim_slot(slot_id, booking_id, start_dt, end_dt)
+        
+        booking_data = self._build_booking_data(booking_id, user_id, slot_id, slot, start_time_str, end_time_str, duration)
+        
+        updates = self._booking_write_updates(booking_id, booking_data)
+        try:
+            self.firebase.get_db_reference().update(updates)
+        except Exception:
+            # Give the window back so the slot does not stay blocked
+            self._release_slot(slot_id, booking_id)
+            raise
+        EventBus.publish_updates(updates)
+        
+        logger.info(f"Booking created: {booking_id} for user: {user_id}")
+        
+        return {
+            'booking_id': booking_id,
+            'booking_reference': booking_data['booking_reference'],
+            'slot_id': slot_id,
+            'total_amount': booking_data['total_amount'],
+            'message': 'Booking created successfully. Please proceed to payment.'
+        }
+    
+    def _validate_duration(self, start_dt, end_dt):
+        """Validate booking duration and return it"""
         duration = end_dt - start_dt
         if duration.total_seconds() < 1800:  # 30 minutes minimum
             raise ValueError("Minimum booking duration is 30 minutes")
@@ -105,7 +234,45 @@ class BookingService:
         if duration.total_seconds() > 86400:  # 24 hours maximum
             raise ValueError("Maximum booking duration is 24 hours")
         
-        # Check if slot exists and is available
+        return duration
+    
+    def create_recurring_booking(self, user_id, slot_id, start_time_str, end_time_str, recurrence):
+        """Create one booking per occurrence of a recurrence rule on a single slot
+        
+        Every occurrence is checked against the slot's busy intervals in one
+        pass. Conflicting occurrences are reported and the rest are written
+        together in a single multi-path update.
+        """
+        try:
+            start_dt = self._parse_datetime_safe(start_time_str)
+            end_dt = self._parse_datetime_safe(end_time_str)
+            until_dt = self._parse_datetime_safe(recurrence.get('until', ''))
+        except (ValueError, AttributeError):
+            raise ValueError("Invalid datetime format")
+        
+        duration = self._validate_duration(start_dt, end_dt)
+        
+        if start_dt < datetime.datetime.utcnow():
+            raise ValueError("Start time cannot be in the past")
+        
+        # A date-only end date covers bookings starting on that day
+        if until_dt.time() == datetime.time(0, 0):
+            until_dt += datetime.timedelta(days=1) - datetime.timedelta(microseconds=1)
+        
+        try:
+            interval = int(recurrence.get('interval', 1))
+        except (ValueError, TypeError):
+            raise ValueError("Interval must be a number")
+        
+        occurrences = expand_occurrences(
+            start_dt, end_dt,
+            recurrence.get('frequency', 'weekly'),
+            until_dt,
+            interval=interval,
+            weekdays=recurrence.get('weekdays'),
+            max_occurrences=Config.RECURRING_MAX_OCCURRENCES
+        )
+        
         slot = self.slots_ref.child(slot_id).get()
         if not slot:
             raise ValueError("Parking slot not found")
@@ -113,21 +280,225 @@ class BookingService:
         if not slot.get('is_active', True):
             raise ValueError("Parking slot is not available")
         
-        # Check availability again
-        available_slots = self.get_available_slots(start_time_str, end_time_str)
-        if not any(s['slot_id'] == slot_id for s in available_slots):
-            raise ValueError("Slot is not available for the selected time")
+        # Only this slot's bookings are needed, not the whole tree
+        slot_bookings = self.bookings_ref.order_by_child('slot_id').equal_to(slot_id).get() or {}
+        busy = build_busy_intervals(slot_bookings, self._parse_datetime_safe).get(slot_id, [])
+        conflicting = find_conflicts(busy, occurrences)
+        
+        recurrence_id = sha256(f'{user_id}{slot_id}{start_time_str}{datetime.datetime.now().isoformat()}'.encode()).hexdigest()[:20]
+        
+        windows = []
+        for index, (occurrence_start, occurrence_end) in enumerate(occurrences):
+            if index in conflicting:
+                continue
+            booking_id = self._generate_booking_id(user_id, slot_id, f'{occurrence_start.isoformat()}{index}')
+            windows.append((booking_id, occurrence_start, occurrence_end))
+        
+        # Pending bookings from other users only show up in the claims
+        claimed = set(self._claim_windows(slot_id, windows, partial=True)) if windows else set()
+        
+        updates = {}
+        bookings = []
+        for booking_id, occurrence_start, occurrence_end in windows:
+            if booking_id not in claimed:
+                continue
+            
+            booking_data = self._build_booking_data(
+                booking_id, user_id, slot_id, slot,
+                occurrence_start.isoformat(), occurrence_end.isoformat(), duration
+            )
+            booking_data['recurrence_id'] = recurrence_id
+            updates.update(self._booking_write_updates(booking_id, booking_data))
+            bookings.append({
+                'booking_id': booking_id,
+                'booking_reference': booking_data['booking_reference'],
+                'start_time': booking_data['start_time'],
+                'end_time': booking_data['end_time'],
+                'total_amount': booking_data['total_amount']
+            })
+        
+        booked_starts = {booking['start_time'] for booking in bookings}
+        conflicts = [
+            {
+                'start_time': occurrence_start.isoformat(),
+                'end_time': occurrence_end.isoformat(),
+                'reason': 'Slot is not available for the selected time'
+            }
+            for occurrence_start, occurrence_end in occurrences
+            if occurrence_start.isoformat() not in booked_starts
+        ]
+        
+        if updates:
+            try:
+                self.firebase.get_db_reference().update(updates)
+            except Exception:
+                self._release_windows(slot_id, claimed)
+                raise
+            EventBus.publish_updates(updates)
+        
+        logger.info(f"Recurring booking {recurrence_id} created {len(bookings)} of {len(occurrences)} occurrences for user: {user_id}")
+        
+        return {
+            'recurrence_id': recurrence_id,
+            'slot_id': slot_id,
+            'bookings': bookings,
+            'conflicts': conflicts,
+            'total_amount': round(sum(b['total_amount'] for b in bookings), 2),
+            'message': f'{len(bookings)} of {len(occurrences)} bookings created. Please proceed to payment.'
+        }
+    
+    def create_bulk_booking(self, user_id, windows):
+        """Book several cars over several windows at once, all or nothing
+        
+        Slots for every window are allocated best-fit in one in-memory pass
+        over a single read of the slots, bookings and live claims, claimed
+        slot by slot, and written with one multi-path update.
+        """
+        demands = []
+        for window in windows:
+            try:
+                start_dt = self._parse_datetime_safe(window.get('start_time', ''))
+                end_dt = self._parse_datetime_safe(window.get('end_time', ''))
+                count = int(window.get('count', 1))
+            except (ValueError, TypeError, AttributeError):
+                raise ValueError("Each window needs a valid start_time, end_time, and count")
+            
+            self._validate_duration(start_dt, end_dt)
+            if start_dt < datetime.datetime.utcnow():
+                raise ValueError("Start time cannot be in the past")
+            if count < 1:
+                raise ValueError("Count must be at least 1")
+            
+            demands.append((start_dt, end_dt, count))
+        
+        total_count = sum(count for _, _, count in demands)
+        if total_count > Config.BULK_BOOKING_MAX_CARS:
+            raise ValueError(f"A bulk booking can hold at most {Config.BULK_BOOKING_MAX_CARS} cars")
         
-        # Calculate booking amount
+        group_id = sha256(f'{user_id}bulk{datetime.datetime.now().isoformat()}'.encode()).hexdigest()[:20]
+        
+        # Another request can still claim a chosen slot first; allocate again around it
+        for attempt in range(Config.BULK_BOOKING_CLAIM_ATTEMPTS):
+            updates, windows_by_slot, bookings = self._plan_bulk_booking(user_id, group_id, windows, demands)
+            try:
+                self._claim_across_slots(windows_by_slot)
+                break
+            except ValueError:
+                logger.info(f"Bulk booking {group_id} lost a slot on attempt {attempt + 1}, allocating again")
+        else:
+            raise ValueError("Some slots were taken while booking. Please try again")
+        
+        try:
+            self.firebase.get_db_reference().update(updates)
+        except Exception:
+            self._release_claims(windows_by_slot)
+            raise
+        EventBus.publish_updates(updates)
+        
+        logger.info(f"Bulk booking {group_id} created {len(bookings)} bookings for user: {user_id}")
+        
+        return {
+            'booking_group_id': group_id,
+            'bookings': bookings,
+            'total_amount': round(sum(b['total_amount'] for b in bookings), 2)
+        }
+    
+    def _plan_bulk_booking(self, user_id, group_id, windows, demands):
+        """Allocate slots best-fit for the bulk demands and build their booking writes
+        
+        Slots are checked against live slot_locks claims as well as blocking
+        bookings, since pending bookings hold their claim before payment.
+        """
+        catalog = SlotCatalog.for_lot(self.lot_id)
+        candidates = catalog.search()
+        busy = self._load_busy_intervals([(start_dt, end_dt) for start_dt, end_dt, _ in demands])
+        for slot_id, intervals in self._load_claimed_intervals().items():
+            busy[slot_id] = merge_intervals(busy.get(slot_id, []) + intervals)
+        
+        allocations, shortfall = allocate_best_fit(candidates, busy, demands)
+        if shortfall:
+            missing = ', '.join(
+                f"{count} for {windows[index]['start_time']} - {windows[index]['end_time']}"
+                for index, count in sorted(shortfall.items())
+            )
+            raise ValueError(f"Not enough slots available: missing {missing}")
+        
+        updates = {}
+        windows_by_slot = {}
+        bookings = []
+        for position, (index, slot_id) in enumerate(allocations):
+            start_dt, end_dt, _ = demands[index]
+            start_time_str = windows[index]['start_time']
+            end_time_str = windows[index]['end_time']
+            
+            booking_id = self._generate_booking_id(user_id, slot_id, f'{start_time_str}{position}')
+            booking_data = self._build_booking_data(
+                booking_id, user_id, slot_id, catalog.get(slot_id),
+                start_time_str, end_time_str, end_dt - start_dt
+            )
+            booking_data['booking_group_id'] = group_id
+            
+            updates.update(self._booking_write_updates(booking_id, booking_data))
+            windows_by_slot.setdefault(slot_id, []).append((booking_id, start_dt, end_dt))
+            bookings.append({
+                'booking_id': booking_id,
+                'booking_reference': booking_data['booking_reference'],
+                'slot_id': slot_id,
+                'start_time': start_time_str,
+                'end_time': end_time_str,
+                'total_amount': booking_data['total_amount']
+            })
+        
+        return updates, windows_by_slot, bookings
+    
+    def _load_claimed_intervals(self):
+        """Sorted, merged intervals per slot of the claims in slot_locks that are not over yet"""
+        now = datetime.datetime.utcnow()
+        claimed = {}
+        for slot_id, claims in (self.locks_ref.get() or {}).items():
+            for claim in (claims or {}).values():
+                end = self._parse_datetime_safe(claim['end_time'])
+                if end > now:
+                    claimed.setdefault(slot_id, []).append((self._parse_datetime_safe(claim['start_time']), end))
+        return {slot_id: merge_intervals(intervals) for slot_id, intervals in claimed.items()}
+    
+    def get_group_bookings(self, group_id):
+        """Get all bookings created together by a bulk booking"""
+        return self.bookings_ref.order_by_child('booking_group_id').equal_to(group_id).get() or {}
+    
+    def _auto_assign_slot(self, user_id, start_time_str, start_dt, end_dt):
+        """Claim the active slot whose free gap fits the window most tightly"""
+        if start_dt < datetime.datetime.utcnow():
+            raise ValueError("Start time cannot be in the past")
+        
+        catalog = SlotCatalog.for_lot(self.lot_id)
+        candidates = catalog.search()
+        busy = self._load_busy_intervals([(start_dt, end_dt)])
+        
+        # Fall through to the next best fit if another request claimed the slot first
+        for slot_id in rank_best_fit(candidates, busy, start_dt, end_dt):
+            booking_id = self._generate_booking_id(user_id, slot_id, start_time_str)
+            try:
+                self._claim_slot(slot_id, booking_id, start_dt, end_dt)
+            except ValueError:
+                continue
+            
+            logger.info(f"Auto-assigned slot {slot_id} for user: {user_id}")
+            return slot_id, catalog.get(slot_id), booking_id
+        
+        raise ValueError("No parking slot is available for the selected time")
+    
+    def _generate_booking_id(self, user_id, slot_id, start_time_str):
+        """Generate a unique booking ID"""
+        return sha256(f'{user_id}{slot_id}{start_time_str}{datetime.datetime.now().isoformat()}'.encode()).hexdigest()
+    
+    def _build_booking_data(self, booking_id, user_id, slot_id, slot, start_time_str, end_time_str, duration):
+        """Build a pending booking record priced at the slot's rate"""
         duration_hours = duration.total_seconds() / 3600
         rate_per_hour = slot.get('rate_per_hour', Config.DEFAULT_PARKING_RATE)
         total_amount = round(duration_hours * rate_per_hour, 2)
         
-        # Generate booking ID
-        booking_id = sha256(f'{user_id}{slot_id}{start_time_str}{datetime.datetime.now().isoformat()}'.encode()).hexdigest()
-        
-        # Create booking
-        booking_data = {
+        return {
             'user_id': user_id,
             'slot_id': slot_id,
             'start_time': start_time_str,
@@ -137,19 +508,101 @@ class BookingService:
             'rate_per_hour': rate_per_hour,
             'duration_hours': round(duration_hours, 2),
             'created_at': datetime.datetime.utcnow().isoformat(),
-            'booking_reference': f'PK{booking_id[:8].upper()}'
+            'booking_reference': f'PK{booking_id[:8].upper()}',
+            'lot_id': self.lot_id
         }
+    
+    def _claim_slot(self, slot_id, booking_id, start_dt, end_dt):
+        """Atomically reserve a window on a slot, failing if it overlaps a live claim"""
+        self._claim_windows(slot_id, [(booking_id, start_dt, end_dt)])
+    
+    def _claim_windows(self, slot_id, windows, partial=False):
+        """Atomically reserve (booking_id, start, end) windows on a slot in one transaction
         
-        self.bookings_ref.child(booking_id).set(booking_data)
+        Overlapping a live claim fails the whole transaction, unless partial is
+        set, in which case only the free windows are claimed. Returns the IDs
+        of the claimed bookings.
+        """
+        now = datetime.datetime.utcnow()
+        claimed = []
         
-        logger.info(f"Booking created: {booking_id} for user: {user_id}")
+        def reserve(claims):
+            # The transaction may be retried, so start from a clean result each run
+            claimed.clear()
+            return self._reserve_windows(claims, windows, now, partial, claimed)
         
-        return {
-            'booking_id': booking_id,
-            'booking_reference': booking_data['booking_reference'],
-            'total_amount': total_amount,
-            'message': 'Booking created successfully. Please proceed to payment.'
-        }
+        self.locks_ref.child(slot_id).transaction(reserve)
+        return list(claimed)
+    
+    def _claim_across_slots(self, windows_by_slot):
+        """Reserve windows on several slots, all or nothing
+        
+        Each slot is claimed in its own transaction, so concurrent bookings
+        only contend on the slots they share. Slots are claimed in a fixed
+        order and the earlier claims are released if a later one fails.
+        """
+        claimed = []
+        try:
+            for slot_id in sorted(windows_by_slot):
+                self._claim_windows(slot_id, windows_by_slot[slot_id])
+                claimed.append(slot_id)
+        except Exception:
+            self._release_claims({slot_id: windows_by_slot[slot_id] for slot_id in claimed})
+            raise
+    
+    def _reserve_windows(self, claims, windows, now, partial, claimed):
+        """Add windows to a slot's claims, pruning the claims that are already over"""
+        claims = claims or {}
+        
+        live = []
+        for claim_id, claim in list(claims.items()):
+            claim_start = self._parse_datetime_safe(claim['start_time'])
+            claim_end = self._parse_datetime_safe(claim['end_time'])
+            
+            # Drop claims whose window is already over
+            if claim_end <= now:
+                del claims[claim_id]
+                continue
+            live.append((claim_start, claim_end))
+        
+        for booking_id, start_dt, end_dt in windows:
+            if any(overlaps(start_dt, end_dt, claim_start, claim_end) for claim_start, claim_end in live):
+                if partial:
+                    continue
+                raise ValueError("Slot is not available for the selected time")
+            
+            claims[booking_id] = {
+                'start_time': start_dt.isoformat(),
+                'end_time': end_dt.isoformat()
+            }
+            live.append((start_dt, end_dt))
+            claimed.append(booking_id)
+        
+        return claims
+    
+    # Releases compensate for a failed write, often one that failed because the
+    # request ran out of time, so they run outside the request's deadline
+    
+    def _release_slot(self, slot_id, booking_id):
+        """Release a booking's claim on its slot"""
+        with suspended_deadline():
+            self.locks_ref.child(slot_id).child(booking_id).delete()
+    
+    def _release_claims(self, windows_by_slot):
+        """Release the claims of (booking_id, start, end) windows on several slots in one write"""
+        if windows_by_slot:
+            with suspended_deadline():
+                self.locks_ref.update({
+                    f'{slot_id}/{booking_id}': None
+                    for slot_id, slot_windows in windows_by_slot.items()
+                    for booking_id, _, _ in slot_windows
+                })
+    
+    def _release_windows(self, slot_id, booking_ids):
+        """Release several claims on a slot in one write"""
+        if booking_ids:
+            with suspended_deadline():
+                self.locks_ref.child(slot_id).update({booking_id: None for booking_id in booking_ids})
     
     def get_user_bookings(self, user_id):
         """Get all bookings for a user"""
@@ -158,20 +611,84 @@ class BookingService:
         if not user_bookings:
             return []
         
-        # Enrich bookings with slot information
-        bookings_list = []
-        for booking_id, booking in user_bookings.items():
-            slot = self.slots_ref.child(booking['slot_id']).get()
-            booking_info = booking.copy()
-            booking_info['booking_id'] = booking_id
-            booking_info['slot_location'] = slot.get('location') if slot else 'Unknown'
-            bookings_list.append(booking_info)
+        # Enrich bookings with slot information, from the catalog where possible
+        bookings_list = [self._enrich_booking(booking_id, booking) for booking_id, booking in user_bookings.items()]
         
         # Sort by creation date (newest first)
         bookings_list.sort(key=lambda x: x.get('created_at', ''), reverse=True)
         
         return bookings_list
     
+    def get_user_bookings_page(self, user_id, limit, cursor=None, lot_id_filter=None):
+        """Get one page of a user's bookings across lots, newest first, and the next cursor
+        
+        Pages come from the user_bookings index ordered by created_at, so
+        only `limit` bookings are read per page however many the user has.
+        """
+        index_ref = self.firebase.get_db_reference(f'user_bookings/{user_id}')
+        before = decode_cursor(cursor) if cursor else None
+        
+        # Entries sharing the cursor's created_at come back again; widen the fetch until a page is full
+        fetch = limit + 1
+        while True:
+            query = index_ref.order_by_child('created_at')
+            if before:
+                query = query.end_at(before['c'])
+            entries = query.limit_to_last(fetch).get() or {}
+            
+            items = sorted(
+                ((entry.get('created_at', ''), booking_id, entry.get('lot_id'), entry) for booking_id, entry in entries.items()),
+                key=lambda item: item[:2],
+                reverse=True
+            )
+            if before:
+                items = [item for item in items if (item[0], item[1]) < (before['c'], before['k'])]
+            if lot_id_filter is not None:
+                items = [item for item in items if item[2] == lot_id_filter]
+            
+            if len(items) > limit or len(entries) < fetch:
+                break
+            fetch *= 2
+        
+        next_cursor = encode_cursor({'c': items[limit - 1][0], 'k': items[limit - 1][1]}) if len(items) > limit else None
+        
+        bookings_list = []
+        for _, booking_id, lot_id, entry in items[:limit]:
+            booking_service = self if lot_id == self.lot_id else BookingService(lot_id)
+            booking = booking_service._resolve_indexed_booking(booking_id, entry)
+            if booking:
+                bookings_list.append(booking_service._enrich_booking(booking_id, booking))
+        
+        return bookings_list, next_cursor
+    
+    def _resolve_indexed_booking(self, booking_id, entry):
+        """Booking record behind a user_bookings entry, wherever archiving moved it"""
+        archived = entry.get('archived')
+        if not archived:
+            return self.bookings_ref.child(booking_id).get()
+        if archived == 'local':
+            # Archived to disk; the index keeps a summary for the history
+            return dict(entry.get('summary') or {}, archived=True) if entry.get('summary') else None
+        booking = self.firebase.get_db_reference(self._path(f'bookings_archive/{archived}/{booking_id}')).get()
+        return dict(booking, archived=True) if booking else None
+    
+    def iter_user_bookings(self, user_id, page_size, lot_id_filter=None):
+        """Yield all of a user's bookings, newest first, reading one page at a time"""
+        cursor = None
+        while True:
+            bookings, cursor = self.get_user_bookings_page(user_id, page_size, cursor, lot_id_filter)
+            yield from bookings
+            if not cursor:
+                return
+    
+    def _enrich_booking(self, booking_id, booking):
+        """Add the booking ID and slot location to a booking record"""
+        slot = SlotCatalog.for_lot(self.lot_id).get(booking['slot_id']) or self.slots_ref.child(booking['slot_id']).get()
+        booking_info = booking.copy()
+        booking_info['booking_id'] = booking_id
+        booking_info['slot_location'] = slot.get('location') if slot else 'Unknown'
+        return booking_info
+    
     def get_booking_by_id(self, booking_id):
         """Get booking by ID"""
         booking = self.bookings_ref.child(booking_id).get()
@@ -180,8 +697,8 @@ class BookingService:
         
         return booking
     
-    def update_booking_status(self, booking_id, status, additional_data=None):
-        """Update booking status"""
+    def build_status_updates(self, booking_id, status, additional_data=None, booking=None):
+        """Build the root-relative multi-path update for a booking status change"""
         valid_statuses = ['pending', 'confirmed', 'in_use', 'completed', 'cancelled']
         if status not in valid_statuses:
             raise ValueError(f"Invalid status. Must be one of: {valid_statuses}")
@@ -194,5 +711,32 @@ class BookingService:
         if additional_data:
             update_data.update(additional_data)
         
-        self.bookings_ref.child(booking_id).update(update_data)
-        logger.info(f"Booking {booking_id} status updated to {status}")
\ No newline at end of file
+        updates = {self._path(f'bookings/{booking_id}/{field}'): value for field, value in update_data.items()}
+        
+        if booking is None:
+            booking = self.bookings_ref.child(booking_id).get() or {}
+        
+        if booking.get('slot_id') and booking.get('start_time') and booking.get('end_time'):
+            # Finished bookings no longer hold their slot's window
+            if status in ['completed', 'cancelled']:
+                updates[self._path(f'slot_locks/{booking["slot_id"]}/{booking_id}')] = None
+                updates.update(self._partition_updates(
+                    booking_id, booking['slot_id'], booking['start_time'], booking['end_time'], None
+                ))
+            else:
+                # Full entry, so bookings from before the backfill get a complete one
+                updates.update(self._partition_entry_updates(booking_id, dict(booking, status=status)))
+        
+        # Counters only move on a real transition, so repeated writes don't double count
+        if booking and booking.get('status') != status:
+            deltas = transition_deltas(booking, status, update_data)
+            merge_updates(updates, increment_updates(self.lot_id, rollup_day(booking), booking.get('slot_id'), deltas))
+        
+        return updates
+    
+    def update_booking_status(self, booking_id, status, additional_data=None, booking=None):
+        """Update booking status"""
+        updates = self.build_status_updates(booking_id, status, additional_data, booking)
+        self.firebase.get_db_reference().update(updates)
+        EventBus.publish_updates(updates)
+        logger.info(f"Booking {booking_id} status updated to {status}")
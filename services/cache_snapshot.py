@@ -0,0 +1,103 @@
+import atexit
+import gzip
+import json
+import os
+import tempfile
+import threading
+import time
+from services.slot_catalog import SlotCatalog
+from config import Config
+import logging
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = 1
+SNAPSHOT_FILE = 'caches.json.gz'
+
+def snapshot_path():
+    return os.path.join(Config.CACHE_SNAPSHOT_DIR, SNAPSHOT_FILE)
+
+def save_snapshot():
+    """Write the warm caches to disk; returns the number of slot catalogs saved
+
+    The file is replaced atomically, so workers of one host can share it and
+    a crash mid-write never leaves a torn snapshot behind.
+    """
+    catalogs = SlotCatalog.snapshot()
+    if not catalogs:
+        return 0
+
+    os.makedirs(Config.CACHE_SNAPSHOT_DIR, exist_ok=True)
+    payload = {'format': SNAPSHOT_FORMAT, 'saved_at': time.time(), 'slot_catalogs': catalogs}
+    descriptor, temp_path = tempfile.mkstemp(dir=Config.CACHE_SNAPSHOT_DIR, prefix='.caches-')
+    try:
+        with os.fdopen(descriptor, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb') as snapshot:
+            snapshot.write(json.dumps(payload, separators=(',', ':'), default=str).encode('utf-8'))
+        os.replace(temp_path, snapshot_path())
+    except Exception:
+        os.unlink(temp_path)
+        raise
+    return len(catalogs)
+
+def restore_snapshot():
+    """Seed the caches from the last snapshot; returns the number of slot catalogs restored
+
+    Snapshots of any age are used: restored catalogs are compared with
+    their lot's slots_version stamp before first use, so anything written
+    since the snapshot is caught up on with a normal reload.
+    """
+    path = snapshot_path()
+    if not os.path.exists(path):
+        return 0
+    try:
+        with gzip.open(path, 'rb') as snapshot:
+            payload = json.loads(snapshot.read().decode('utf-8'))
+    except (OSError, ValueError) as e:
+        # A bad snapshot costs a cold start, never a failed boot
+        logger.warning(f"Ignoring unreadable cache snapshot {path}: {str(e)}")
+        return 0
+
+    if payload.get('format') != SNAPSHOT_FORMAT:
+        return 0
+    return SlotCatalog.restore(payload.get('slot_catalogs') or {})
+
+class CacheCheckpointer:
+    """Background thread saving the caches every CACHE_SNAPSHOT_INTERVAL_SECONDS and at exit"""
+
+    def __init__(self, interval=None):
+        self.interval = interval or Config.CACHE_SNAPSHOT_INTERVAL_SECONDS
+        self._stop = threading.Event()
+        self._saved_state = None
+        self._thread = threading.Thread(target=self._run, name='cache-checkpointer', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        # Registered after logging's own atexit hook, so it runs while logging still works
+        atexit.register(self.stop)
+
+    def stop(self):
+        self._stop.set()
+        self.checkpoint()
+
+    def checkpoint(self):
+        """Save a snapshot unless nothing was reloaded since the last one"""
+        state = {lot: (entry['version'], entry['fetched_at']) for lot, entry in SlotCatalog.snapshot().items()}
+        if not state or state == self._saved_state:
+            return
+        try:
+            save_snapshot()
+            self._saved_state = state
+        except Exception as e:
+            logger.error(f"Cache snapshot failed: {str(e)}")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.checkpoint()
+
+def start_cache_snapshots():
+    """Restore the last snapshot and keep checkpointing; returns the number of catalogs restored"""
+    if not Config.CACHE_SNAPSHOT_DIR:
+        return 0
+    restored = restore_snapshot()
+    CacheCheckpointer().start()
+    return restored
@@ -0,0 +1,144 @@
+from collections import deque
+import itertools
+import json
+import queue
+import threading
+from config import Config
+from utils.intervals import BLOCKING_STATUSES
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Subscription:
+    """One subscriber's bounded queue of events for a lot"""
+
+    def __init__(self, lot_id, max_queue):
+        self.lot_id = lot_id
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.overflowed = False
+
+    def offer(self, event):
+        """Queue an event without blocking the publisher"""
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            # A subscriber that can't keep up is told to resync instead of slowing everyone
+            self.overflowed = True
+            self._clear()
+
+    def next_event(self, timeout):
+        """Next event, a resync marker after an overflow, or None on timeout"""
+        if self.overflowed:
+            self.overflowed = False
+            return {'type': 'resync', 'data': {'lot_id': self.lot_id}}
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def _clear(self):
+        while True:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                return
+
+class EventBus:
+    """In-process fan-out of slot and availability changes to live subscribers
+
+    Every change made through this process is published once and copied to
+    each subscriber's bounded queue, so subscribers never cause database
+    reads. A short per-lot history lets reconnecting clients catch up from
+    their Last-Event-ID.
+    """
+    _subscribers = {}
+    _history = {}
+    _sequences = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def subscribe(cls, lot_id=None):
+        """Register a subscriber, or raise ValueError when the process is full"""
+        with cls._lock:
+            if sum(len(subs) for subs in cls._subscribers.values()) >= Config.SSE_MAX_SUBSCRIBERS:
+                raise ValueError('Too many live subscribers')
+            subscription = Subscription(lot_id, Config.SSE_QUEUE_SIZE)
+            cls._subscribers.setdefault(lot_id, set()).add(subscription)
+            return subscription
+
+    @classmethod
+    def unsubscribe(cls, subscription):
+        with cls._lock:
+            cls._subscribers.get(subscription.lot_id, set()).discard(subscription)
+
+    @classmethod
+    def publish(cls, lot_id, event_type, data):
+        """Send an event to every subscriber of a lot"""
+        with cls._lock:
+            # IDs run per lot, so a gap in a lot's history always means events were lost
+            sequence = cls._sequences.setdefault(lot_id, itertools.count(1))
+            event = {'id': next(sequence), 'type': event_type, 'data': dict(data, lot_id=lot_id)}
+            history = cls._history.setdefault(lot_id, deque(maxlen=Config.SSE_HISTORY_SIZE))
+            history.append(event)
+            subscribers = list(cls._subscribers.get(lot_id, ()))
+
+        for subscription in subscribers:
+            subscription.offer(event)
+
+    @classmethod
+    def replay(cls, lot_id, last_event_id):
+        """Events of a lot after last_event_id, or None if the history no longer reaches back"""
+        with cls._lock:
+            history = list(cls._history.get(lot_id, ()))
+        latest = history[-1]['id'] if history else 0
+        # An ID from the future means this process restarted since the client connected
+        if last_event_id > latest or (history and history[0]['id'] > last_event_id + 1):
+            return None
+        return [event for event in history if event['id'] > last_event_id]
+
+    @classmethod
+    def publish_updates(cls, updates):
+        """Publish the slot and availability changes in a root-relative multi-path update
+
+        The stream is public, so booking changes go out as 'availability'
+        events carrying only the slot, the window when known, and whether
+        it is now held. Booking IDs and payment states are never published.
+        """
+        bookings = {}
+        for path, value in updates.items():
+            parts = path.split('/')
+            lot_id = None
+            if parts[0] == 'lots' and len(parts) > 2:
+                lot_id, parts = parts[1], parts[2:]
+
+            if parts[0] == 'slots' and len(parts) == 3 and parts[2] == 'current_occupancy':
+                cls.publish(lot_id, 'occupancy', {'slot_id': parts[1], 'occupied': value == 1})
+            elif parts[0] == 'slots' and len(parts) == 3 and parts[2] == 'is_active':
+                cls.publish(lot_id, 'slot', {'slot_id': parts[1], 'is_active': bool(value)})
+            elif parts[0] == 'bookings' and len(parts) == 2 and isinstance(value, dict):
+                booking = bookings.setdefault((lot_id, parts[1]), {})
+                booking.update({field: value.get(field) for field in ['slot_id', 'status', 'start_time', 'end_time']})
+            elif parts[0] == 'bookings' and len(parts) == 3 and parts[2] == 'status':
+                bookings.setdefault((lot_id, parts[1]), {})['status'] = value
+            elif parts[0] == 'slot_locks' and len(parts) == 3:
+                # Status updates don't rewrite the booking, but carry its slot in these paths
+                bookings.setdefault((lot_id, parts[2]), {}).setdefault('slot_id', parts[1])
+            elif parts[0] == 'bookings_by_day' and len(parts) == 4:
+                bookings.setdefault((lot_id, parts[3]), {}).setdefault('slot_id', parts[2])
+
+        for (lot_id, _), booking in bookings.items():
+            if not booking.get('status') or not booking.get('slot_id'):
+                continue
+            availability = {'slot_id': booking['slot_id'], 'held': booking['status'] in BLOCKING_STATUSES}
+            if booking.get('start_time') and booking.get('end_time'):
+                availability.update(start_time=booking['start_time'], end_time=booking['end_time'])
+            cls.publish(lot_id, 'availability', availability)
+
+def format_sse(event):
+    """Render an event in the text/event-stream wire format"""
+    lines = []
+    if event.get('id') is not None:
+        lines.append(f"id: {event['id']}")
+    lines.append(f"event: {event['type']}")
+    lines.append(f"data: {json.dumps(event['data'], separators=(',', ':'), default=str)}")
+    return '\n'.join(lines) + '\n\n'
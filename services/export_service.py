@@ -0,0 +1,173 @@
+import datetime
+from services.firebase_service import FirebaseService
+from utils.pagination import iter_by_key
+from config import Config
+import logging
+
+logger = logging.getLogger(__name__)
+
+BOOKING_EXPORT_FIELDS = [
+    'booking_id', 'booking_reference', 'lot_id', 'user_id', 'slot_id', 'start_time', 'end_time',
+    'duration_hours', 'rate_per_hour', 'total_amount', 'status', 'created_at', 'paid_at',
+    'booking_group_id', 'payment_reference', 'payment_status', 'payment_amount', 'payment_completed_at'
+]
+
+PAYMENT_EXPORT_FIELDS = [
+    'reference', 'type', 'lot_id', 'amount', 'status', 'created_at', 'completed_at', 'booking_id',
+    'booking_group_id', 'booking_reference', 'user_id', 'slot_id', 'start_time', 'end_time',
+    'booking_status', 'booking_amount'
+]
+
+def parse_export_bound(value, name):
+    """Parse an ISO date or datetime filter bound"""
+    if not value:
+        return None
+    try:
+        return _to_naive_utc(datetime.datetime.fromisoformat(value.replace('Z', '+00:00')))
+    except ValueError:
+        raise ValueError(f'{name} must be an ISO date or datetime')
+
+def _to_naive_utc(dt):
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return dt
+
+class ExportService:
+    """Streams bookings and payments joined by booking_id for accounting
+
+    Records are read one key-ordered page at a time and yielded as flat
+    rows, so memory stays bounded by the page size whatever the range.
+    """
+
+    def __init__(self, page_size=None):
+        self.firebase = FirebaseService()
+        self.page_size = page_size or Config.EXPORT_PAGE_SIZE
+        self.payments_ref = self.firebase.get_db_reference('payments')
+
+    def iter_booking_rows(self, lot_ids, start=None, end=None, statuses=None):
+        """Booking rows with their payment, for bookings starting in [start, end)"""
+        for lot_id in lot_ids:
+            bookings_ref = self.firebase.get_db_reference(self.firebase.lot_path(lot_id, 'bookings'))
+            page = []
+            for booking_id, booking in iter_by_key(bookings_ref, self.page_size):
+                if not isinstance(booking, dict):
+                    continue
+                if statuses and booking.get('status') not in statuses:
+                    continue
+                if not self._in_range(booking.get('start_time'), start, end):
+                    continue
+
+                page.append((booking_id, booking))
+                if len(page) >= self.page_size:
+                    yield from self._join_payments(lot_id, page)
+                    page = []
+
+            if page:
+                yield from self._join_payments(lot_id, page)
+
+    def iter_payment_rows(self, lot_ids=None, start=None, end=None, statuses=None):
+        """Payment rows, one per paid booking, for payments created in [start, end)
+
+        lot_ids None exports the payments of every lot.
+        """
+        wanted_lots = None if lot_ids is None else {lot_id or None for lot_id in lot_ids}
+        page = []
+        for reference, payment in iter_by_key(self.payments_ref, self.page_size):
+            if not isinstance(payment, dict):
+                continue
+            if wanted_lots is not None and (payment.get('lot_id') or None) not in wanted_lots:
+                continue
+            if statuses and payment.get('status') not in statuses:
+                continue
+            if not self._in_range(payment.get('created_at'), start, end):
+                continue
+
+            page.append((reference, payment))
+            if len(page) >= self.page_size:
+                yield from self._join_bookings(page)
+                page = []
+
+        if page:
+            yield from self._join_bookings(page)
+
+    def _join_payments(self, lot_id, page):
+        """Attach each booking's payment, reading every referenced payment once"""
+        references = {booking.get('payment_reference') for _, booking in page if booking.get('payment_reference')}
+        payments = {reference: self.payments_ref.child(reference).get() or {} for reference in references}
+
+        for booking_id, booking in page:
+            payment = payments.get(booking.get('payment_reference'), {})
+            yield {
+                'booking_id': booking_id,
+                'booking_reference': booking.get('booking_reference'),
+                'lot_id': booking.get('lot_id', lot_id),
+                'user_id': booking.get('user_id'),
+                'slot_id': booking.get('slot_id'),
+                'start_time': booking.get('start_time'),
+                'end_time': booking.get('end_time'),
+                'duration_hours': booking.get('duration_hours'),
+                'rate_per_hour': booking.get('rate_per_hour'),
+                'total_amount': booking.get('total_amount'),
+                'status': booking.get('status'),
+                'created_at': booking.get('created_at'),
+                'paid_at': booking.get('paid_at'),
+                'booking_group_id': booking.get('booking_group_id'),
+                'payment_reference': booking.get('payment_reference'),
+                'payment_status': payment.get('status'),
+                'payment_amount': payment.get('amount'),
+                'payment_completed_at': payment.get('completed_at')
+            }
+
+    def _join_bookings(self, page):
+        """Expand payments into one row per booking, reading every booking once"""
+        bookings = {}
+        for _, payment in page:
+            for booking_id in self._payment_booking_ids(payment):
+                key = (payment.get('lot_id') or None, booking_id)
+                if key not in bookings:
+                    path = self.firebase.lot_path(key[0], f'bookings/{booking_id}')
+                    bookings[key] = self.firebase.get_db_reference(path).get() or {}
+
+        for reference, payment in page:
+            row = {
+                'reference': reference,
+                'type': payment.get('type', 'booking'),
+                'lot_id': payment.get('lot_id'),
+                'amount': payment.get('amount'),
+                'status': payment.get('status'),
+                'created_at': payment.get('created_at'),
+                'completed_at': payment.get('completed_at'),
+                'booking_group_id': payment.get('booking_group_id')
+            }
+            booking_ids = self._payment_booking_ids(payment) or [None]
+            for booking_id in booking_ids:
+                # Archived bookings are no longer in the hot tree; their columns stay empty
+                booking = bookings.get((payment.get('lot_id') or None, booking_id), {})
+                yield dict(
+                    row,
+                    booking_id=booking_id,
+                    booking_reference=booking.get('booking_reference'),
+                    user_id=booking.get('user_id'),
+                    slot_id=booking.get('slot_id'),
+                    start_time=booking.get('start_time'),
+                    end_time=booking.get('end_time'),
+                    booking_status=booking.get('status'),
+                    booking_amount=booking.get('total_amount')
+                )
+
+    def _payment_booking_ids(self, payment):
+        if payment.get('booking_ids'):
+            return list(payment['booking_ids'])
+        return [payment['booking_id']] if payment.get('booking_id') else []
+
+    def _in_range(self, value, start, end):
+        """Check an ISO timestamp falls in [start, end); open bounds always match"""
+        if start is None and end is None:
+            return True
+        if not value:
+            return False
+        try:
+            moment = _to_naive_utc(datetime.datetime.fromisoformat(value.replace('Z', '+00:00')))
+        except ValueError:
+            return False
+        return (start is None or moment >= start) and (end is None or moment < end)
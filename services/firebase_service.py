@@ -1,71 +1,157 @@
 import firebase_admin
 from firebase_admin import credentials, db
 from config import Config
+from utils.metrics import track_backend
 import logging
 import os
+import threading
 
 logger = logging.getLogger(__name__)
 
+QUERY_METHODS = ['order_by_child', 'order_by_key', 'order_by_value', 'start_at', 'end_at', 'equal_to',
+                 'limit_to_first', 'limit_to_last']
+
+class InstrumentedQuery:
+    """Query wrapper that records its get() as a Firebase backend call"""
+    
+    def __init__(self, query):
+        self._query = query
+    
+    def get(self, *args, **kwargs):
+        with track_backend('firebase', 'query') as call:
+            return call.payload(self._query.get(*args, **kwargs))
+    
+    def __getattr__(self, name):
+        attribute = getattr(self._query, name)
+        if name in QUERY_METHODS:
+            return lambda *args, **kwargs: InstrumentedQuery(attribute(*args, **kwargs))
+        return attribute
+
+class InstrumentedReference:
+    """Database reference wrapper that records every read and write as a Firebase backend call
+    
+    Calls show up in the /metrics latency histograms and in the current
+    request's trace (see middleware/tracing_middleware.py).
+    """
+    
+    def __init__(self, ref):
+        self._ref = ref
+    
+    def child(self, path):
+        return InstrumentedReference(self._ref.child(path))
+    
+    def get(self, *args, **kwargs):
+        with track_backend('firebase', 'get') as call:
+            return call.payload(self._ref.get(*args, **kwargs))
+    
+    def set(self, value):
+        with track_backend('firebase', 'set') as call:
+            return self._ref.set(call.payload(value))
+    
+    def update(self, value):
+        with track_backend('firebase', 'update') as call:
+            return self._ref.update(call.payload(value))
+    
+    def push(self, value=''):
+        with track_backend('firebase', 'push') as call:
+            return self._ref.push(call.payload(value))
+    
+    def delete(self):
+        with track_backend('firebase', 'delete'):
+            return self._ref.delete()
+    
+    def transaction(self, transaction_update):
+        with track_backend('firebase', 'transaction'):
+            return self._ref.transaction(transaction_update)
+    
+    def __getattr__(self, name):
+        attribute = getattr(self._ref, name)
+        if name in QUERY_METHODS:
+            return lambda *args, **kwargs: InstrumentedQuery(attribute(*args, **kwargs))
+        return attribute
+
 class FirebaseService:
     _instance = None
     _initialized = False
+    _instance_lock = threading.Lock()
+    _init_lock = threading.Lock()
     
     def __new__(cls):
         if cls._instance is None:
-            cls._instance = super(FirebaseService, cls).__new__(cls)
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = super(FirebaseService, cls).__new__(cls)
         return cls._instance
     
     def initialize(self):
-        """Initialize Firebase Admin SDK"""
+        """Initialize Firebase Admin SDK, once per process even when called from several threads"""
         if self._initialized:
             return
+        
+        with self._init_lock:
+            # Another thread may have finished initializing while we waited
+            if self._initialized:
+                return
             
-        try:
-            # Check if we have environment variables for Firebase (production)
-            if all([Config.FIREBASE_PROJECT_ID, Config.FIREBASE_PRIVATE_KEY, Config.FIREBASE_CLIENT_EMAIL]):
-                logger.info("Initializing Firebase with environment variables")
+            try:
+                # Check if we have environment variables for Firebase (production)
+                if all([Config.FIREBASE_PROJECT_ID, Config.FIREBASE_PRIVATE_KEY, Config.FIREBASE_CLIENT_EMAIL]):
+                    logger.info("Initializing Firebase with environment variables")
                 
-                # Create credentials from environment variables
-                cred_dict = {
-                    "type": "service_account",
-                    "project_id": Config.FIREBASE_PROJECT_ID,
-                    "private_key_id": Config.PRIVATE_KEY_ID,
-                    "private_key": Config.FIREBASE_PRIVATE_KEY.replace('\\n', '\n'),  # Handle escaped newlines
-                    "client_email": Config.FIREBASE_CLIENT_EMAIL,
-                    "client_id": Config.CLIENT_ID,
-                    "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-                    "token_uri": "https://oauth2.googleapis.com/token",
-                    "auth_provider_x509_cert_url": "https://www.googleapis.com/oauth2/v1/certs",
-                    "client_x509_cert_url": "https://www.googleapis.com/robot/v1/metadata/x509/firebase-adminsdk-fbsvc%40car-22792.iam.gserviceaccount.com",
-                    "universe_domain": "googleapis.com"
-                }
+                    # Create credentials from environment variables
+                    cred_dict = {
+                        "type": "service_account",
+                        "project_id": Config.FIREBASE_PROJECT_ID,
+                        "private_key_id": Config.PRIVATE_KEY_ID,
+                        "private_key": Config.FIREBASE_PRIVATE_KEY.replace('\\n', '\n'),  # Handle escaped newlines
+                        "client_email": Config.FIREBASE_CLIENT_EMAIL,
+                        "client_id": Config.CLIENT_ID,
+                        "auth_uri": "https://accounts.google.com/o/oauth2/auth",
+                        "token_uri": "https://oauth2.googleapis.com/token",
+                        "auth_provider_x509_cert_url": "https://www.googleapis.com/oauth2/v1/certs",
+                        "client_x509_cert_url": "https://www.googleapis.com/robot/v1/metadata/x509/firebase-adminsdk-fbsvc%40car-22792.iam.gserviceaccount.com",
+                        "universe_domain": "googleapis.com"
+                    }
                 
-                cred = credentials.Certificate(cred_dict)
+                    cred = credentials.Certificate(cred_dict)
                 
-            # Fallback to credential file (local development)
-            elif os.path.exists(Config.FIREBASE_CREDENTIALS_PATH):
-                logger.info("Initializing Firebase with credential file")
-                cred = credentials.Certificate(Config.FIREBASE_CREDENTIALS_PATH)
+                # Fallback to credential file (local development)
+                elif os.path.exists(Config.FIREBASE_CREDENTIALS_PATH):
+                    logger.info("Initializing Firebase with credential file")
+                    cred = credentials.Certificate(Config.FIREBASE_CREDENTIALS_PATH)
                 
-            else:
-                raise Exception("No Firebase credentials found. Please provide either credential file or environment variables.")
+                else:
+                    raise Exception("No Firebase credentials found. Please provide either credential file or environment variables.")
             
-            # Initialize Firebase App
-            firebase_admin.initialize_app(cred, {
-                'databaseURL': Config.FIREBASE_DATABASE_URL
-            })
+                # Initialize Firebase App
+                # httpTimeout caps each RTDB call; request deadlines are checked before every call
+                firebase_admin.initialize_app(cred, {
+                    'databaseURL': Config.FIREBASE_DATABASE_URL,
+                    'httpTimeout': Config.FIREBASE_HTTP_TIMEOUT_SECONDS
+                })
             
-            self._initialized = True
-            logger.info("Firebase initialized successfully")
+                self._initialized = True
+                logger.info("Firebase initialized successfully")
             
-        except Exception as e:
-            logger.error(f"Failed to initialize Firebase: {str(e)}")
-            raise
+            except Exception as e:
+                logger.error(f"Failed to initialize Firebase: {str(e)}")
+                raise
     
     @staticmethod
     def get_db_reference(path=''):
         """Get Firebase database reference"""
-        return db.reference(path)
+        return InstrumentedReference(db.reference(path))
+    
+    @staticmethod
+    def lot_path(lot_id, path=''):
+        """Path of a node inside a parking lot's shard
+        
+        The default lot (no lot_id, or 'default') keeps the original flat
+        layout at the database root, so existing data needs no migration.
+        """
+        if not lot_id or lot_id == 'default':
+            return path
+        return f'lots/{lot_id}/{path}' if path else f'lots/{lot_id}'
     
     def is_initialized(self):
         """Check if Firebase is initialized"""
@@ -0,0 +1,121 @@
+import datetime
+import re
+import threading
+import time
+import uuid
+from services.firebase_service import FirebaseService
+from config import Config
+import logging
+
+logger = logging.getLogger(__name__)
+
+LOT_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+# Name clients and SERVED_LOTS use for the root lot
+DEFAULT_LOT_ALIAS = 'default'
+
+class LotService:
+    """Registry of parking lots; each lot's slots and bookings live in its own shard"""
+
+    # Registered lot IDs, shared by every instance in the process
+    _registry_ids = None
+    _registry_loaded_at = 0.0
+    _registry_lock = threading.Lock()
+
+    def __init__(self):
+        self.firebase = FirebaseService()
+        # The registry is kept outside lots/ so listing lots never reads their data
+        self.registry_ref = self.firebase.get_db_reference('lot_registry')
+
+    @staticmethod
+    def validate_lot_id(lot_id):
+        """Check a lot ID is safe to use as a database path segment
+
+        Returns None for the root lot, whether it was left out or named 'default'.
+        """
+        if lot_id and not LOT_ID_PATTERN.match(lot_id):
+            raise ValueError('Invalid lot_id')
+        if not lot_id or lot_id == DEFAULT_LOT_ALIAS:
+            return None
+        return lot_id
+
+    @staticmethod
+    def is_served(lot_id):
+        """Check if this instance serves a lot (SERVED_LOTS empty means all lots)"""
+        if not Config.SERVED_LOTS:
+            return True
+        return (lot_id or DEFAULT_LOT_ALIAS) in Config.SERVED_LOTS
+
+    @classmethod
+    def lot_exists(cls, lot_id):
+        """Check a lot is registered; the root lot always exists
+
+        Registered IDs are cached for LOT_REGISTRY_TTL_SECONDS, so a lot created
+        on another instance is accepted here once the cache expires.
+        """
+        if not lot_id:
+            return True
+        with cls._registry_lock:
+            registry_ids = cls._registry_ids
+            stale = registry_ids is None or time.monotonic() - cls._registry_loaded_at > Config.LOT_REGISTRY_TTL_SECONDS
+        if stale:
+            # Read outside the lock so one slow read doesn't queue every lot-scoped request
+            registry_ids = set(cls().registry_ref.get(shallow=True) or {})
+            with cls._registry_lock:
+                cls._registry_ids = registry_ids
+                cls._registry_loaded_at = time.monotonic()
+        return lot_id in registry_ids
+
+    def require_lot(self, lot_id):
+        """Validate a lot ID and check the lot is registered"""
+        lot_id = self.validate_lot_id(lot_id)
+        if not self.lot_exists(lot_id):
+            raise ValueError('Unknown parking lot')
+        return lot_id
+
+    def create_lot(self, name, location, lot_id=None):
+        """Register a new parking lot"""
+        if not name or not name.strip():
+            raise ValueError('Name is required')
+
+        if lot_id == DEFAULT_LOT_ALIAS:
+            raise ValueError(f"'{DEFAULT_LOT_ALIAS}' is reserved for the root lot")
+        lot_id = self.validate_lot_id(lot_id) or str(uuid.uuid4())
+        if self.registry_ref.child(lot_id).get():
+            raise ValueError('Lot already exists')
+
+        lot_data = {
+            'name': name.strip(),
+            'location': (location or '').strip(),
+            'is_active': True,
+            'created_at': datetime.datetime.utcnow().isoformat()
+        }
+
+        self.registry_ref.child(lot_id).set(lot_data)
+        with self._registry_lock:
+            # Swapped rather than mutated, since readers check the set outside the lock
+            if LotService._registry_ids is not None:
+                LotService._registry_ids = LotService._registry_ids | {lot_id}
+
+        logger.info(f"New parking lot created: {lot_id}")
+        return {
+            'lot_id': lot_id,
+            'message': 'Parking lot created successfully'
+        }
+
+    def get_all_lots(self):
+        """Get all registered parking lots"""
+        lots = self.registry_ref.get() or {}
+
+        lots_list = []
+        for lot_id, lot_data in lots.items():
+            lot_info = lot_data.copy()
+            lot_info['lot_id'] = lot_id
+            lots_list.append(lot_info)
+
+        return lots_list
+
+    def get_lot_ids(self, include_default=True):
+        """IDs of every lot, with None standing for the default (root) lot"""
+        lot_ids = [None] if include_default else []
+        lot_ids.extend(self.registry_ref.get(shallow=True) or {})
+        return lot_ids
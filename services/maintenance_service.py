@@ -0,0 +1,166 @@
+import datetime
+import gzip
+import json
+import os
+import time
+from services.firebase_service import FirebaseService
+from services.booking_service import BookingService
+from services.rollup_service import merge_updates
+from config import Config
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Kept in the user_bookings index for bookings archived off the database
+ARCHIVE_SUMMARY_FIELDS = [
+    'slot_id', 'start_time', 'end_time', 'status', 'total_amount', 'booking_reference', 'lot_id', 'created_at'
+]
+
+class MaintenanceService:
+    """Keeps the hot bookings tree down to what availability and the gates need"""
+
+    def __init__(self, lot_id=None):
+        self.firebase = FirebaseService()
+        self.lot_id = lot_id
+        self.bookings_ref = self.firebase.get_db_reference(self.firebase.lot_path(lot_id, 'bookings'))
+        self.booking_service = BookingService(lot_id)
+
+    def expire_stale_pending(self, timeout_minutes=None, now=None):
+        """Cancel pending bookings whose payment deadline has passed"""
+        timeout_minutes = timeout_minutes or Config.PENDING_PAYMENT_TIMEOUT_MINUTES
+        now = now or datetime.datetime.utcnow()
+        deadline = now - datetime.timedelta(minutes=timeout_minutes)
+        started = time.monotonic()
+
+        pending = self.bookings_ref.order_by_child('status').equal_to('pending').get() or {}
+
+        updates = {}
+        expired = 0
+        for booking_id, booking in pending.items():
+            created_at = booking.get('created_at')
+            if not created_at or self.booking_service._parse_datetime_safe(created_at) > deadline:
+                continue
+
+            # Cancelling also releases the slot claim in the same write
+            merge_updates(updates, self.booking_service.build_status_updates(booking_id, 'cancelled', {
+                'cancel_reason': 'payment_timeout',
+                'expired_at': now.isoformat()
+            }, booking=booking))
+            expired += 1
+
+            if expired % Config.MAINTENANCE_BATCH_SIZE == 0:
+                self.firebase.get_db_reference().update(updates)
+                updates = {}
+
+        if updates:
+            self.firebase.get_db_reference().update(updates)
+
+        elapsed = time.monotonic() - started
+        logger.info(f"Expired {expired} of {len(pending)} pending bookings in {elapsed:.2f}s")
+        return {'scanned': len(pending), 'expired': expired, 'seconds': round(elapsed, 3)}
+
+    def archive_terminal_bookings(self, older_than_days=None, target=None, now=None):
+        """Move completed and cancelled bookings older than N days out of the hot tree
+
+        target 'rtdb' moves them under bookings_archive/ in the database,
+        'local' writes them to gzip JSONL segments under ARCHIVE_DIR. Hot
+        records are only removed once their archived copy is written.
+        """
+        older_than_days = older_than_days if older_than_days is not None else Config.ARCHIVE_AFTER_DAYS
+        target = target or Config.ARCHIVE_TARGET
+        if target not in ['rtdb', 'local']:
+            raise ValueError("Archive target must be 'rtdb' or 'local'")
+
+        now = now or datetime.datetime.utcnow()
+        cutoff = now - datetime.timedelta(days=older_than_days)
+        started = time.monotonic()
+
+        stats = {'scanned': 0, 'archived': 0, 'bytes': 0, 'segments': []}
+        batch = []
+
+        for status in ['completed', 'cancelled']:
+            bookings = self.bookings_ref.order_by_child('status').equal_to(status).get() or {}
+            stats['scanned'] += len(bookings)
+
+            for booking_id, booking in bookings.items():
+                if self._finished_at(booking) > cutoff:
+                    continue
+
+                batch.append((booking_id, booking))
+                if len(batch) >= Config.MAINTENANCE_BATCH_SIZE:
+                    self._archive_batch(batch, target, stats)
+                    batch = []
+
+        if batch:
+            self._archive_batch(batch, target, stats)
+
+        elapsed = time.monotonic() - started
+        stats['seconds'] = round(elapsed, 3)
+        stats['records_per_second'] = round(stats['archived'] / elapsed, 1) if elapsed else 0.0
+        stats['bytes_per_second'] = round(stats['bytes'] / elapsed, 1) if elapsed else 0.0
+
+        logger.info(
+            f"Archived {stats['archived']} of {stats['scanned']} terminal bookings to {target} "
+            f"in {elapsed:.2f}s ({stats['records_per_second']} records/s, {stats['bytes']} bytes)"
+        )
+        return stats
+
+    def run(self, archive_days=None, archive_target=None):
+        """Run one full maintenance pass"""
+        return {
+            'expiry': self.expire_stale_pending(),
+            'archive': self.archive_terminal_bookings(archive_days, archive_target)
+        }
+
+    def _finished_at(self, booking):
+        """Best known time a terminal booking stopped changing"""
+        for field in ['updated_at', 'end_time', 'created_at']:
+            if booking.get(field):
+                return self.booking_service._parse_datetime_safe(booking[field])
+        return datetime.datetime.utcnow()
+
+    def _archive_batch(self, batch, target, stats):
+        """Archive one batch of bookings and drop them from the hot tree"""
+        updates = {}
+        if target == 'local':
+            stats['segments'].append(self._write_segment(batch, stats))
+        else:
+            for booking_id, booking in batch:
+                month = self._finished_at(booking).strftime('%Y-%m')
+                updates[self.firebase.lot_path(self.lot_id, f'bookings_archive/{month}/{booking_id}')] = booking
+                stats['bytes'] += len(json.dumps(booking))
+
+        # Moving within the database is one atomic multi-path update
+        for booking_id, booking in batch:
+            updates[self.firebase.lot_path(self.lot_id, f'bookings/{booking_id}')] = None
+            if booking.get('user_id'):
+                # The history index keeps the entry, pointing at where the booking went
+                index_path = f'user_bookings/{booking["user_id"]}/{booking_id}'
+                if target == 'local':
+                    updates[f'{index_path}/archived'] = 'local'
+                    updates[f'{index_path}/summary'] = {
+                        field: booking.get(field) for field in ARCHIVE_SUMMARY_FIELDS if booking.get(field) is not None
+                    }
+                else:
+                    updates[f'{index_path}/archived'] = self._finished_at(booking).strftime('%Y-%m')
+        self.firebase.get_db_reference().update(updates)
+
+        stats['archived'] += len(batch)
+
+    def _write_segment(self, batch, stats):
+        """Write a batch to a new gzip JSONL segment and return its path"""
+        os.makedirs(Config.ARCHIVE_DIR, exist_ok=True)
+        timestamp = datetime.datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')
+        path = os.path.join(Config.ARCHIVE_DIR, f'bookings-{self.lot_id or "default"}-{timestamp}.jsonl.gz')
+
+        with gzip.open(path, 'wt', encoding='utf-8') as segment:
+            for booking_id, booking in batch:
+                line = json.dumps(dict(booking, booking_id=booking_id), separators=(',', ':'))
+                segment.write(line + '\n')
+                stats['bytes'] += len(line) + 1
+
+        # Make sure the segment is on disk before the hot copies are deleted
+        with open(path, 'rb') as written:
+            os.fsync(written.fileno())
+
+        return path
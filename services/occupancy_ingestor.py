@@ -0,0 +1,217 @@
+import atexit
+import datetime
+import os
+import threading
+from services.event_bus import EventBus
+from services.firebase_service import FirebaseService
+from services.slot_catalog import SlotCatalog
+from config import Config
+import logging
+
+logger = logging.getLogger(__name__)
+
+class OccupancyIngestor:
+    """Turns raw sensor readings into occupancy writes, shared per process and lot
+
+    A reading only changes a slot once the new state has held for
+    SENSOR_DEBOUNCE_SECONDS, so flapping sensors are ignored. Changes are
+    buffered and written together at most every SENSOR_FLUSH_INTERVAL_SECONDS,
+    and only when they differ from what was last written. A background
+    flusher settles and writes changes between readings, and once more at
+    exit, so sensors that only report on change are written too.
+
+    Debounce state lives in this process. Occupancy ingestion must reach a
+    single process (WEB_CONCURRENCY=1 on the instance sensors post to), or
+    readings of one slot are split across workers that debounce separately.
+    """
+    _ingestors = {}
+    _lock = threading.Lock()
+    _flusher = None
+
+    def __init__(self, lot_id=None):
+        self.lot_id = lot_id
+        self.firebase = FirebaseService()
+        # slot_id -> {'value', 'written', 'candidate', 'since', 'seen_at'}
+        self._slots = {}
+        self._changed = set()
+        self._last_flush = None
+        self._state_lock = threading.Lock()
+
+    @classmethod
+    def for_lot(cls, lot_id=None):
+        """Get the ingestor of a lot"""
+        with cls._lock:
+            ingestor = cls._ingestors.get(lot_id)
+            if ingestor is None:
+                ingestor = cls._ingestors[lot_id] = cls(lot_id)
+            if cls._flusher is None:
+                cls._flusher = OccupancyFlusher()
+                cls._flusher.start()
+            return ingestor
+
+    @classmethod
+    def flush_all(cls, now=None, settled_only=True):
+        """Write the pending changes of every lot; settled_only keeps to the flush interval"""
+        with cls._lock:
+            ingestors = list(cls._ingestors.values())
+        for ingestor in ingestors:
+            try:
+                if settled_only:
+                    ingestor.flush_due(now)
+                else:
+                    ingestor.flush(now)
+            except Exception as e:
+                logger.error(f"Occupancy flush failed for lot {ingestor.lot_id or 'default'}: {str(e)}")
+
+    def ingest(self, readings, now=None):
+        """Apply a batch of {slot_id, occupied, timestamp?} readings and flush if due"""
+        now = now or datetime.datetime.utcnow()
+        catalog = SlotCatalog.for_lot(self.lot_id)
+        stats = {'accepted': 0, 'rejected': 0, 'ignored': 0}
+
+        with self._state_lock:
+            for reading in readings:
+                try:
+                    slot_id, occupied, at = self._parse_reading(reading, now)
+                except ValueError:
+                    stats['rejected'] += 1
+                    continue
+
+                slot = catalog.get(slot_id)
+                if slot is None:
+                    stats['rejected'] += 1
+                    continue
+
+                if self._observe(slot_id, slot, occupied, at):
+                    stats['accepted'] += 1
+                else:
+                    stats['ignored'] += 1
+
+            self._promote(now)
+            changes = self._flush_due(now)
+
+        stats['changes'] = changes
+        stats['flushed'] = len(changes)
+        stats['pending'] = len(self._changed)
+        return stats
+
+    def flush_due(self, now=None):
+        """Settle debounced changes and write them if the flush interval has passed"""
+        now = now or datetime.datetime.utcnow()
+        with self._state_lock:
+            self._promote(now)
+            return self._flush_due(now)
+
+    def flush(self, now=None):
+        """Write every debounced change now"""
+        now = now or datetime.datetime.utcnow()
+        with self._state_lock:
+            self._promote(now)
+            return self._write(now)
+
+    def _parse_reading(self, reading, now):
+        if not isinstance(reading, dict) or not reading.get('slot_id'):
+            raise ValueError('slot_id is required')
+
+        occupied = reading.get('occupied')
+        if occupied not in [True, False, 0, 1]:
+            raise ValueError('occupied must be a boolean')
+
+        at = now
+        if reading.get('timestamp'):
+            at = datetime.datetime.fromisoformat(str(reading['timestamp']).replace('Z', '+00:00'))
+            if at.tzinfo is not None:
+                at = at.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+            # Sensor clocks drift; never let a reading claim to be from the future
+            at = min(at, now)
+
+        return str(reading['slot_id']), int(bool(occupied)), at
+
+    def _observe(self, slot_id, slot, occupied, at):
+        """Track one reading; returns False for a reading older than the last one seen"""
+        state = self._slots.get(slot_id)
+        if state is None:
+            current = int(slot.get('current_occupancy', 0) == 1)
+            state = self._slots[slot_id] = {
+                'value': current, 'written': current, 'candidate': None, 'since': None, 'seen_at': None
+            }
+
+        if state['seen_at'] is not None and at < state['seen_at']:
+            return False
+        state['seen_at'] = at
+
+        if occupied == state['value']:
+            # The slot flapped back before the change settled
+            state['candidate'], state['since'] = None, None
+        elif occupied != state['candidate']:
+            state['candidate'], state['since'] = occupied, at
+        return True
+
+    def _promote(self, now):
+        """Accept candidate states that have held for the debounce period"""
+        debounce = datetime.timedelta(seconds=Config.SENSOR_DEBOUNCE_SECONDS)
+        for slot_id, state in self._slots.items():
+            if state['candidate'] is not None and now - state['since'] >= debounce:
+                state['value'] = state['candidate']
+                state['candidate'], state['since'] = None, None
+                self._changed.add(slot_id)
+
+    def _flush_due(self, now):
+        interval = datetime.timedelta(seconds=Config.SENSOR_FLUSH_INTERVAL_SECONDS)
+        if self._last_flush is not None and now - self._last_flush < interval:
+            return []
+        return self._write(now)
+
+    def _write(self, now):
+        """Write the changed slots in one multi-path update; returns the changes"""
+        self._last_flush = now
+        changes = []
+        updates = {}
+        for slot_id in sorted(self._changed):
+            state = self._slots[slot_id]
+            # A change that was undone before the flush is not written at all
+            if state['value'] == state['written']:
+                continue
+            updates[self.firebase.lot_path(self.lot_id, f'slots/{slot_id}/current_occupancy')] = state['value']
+            updates[self.firebase.lot_path(self.lot_id, f'slots/{slot_id}/occupancy_updated_at')] = now.isoformat()
+            changes.append({'slot_id': slot_id, 'occupied': bool(state['value'])})
+
+        if not updates:
+            self._changed = set()
+            return changes
+
+        # On failure the changes stay pending and go out with the next flush
+        updates.update(SlotCatalog.version_bump(self.lot_id))
+        self.firebase.get_db_reference().update(updates)
+        self._changed = set()
+        for change in changes:
+            self._slots[change['slot_id']]['written'] = int(change['occupied'])
+
+        SlotCatalog.invalidate(self.lot_id)
+        EventBus.publish_updates(updates)
+        logger.info(f"Occupancy flushed for lot {self.lot_id or 'default'}: {len(changes)} slots changed")
+        return changes
+
+class OccupancyFlusher:
+    """Background thread flushing every ingestor each SENSOR_FLUSH_INTERVAL_SECONDS and at exit"""
+
+    def __init__(self, interval=None):
+        self.interval = interval or Config.SENSOR_FLUSH_INTERVAL_SECONDS
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='occupancy-flusher', daemon=True)
+
+    def start(self):
+        if int(os.getenv('WEB_CONCURRENCY', 1)) > 1:
+            logger.warning("Occupancy ingestion is running with several workers; debouncing is per process")
+        self._thread.start()
+        # Registered after logging's own atexit hook, so it runs while logging still works
+        atexit.register(self.stop)
+
+    def stop(self):
+        # A recycled worker writes what has settled instead of dropping it
+        self._stop.set()
+        OccupancyIngestor.flush_all(settled_only=False)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            OccupancyIngestor.flush_all()
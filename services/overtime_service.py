@@ -0,0 +1,133 @@
+import datetime
+from services.firebase_service import FirebaseService
+from services.booking_service import BookingService
+from config import Config
+import logging
+
+logger = logging.getLogger(__name__)
+
+def overtime_paid_amount(booking):
+    """Total of a booking's completed overtime payments"""
+    payments = booking.get('overtime_payments')
+    if payments:
+        return round(sum(float(amount or 0) for amount in payments.values()), 2)
+    # Bookings settled before payments were recorded per reference
+    return float(booking.get('overtime_amount_paid') or 0)
+
+def intent_covers(booking, owed):
+    """Check a booking's pending overtime intent can settle what it owes now
+
+    The intent must be unpaid, issued since the last overtime payment, and
+    for at least the amount owed.
+    """
+    reference = booking.get('overtime_payment_reference')
+    if not reference or reference in (booking.get('overtime_payments') or {}):
+        return False
+    if booking.get('overtime_intent_paid') != overtime_paid_amount(booking):
+        return False
+    return float(booking.get('overtime_intent_amount') or 0) >= owed['amount']
+
+class OvertimeService:
+    """Single source of overtime charges for the gates, payments and reports
+
+    Overtime runs from a booking's end time and is billed at the booking's
+    own hourly rate once the grace period has passed.
+    """
+
+    def __init__(self, lot_id=None):
+        self.firebase = FirebaseService()
+        self.lot_id = lot_id
+        self.bookings_ref = self.firebase.get_db_reference(self.firebase.lot_path(lot_id, 'bookings'))
+        self.booking_service = BookingService(lot_id)
+
+    def evaluate(self, bookings, now=None):
+        """Overtime charges of many bookings in one pass, keyed by booking ID
+
+        bookings maps booking IDs to records. Only bookings past their grace
+        period are returned.
+        """
+        now = now or datetime.datetime.now()
+        grace_seconds = Config.GRACE_PERIOD_MINUTES * 60
+
+        # Column-wise pass: parse each field once, then compute over whole lists
+        booking_ids = [booking_id for booking_id, booking in bookings.items() if booking.get('end_time')]
+        over_seconds = [
+            (now - self.booking_service._parse_datetime_safe(bookings[booking_id]['end_time'])).total_seconds()
+            for booking_id in booking_ids
+        ]
+        rates = [float(bookings[booking_id].get('rate_per_hour') or Config.DEFAULT_PARKING_RATE) for booking_id in booking_ids]
+
+        return {
+            booking_id: self._charge(seconds, rate)
+            for booking_id, seconds, rate in zip(booking_ids, over_seconds, rates)
+            if seconds > grace_seconds
+        }
+
+    def quote(self, booking, now=None):
+        """Overtime charge of one booking, with overtime_required False within the grace period"""
+        charge = self.evaluate({'booking': booking}, now).get('booking')
+        if charge is None:
+            return {'overtime_required': False, 'amount': 0}
+        return dict(charge, overtime_required=True)
+
+    def outstanding(self, booking, now=None):
+        """Overtime still owed on a booking: the current quote less its completed overtime payments
+
+        A payment covers the overtime quoted when it landed (overtime_paid_through);
+        within the grace period after that the quote is held at that time, so
+        the driver can reach the exit gate without owing a few more minutes.
+        """
+        now = now or datetime.datetime.now()
+        paid_through = booking.get('overtime_paid_through')
+        if paid_through:
+            paid_through = self.booking_service._parse_datetime_safe(paid_through)
+            if paid_through <= now <= paid_through + datetime.timedelta(minutes=Config.GRACE_PERIOD_MINUTES):
+                now = paid_through
+
+        quote = self.quote(booking, now)
+        if not quote['overtime_required']:
+            return quote
+
+        paid = overtime_paid_amount(booking)
+        due = max(0.0, round(quote['amount'] - paid, 2))
+        return dict(quote, amount=due, quoted_amount=quote['amount'], paid_amount=paid, overtime_required=due > 0)
+
+    def get_overdue(self, now=None):
+        """in_use bookings past their grace period, longest overstay first"""
+        in_use = self.bookings_ref.order_by_child('status').equal_to('in_use').get() or {}
+        charges = self.evaluate(in_use, now)
+
+        overdue = []
+        for booking_id, charge in charges.items():
+            booking = in_use[booking_id]
+            # amount is what is still owed; quoted_amount the whole overstay
+            owed = self.outstanding(booking, now)
+            overdue.append(dict(
+                charge,
+                amount=owed['amount'],
+                quoted_amount=charge['amount'],
+                paid_amount=overtime_paid_amount(booking),
+                booking_id=booking_id,
+                lot_id=self.lot_id,
+                user_id=booking.get('user_id'),
+                slot_id=booking.get('slot_id'),
+                end_time=booking.get('end_time'),
+                overtime_paid=not owed['overtime_required'],
+                overtime_payment_reference=booking.get('overtime_payment_reference'),
+                overtime_intent_amount=booking.get('overtime_intent_amount'),
+                overtime_intent_paid=booking.get('overtime_intent_paid'),
+                overtime_intent_at=booking.get('overtime_intent_at')
+            ))
+
+        overdue.sort(key=lambda item: item['overtime_minutes'], reverse=True)
+        return overdue
+
+    def _charge(self, seconds, rate):
+        overtime_hours = seconds / 3600
+        return {
+            'amount': round(overtime_hours * rate, 2),
+            'duration_hours': round(overtime_hours, 2),
+            'overtime_minutes': round(seconds / 60, 1),
+            'overtime_duration': str(datetime.timedelta(seconds=int(seconds))),
+            'rate_per_hour': rate
+        }
@@ -1,26 +1,40 @@
 import datetime
 from services.firebase_service import FirebaseService
 from services.booking_service import BookingService
-from config import Config
+from services.event_bus import EventBus
+from services.overtime_service import OvertimeService, intent_covers
+from services.payment_service import PaymentService
+from services.slot_catalog import SlotCatalog
+from utils.geo import validate_coordinates
+from utils.pagination import decode_cursor, encode_cursor
 import logging
 
 logger = logging.getLogger(__name__)
 
 class ParkingService:
-    def __init__(self):
+    def __init__(self, lot_id=None):
         self.firebase = FirebaseService()
-        self.slots_ref = self.firebase.get_db_reference('slots')
-        self.bookings_ref = self.firebase.get_db_reference('bookings')
-        self.booking_service = BookingService()
+        self.lot_id = lot_id
+        self.slots_ref = self.firebase.get_db_reference(self.firebase.lot_path(lot_id, 'slots'))
+        self.bookings_ref = self.firebase.get_db_reference(self.firebase.lot_path(lot_id, 'bookings'))
+        self.booking_service = BookingService(lot_id)
+        self.overtime_service = OvertimeService(lot_id)
     
     def validate_qr_code(self, qr_data):
         """Validate QR code for parking entry/exit"""
-        # Parse QR code data
+        # Parse QR code data (bookings in a named lot carry the lot as a fifth part)
         parts = qr_data.split(':')
-        if len(parts) != 4 or parts[0] != 'PARKING':
+        if len(parts) not in [4, 5] or parts[0] != 'PARKING':
             raise ValueError('Invalid QR code format')
         
-        _, booking_id, user_id, slot_id = parts
+        _, booking_id, user_id, slot_id = parts[:4]
+        qr_lot_id = parts[4] if len(parts) == 5 else None
+        
+        if qr_lot_id != self.lot_id:
+            # A gate without a configured lot trusts the lot in the QR code
+            if self.lot_id is None and qr_lot_id:
+                return ParkingService(qr_lot_id).validate_qr_code(qr_data)
+            raise ValueError('QR code is for a different parking lot')
         
         # Get booking details
         booking = self.booking_service.get_booking_by_id(booking_id)
@@ -33,8 +47,6 @@ class ParkingService:
         
         now = datetime.datetime.now()
         start_time = datetime.datetime.fromisoformat(booking['start_time'])
-        end_time = datetime.datetime.fromisoformat(booking['end_time'])
-        grace_period = datetime.timedelta(minutes=Config.GRACE_PERIOD_MINUTES)
         
         # Handle different booking statuses
         if booking['status'] == 'confirmed':
@@ -46,7 +58,7 @@ class ParkingService:
             self.booking_service.update_booking_status(booking_id, 'in_use', {
                 'actual_entry_time': now.isoformat(),
                 'scan_count': 1
-            })
+            }, booking=booking)
             
             logger.info(f"Entry granted for booking: {booking_id}")
             return {
@@ -62,12 +74,10 @@ class ParkingService:
             if scan_count >= 2:
                 raise ValueError('Booking already completed')
             
-            # Check for overtime
-            overtime_required = now > end_time + grace_period
-            if overtime_required and not booking.get('overtime_paid', False):
-                overtime_duration = now - end_time
-                overtime_hours = overtime_duration.total_seconds() / 3600
-                overtime_amount = round(overtime_hours * Config.DEFAULT_PARKING_RATE, 2)
+            # Check for overtime, billed at the booking's own rate, less what was already paid
+            overtime = self.overtime_service.outstanding(booking, now)
+            if overtime['overtime_required']:
+                overtime_amount = overtime['amount']
                 
                 return {
                     'status': 'overtime_due',
@@ -75,14 +85,15 @@ class ParkingService:
                     'open_barrier': False,
                     'overtime': True,
                     'overtime_amount': overtime_amount,
-                    'overtime_duration': str(overtime_duration).split('.')[0]  # Remove microseconds
+                    'overtime_duration': overtime['overtime_duration'],
+                    'overtime_payment_reference': self._overtime_reference(booking_id, booking, overtime)
                 }
             
             # Allow exit and complete booking
             self.booking_service.update_booking_status(booking_id, 'completed', {
                 'actual_exit_time': now.isoformat(),
                 'scan_count': scan_count + 1
-            })
+            }, booking=booking)
             
             logger.info(f"Exit granted for booking: {booking_id}")
             return {
@@ -101,6 +112,18 @@ class ParkingService:
         else:
             raise ValueError(f'Invalid booking status: {booking["status"]}')
     
+    def _overtime_reference(self, booking_id, booking, overtime):
+        """Reference of a payment that settles the overtime owed now, issuing one if needed"""
+        if intent_covers(booking, overtime):
+            return booking['overtime_payment_reference']
+        
+        # The pre-issued intent is missing, paid, or sized for a smaller overstay
+        try:
+            return PaymentService(self.lot_id).issue_overtime_intent(booking_id, booking, overtime)['reference']
+        except Exception as e:
+            logger.error(f"Overtime intent at the gate failed for booking {booking_id}: {str(e)}")
+            return None
+    
     def get_all_slots(self):
         """Get all parking slots"""
         slots = self.slots_ref.get() or {}
@@ -113,8 +136,38 @@ class ParkingService:
         
         return slots_list
     
-    def create_slot(self, location, description, rate_per_hour):
-        """Create a new parking slot"""
+    def get_slots_page(self, limit, cursor=None):
+        """Get one key-ordered page of slots and the cursor of the next page"""
+        after = decode_cursor(cursor).get('k') if cursor else None
+        
+        query = self.slots_ref.order_by_key()
+        if after is not None:
+            # start_at is inclusive, so ask for one extra to skip the cursor's own slot
+            query = query.start_at(after)
+        page = query.limit_to_first(limit + (2 if after is not None else 1)).get() or {}
+        
+        items = [(slot_id, slot_data) for slot_id, slot_data in page.items() if slot_id != after]
+        next_cursor = encode_cursor({'k': items[limit - 1][0]}) if len(items) > limit else None
+        
+        slots_list = []
+        for slot_id, slot_data in items[:limit]:
+            slot_info = slot_data.copy()
+            slot_info['slot_id'] = slot_id
+            slots_list.append(slot_info)
+        
+        return slots_list, next_cursor
+    
+    def iter_slots(self, page_size):
+        """Yield every slot, reading one page at a time"""
+        cursor = None
+        while True:
+            slots, cursor = self.get_slots_page(page_size, cursor)
+            yield from slots
+            if not cursor:
+                return
+    
+    def create_slot(self, location, description, rate_per_hour, latitude=None, longitude=None):
+        """Create a new parking slot, optionally with its coordinates"""
         if not location or not location.strip():
             raise ValueError('Location is required')
         
@@ -125,6 +178,12 @@ class ParkingService:
         except (ValueError, TypeError):
             raise ValueError('Invalid rate per hour')
         
+        # Coordinates are optional but must come as a pair
+        if (latitude is None) != (longitude is None):
+            raise ValueError('Latitude and longitude must be given together')
+        if latitude is not None:
+            latitude, longitude = validate_coordinates(latitude, longitude)
+        
         # Generate slot ID
         import uuid
         slot_id = str(uuid.uuid4())
@@ -136,8 +195,16 @@ class ParkingService:
             'is_active': True,
             'created_at': datetime.datetime.utcnow().isoformat()
         }
+        if latitude is not None:
+            slot_data['latitude'] = latitude
+            slot_data['longitude'] = longitude
         
-        self.slots_ref.child(slot_id).set(slot_data)
+        self.firebase.get_db_reference().update(dict(
+            {self.firebase.lot_path(self.lot_id, f'slots/{slot_id}'): slot_data},
+            **SlotCatalog.version_bump(self.lot_id)
+        ))
+        SlotCatalog.invalidate(self.lot_id)
+        EventBus.publish(self.lot_id, 'slot', dict(slot_data, slot_id=slot_id))
         
         logger.info(f"New parking slot created: {slot_id}")
         return {
@@ -151,10 +218,12 @@ class ParkingService:
         if not slot:
             raise ValueError('Slot not found')
         
-        self.slots_ref.child(slot_id).update({
-            'is_active': is_active,
-            'updated_at': datetime.datetime.utcnow().isoformat()
-        })
+        self.firebase.get_db_reference().update(dict({
+            self.firebase.lot_path(self.lot_id, f'slots/{slot_id}/is_active'): is_active,
+            self.firebase.lot_path(self.lot_id, f'slots/{slot_id}/updated_at'): datetime.datetime.utcnow().isoformat()
+        }, **SlotCatalog.version_bump(self.lot_id)))
+        SlotCatalog.invalidate(self.lot_id)
+        EventBus.publish(self.lot_id, 'slot', {'slot_id': slot_id, 'is_active': is_active})
         
         status = 'activated' if is_active else 'deactivated'
         logger.info(f"Slot {slot_id} {status}")
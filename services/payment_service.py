@@ -1,19 +1,30 @@
-from datetime import datetime
-import requests
+from datetime import datetime, timedelta
 from config import Config
 from services.booking_service import BookingService
+from services.event_bus import EventBus
 from services.firebase_service import FirebaseService
+from services.overtime_service import OvertimeService, overtime_paid_amount
 from services.qr_service import QRService
+from services.rollup_service import increment_updates, merge_updates, payment_deltas, rollup_day
+from utils.deadline import call_timeout, check_deadline, suspended_deadline
+from utils.lazy_import import LazyModule
+from utils.metrics import track_backend
 import logging
 
 logger = logging.getLogger(__name__)
 
+# The HTTP client stack loads on the first Paystack call rather than at startup
+requests = LazyModule('requests')
+
 class PaymentService:
-    def __init__(self):
-        self.booking_service = BookingService()
+    def __init__(self, lot_id=None):
+        self.lot_id = lot_id
+        self.booking_service = BookingService(lot_id)
         self.firebase = FirebaseService()
         self.qr_service = QRService()
-        self.bookings_ref = self.firebase.get_db_reference('bookings')
+        self.overtime_service = OvertimeService(lot_id)
+        self.bookings_ref = self.firebase.get_db_reference(self.firebase.lot_path(lot_id, 'bookings'))
+        # Payments stay global, keyed by Paystack reference; records remember their lot
         self.payments_ref = self.firebase.get_db_reference('payments')
     
     def initiate_payment(self, booking_id, email):
@@ -52,8 +63,8 @@ class PaymentService:
             # Get Paystack base URL with fallback
             paystack_base_url = getattr(Config, 'PAYSTACK_BASE_URL', 'https://api.paystack.co')
             
-            response = requests.post(
-                f'{paystack_base_url}/transaction/initialize',
+            response = self._paystack_request(
+                'initialize', 'post', f'{paystack_base_url}/transaction/initialize',
                 json=payload,
                 headers=headers,
                 timeout=30
@@ -72,6 +83,7 @@ class PaymentService:
                 'amount': booking['total_amount'],
                 'status': 'pending',
                 'paystack_reference': payment_data['reference'],
+                'lot_id': self.lot_id,
                 'created_at': datetime.utcnow().isoformat()
             }
             
@@ -88,84 +100,318 @@ class PaymentService:
     
     def handle_payment_callback(self, reference):
         """Handle payment callback from Paystack"""
-        # Verify payment with Paystack
+        try:
+            # Verify payment with Paystack
+            payment_data = self.verify_transaction(reference)
+            if payment_data is None:
+                raise Exception("Payment verification failed")
+            
+            if payment_data['status'] != 'success':
+                raise Exception("Payment was not successful")
+            
+            # Paystack has taken the money, so recording it must not be cut short
+            with suspended_deadline():
+                payment_record = self.payments_ref.child(reference).get()
+                if not payment_record:
+                    raise Exception("Payment record not found")
+                
+                # Payment and booking changes land together in one multi-path update
+                updates, result = self._build_finalization(reference, payment_record, payment_data)
+                self.firebase.get_db_reference().update(updates)
+            EventBus.publish_updates(updates)
+            
+            if result.get('status') == 'needs_refund':
+                logger.warning(f"Payment {reference} arrived for cancelled bookings and needs a refund")
+            else:
+                logger.info(f"Payment completed: {reference}")
+            
+            return result
+            
+        except requests.RequestException as e:
+            logger.error(f"Payment verification network error: {str(e)}")
+            raise Exception("Payment verification failed")
+
+    def _paystack_request(self, operation, method, url, timeout=30, **kwargs):
+        """Call the Paystack API, recorded as a backend call and bounded by the request's deadline"""
+        timeout = call_timeout(timeout, f'paystack.{operation}')
+        with track_backend('paystack', operation) as call:
+            try:
+                response = requests.request(method, url, timeout=timeout, **kwargs)
+            except requests.Timeout:
+                # Cut short by the request's own deadline rather than a slow Paystack
+                check_deadline(f'paystack.{operation}')
+                raise
+            call.size += len(response.content)
+            return response
+    
+    def verify_transaction(self, reference):
+        """Look a transaction up on Paystack; returns its data, or None if Paystack doesn't know it"""
         headers = {
             'Authorization': f'Bearer {Config.PAYSTACK_SECRET_KEY}'
         }
         
+        # Get Paystack base URL with fallback
+        paystack_base_url = getattr(Config, 'PAYSTACK_BASE_URL', 'https://api.paystack.co')
+        
+        response = self._paystack_request(
+            'verify', 'get', f'{paystack_base_url}/transaction/verify/{reference}',
+            headers=headers,
+            timeout=30
+        )
+        
+        if response.status_code in [400, 404]:
+            return None
+        if response.status_code != 200:
+            raise Exception("Payment verification failed")
+        
+        return response.json()['data']
+    
+    def _build_finalization(self, reference, payment_record, payment_data):
+        """Build the updates that complete a verified payment and confirm its bookings
+        
+        Returns the root-relative multi-path update and the callback result,
+        so callers can write it straight away or batch it with others.
+        """
+        # The bookings live in the lot the payment was started for
+        booking_service = BookingService(payment_record.get('lot_id'))
+        
+        if payment_record.get('type') == 'overtime':
+            return self._build_overtime_finalization(reference, payment_record, payment_data, booking_service)
+        
+        group_id = payment_record.get('booking_group_id')
+        if group_id:
+            bookings = booking_service.get_group_bookings(group_id)
+        else:
+            booking_id = payment_record['booking_id']
+            bookings = {booking_id: booking_service.get_booking_by_id(booking_id)}
+        
+        # Expiry may have cancelled the bookings and released their slot before a late payment landed
+        if payment_record.get('status') != 'completed' and any(
+            booking.get('status') == 'cancelled' for booking in bookings.values()
+        ):
+            return self._build_refund_required(reference, payment_record, payment_data)
+        
+        # Update payment status - FIXED: Use datetime instead of datetime.datetime
+        updates = {
+            f'payments/{reference}/status': 'completed',
+            f'payments/{reference}/completed_at': datetime.utcnow().isoformat(),
+            f'payments/{reference}/paystack_data': payment_data
+        }
+        
+        # A repeated callback, or one racing reconciliation, must not count the same revenue twice
+        count_revenue = payment_record.get('status') != 'completed' and self._claim_revenue(reference)
+        
+        confirmed = []
+        for booking_id, booking in bookings.items():
+            qr_data, qr_base64 = self._generate_booking_qr(booking_id, booking)
+            
+            # Update booking with QR data and image
+            merge_updates(updates, booking_service.build_status_updates(booking_id, 'confirmed', {
+                'qr_data': qr_data,
+                'qr_image_base64': qr_base64,
+                'payment_reference': reference,
+                'paid_at': datetime.utcnow().isoformat()
+            }, booking=booking))
+            confirmed.append({'booking_id': booking_id, 'qr_data': qr_data, 'qr_image': qr_base64})
+            
+            if count_revenue:
+                # Group payments are split at each booking's own price
+                amount = booking.get('total_amount') if group_id else payment_record.get('amount')
+                deltas = payment_deltas(payment_record.get('type'), amount)
+                merge_updates(updates, increment_updates(
+                    booking_service.lot_id, rollup_day(booking, payment_record.get('created_at')), booking.get('slot_id'), deltas
+                ))
+        
+        if group_id:
+            result = {
+                'message': 'Payment successful',
+                'booking_group_id': group_id,
+                'bookings': [{'booking_id': b['booking_id'], 'qr_data': b['qr_data']} for b in confirmed]
+            }
+        else:
+            result = {
+                'message': 'Payment successful',
+                'booking_id': confirmed[0]['booking_id'],
+                'qr_data': confirmed[0]['qr_data'],
+                'qr_image': confirmed[0]['qr_image']
+            }
+        
+        return updates, result
+    
+    def _claim_revenue(self, reference):
+        """Atomically mark a payment's revenue as counted; True only for the caller that marked it
+        
+        The status read before finalizing is not transactional, so a callback
+        and reconciliation can both see a pending payment. Only the winner of
+        this transaction adds the rollup increments.
+        """
+        won = []
+        
+        def claim(counted):
+            # The transaction may be retried, so start from a clean result each run
+            won.clear()
+            if counted:
+                return counted
+            won.append(True)
+            return True
+        
+        self.payments_ref.child(reference).child('revenue_counted').transaction(claim)
+        return bool(won)
+    
+    def _build_refund_required(self, reference, payment_record, payment_data):
+        """Build the updates that park a payment for cancelled bookings as needing a refund
+        
+        The slot may have been booked by someone else since, so the bookings
+        are left cancelled rather than confirmed.
+        """
+        updates = {
+            f'payments/{reference}/status': 'needs_refund',
+            f'payments/{reference}/paystack_data': payment_data,
+            f'payments/{reference}/needs_refund_at': datetime.utcnow().isoformat()
+        }
+        result = {
+            'message': 'Payment received after the booking expired. It will be refunded',
+            'status': 'needs_refund',
+            'reference': reference
+        }
+        if payment_record.get('booking_group_id'):
+            result['booking_group_id'] = payment_record['booking_group_id']
+        else:
+            result['booking_id'] = payment_record.get('booking_id')
+        return updates, result
+    
+    def _build_overtime_finalization(self, reference, payment_record, payment_data, booking_service):
+        """Build the updates that settle a verified overtime payment
+        
+        Each payment is recorded under the booking's overtime_payments. While
+        the booking is in_use it only counts as overtime_paid if the payments
+        cover the overtime quoted now; an intent issued earlier may be for less
+        than the overstay has grown to, and the gate then asks for the rest.
+        """
+        booking_id = payment_record['booking_id']
+        booking = booking_service.get_booking_by_id(booking_id)
+        completed_at = datetime.utcnow().isoformat()
+        amount = payment_record.get('amount')
+        
+        booking_path = booking_service._path(f'bookings/{booking_id}')
+        updates = {
+            f'payments/{reference}/status': 'completed',
+            f'payments/{reference}/completed_at': completed_at,
+            f'payments/{reference}/paystack_data': payment_data,
+            f'{booking_path}/overtime_payments/{reference}': amount,
+            f'{booking_path}/overtime_paid_at': completed_at,
+            f'{booking_path}/overtime_payment_reference': reference
+        }
+        
+        # Keyed by reference, so a repeated callback records the same payment once
+        settled = dict(booking, overtime_payments=dict(booking.get('overtime_payments') or {}, **{reference: amount}))
+        updates[f'{booking_path}/overtime_amount_paid'] = overtime_paid_amount(settled)
+        
+        overtime_paid = True
+        if booking.get('status') == 'in_use':
+            # Quoted on the gate's clock, which also reads overtime_paid_through
+            quoted_at = datetime.now()
+            owed = OvertimeService(booking_service.lot_id).outstanding(dict(settled, overtime_paid_through=None), quoted_at)
+            overtime_paid = not owed['overtime_required']
+            updates[f'{booking_path}/overtime_paid_through'] = quoted_at.isoformat()
+        updates[f'{booking_path}/overtime_paid'] = overtime_paid
+        
+        if payment_record.get('status') != 'completed' and self._claim_revenue(reference):
+            deltas = payment_deltas('overtime', amount)
+            merge_updates(updates, increment_updates(
+                booking_service.lot_id, rollup_day(booking, payment_record.get('created_at')), booking.get('slot_id'), deltas
+            ))
+        
+        result = {
+            'message': 'Overtime payment successful' if overtime_paid else 'Overtime payment received, more overtime is due',
+            'booking_id': booking_id,
+            'overtime_paid': overtime_paid
+        }
+        if not overtime_paid:
+            result['overtime_due'] = owed['amount']
+        return updates, result
+    
+    def _generate_booking_qr(self, booking_id, booking):
+        """Generate the gate QR code data and image for a paid booking"""
+        qr_data = f'PARKING:{booking_id}:{booking.get("user_id", "")}:{booking.get("slot_id", "")}'
+        if booking.get('lot_id'):
+            qr_data += f':{booking["lot_id"]}'
+        
+        booking_details = {
+            'booking_reference': booking.get('booking_reference'),
+            'slot_location': booking.get('slot_location'),
+            'start_time': booking.get('start_time'),
+            'end_time': booking.get('end_time'),
+            'total_amount': booking.get('total_amount')
+        }
+        
+        qr_image = self.qr_service.generate_qr_code(qr_data, booking_details)
+        return qr_data, self.qr_service.qr_to_base64(qr_image)
+    
+    def initiate_group_payment(self, group_id, bookings, email):
+        """Initiate one Paystack payment covering every booking of a bulk booking"""
+        total_amount = round(sum(booking['total_amount'] for booking in bookings), 2)
+        amount_kobo = int(round(total_amount * 100))  # Convert to kobo
+        
+        frontend_url = getattr(Config, 'FRONTEND_URL', 'http://localhost:3000')
+        
+        payload = {
+            'email': email,
+            'amount': amount_kobo,
+            'reference': f"bulk_{group_id}_{int(datetime.now().timestamp())}",
+            'callback_url': f"{frontend_url}/payment/callback",
+            'metadata': {
+                'booking_group_id': group_id,
+                'booking_count': len(bookings),
+                'type': 'bulk_booking'
+            }
+        }
+        
+        headers = {
+            'Authorization': f'Bearer {Config.PAYSTACK_SECRET_KEY}',
+            'Content-Type': 'application/json'
+        }
+        
         try:
-            # Get Paystack base URL with fallback
             paystack_base_url = getattr(Config, 'PAYSTACK_BASE_URL', 'https://api.paystack.co')
             
-            response = requests.get(
-                f'{paystack_base_url}/transaction/verify/{reference}',
+            response = self._paystack_request(
+                'initialize', 'post', f'{paystack_base_url}/transaction/initialize',
+                json=payload,
                 headers=headers,
                 timeout=30
             )
             
             if response.status_code != 200:
-                raise Exception("Payment verification failed")
+                logger.error(f"Paystack API error: {response.text}")
+                raise Exception("Payment initiation failed")
             
             payment_data = response.json()['data']
             
-            if payment_data['status'] != 'success':
-                raise Exception("Payment was not successful")
+            payment_record = {
+                'booking_group_id': group_id,
+                'booking_ids': [booking['booking_id'] for booking in bookings],
+                'reference': payload['reference'],
+                'amount': total_amount,
+                'status': 'pending',
+                'type': 'bulk',
+                'paystack_reference': payment_data['reference'],
+                'lot_id': self.lot_id,
+                'created_at': datetime.utcnow().isoformat()
+            }
             
-            # After successful payment verification, generate QR code
-            if payment_data['status'] == 'success':
-                # Get payment record
-                payment_record = self.payments_ref.child(reference).get()
-                if not payment_record:
-                    raise Exception("Payment record not found")
-                
-                booking_id = payment_record['booking_id']
-                
-                # Get booking details for QR code
-                booking = self.booking_service.get_booking_by_id(booking_id)
-                
-                # Update payment status - FIXED: Use datetime instead of datetime.datetime
-                self.payments_ref.child(reference).update({
-                    'status': 'completed',
-                    'completed_at': datetime.utcnow().isoformat(),
-                    'paystack_data': payment_data
-                })
-                
-                # Generate QR code data and image
-                qr_data = f'PARKING:{booking_id}:{booking.get("user_id", "")}:{booking.get("slot_id", "")}'
-                
-                # Generate QR code image
-                booking_details = {
-                    'booking_reference': booking.get('booking_reference'),
-                    'slot_location': booking.get('slot_location'),
-                    'start_time': booking.get('start_time'),
-                    'end_time': booking.get('end_time'),
-                    'total_amount': booking.get('total_amount')
-                }
-                
-                qr_image = self.qr_service.generate_qr_code(qr_data, booking_details)
-                qr_base64 = self.qr_service.qr_to_base64(qr_image)
-                
-                # Update booking with QR data and image - FIXED: Use datetime instead of datetime.datetime
-                self.booking_service.update_booking_status(booking_id, 'confirmed', {
-                    'qr_data': qr_data,
-                    'qr_image_base64': qr_base64,
-                    'payment_reference': reference,
-                    'paid_at': datetime.utcnow().isoformat()
-                })
-                
-                logger.info(f"Payment completed for booking: {booking_id}")
-                
-                return {
-                    'message': 'Payment successful',
-                    'booking_id': booking_id,
-                    'qr_data': qr_data,
-                    'qr_image': qr_base64
-                }
+            self.payments_ref.child(payment_data['reference']).set(payment_record)
+            
+            return {
+                'authorization_url': payment_data['authorization_url'],
+                'reference': payment_data['reference'],
+                'amount': total_amount
+            }
             
         except requests.RequestException as e:
-            logger.error(f"Payment verification network error: {str(e)}")
-            raise Exception("Payment verification failed")
-
+            logger.error(f"Group payment initiation network error: {str(e)}")
+            raise Exception("Payment service unavailable")
+    
     def verify_payment_status(self, reference):
         """Verify payment status by reference"""
         payment_record = self.payments_ref.child(reference).get()
@@ -177,41 +423,19 @@ class PaymentService:
             'status': payment_record.get('status'),
             'amount': payment_record.get('amount'),
             'booking_id': payment_record.get('booking_id'),
+            'booking_group_id': payment_record.get('booking_group_id'),
             'created_at': payment_record.get('created_at'),
             'completed_at': payment_record.get('completed_at')
         }
     
     def calculate_overtime_amount(self, booking_id):
-        """Calculate overtime amount for a booking"""
+        """Calculate the overtime a booking still owes"""
         booking = self.booking_service.get_booking_by_id(booking_id)
-        
-        now = datetime.now()
-        end_time = datetime.fromisoformat(booking['end_time'])
-        
-        # Get grace period with fallback
-        grace_period_minutes = getattr(Config, 'GRACE_PERIOD_MINUTES', 15)
-        grace_period = datetime.timedelta(minutes=grace_period_minutes)
-        
-        if now <= end_time + grace_period:
-            return {'overtime_required': False, 'amount': 0}
-        
-        overtime_duration = now - end_time
-        overtime_hours = overtime_duration.total_seconds() / 3600
-        
-        # Get default parking rate with fallback
-        default_rate = getattr(Config, 'DEFAULT_PARKING_RATE', 100.0)
-        overtime_amount = round(overtime_hours * default_rate, 2)
-        
-        return {
-            'overtime_required': True,
-            'amount': overtime_amount,
-            'duration_hours': round(overtime_hours, 2),
-            'rate_per_hour': default_rate
-        }
+        return self.overtime_service.outstanding(booking)
     
-    def process_overtime_payment(self, booking_id, email):
+    def process_overtime_payment(self, booking_id, email, overtime_info=None):
         """Process overtime payment for a booking"""
-        overtime_info = self.calculate_overtime_amount(booking_id)
+        overtime_info = overtime_info or self.calculate_overtime_amount(booking_id)
         
         if not overtime_info['overtime_required']:
             raise ValueError('No overtime payment required')
@@ -242,8 +466,8 @@ class PaymentService:
             # Get Paystack base URL with fallback
             paystack_base_url = getattr(Config, 'PAYSTACK_BASE_URL', 'https://api.paystack.co')
             
-            response = requests.post(
-                f'{paystack_base_url}/transaction/initialize',
+            response = self._paystack_request(
+                'initialize', 'post', f'{paystack_base_url}/transaction/initialize',
                 json=payload,
                 headers=headers,
                 timeout=30
@@ -262,6 +486,7 @@ class PaymentService:
                 'status': 'pending',
                 'type': 'overtime',
                 'paystack_reference': payment_data['reference'],
+                'lot_id': self.lot_id,
                 'created_at': datetime.utcnow().isoformat()
             }
             
@@ -275,4 +500,52 @@ class PaymentService:
             
         except requests.RequestException as e:
             logger.error(f"Overtime payment initiation error: {str(e)}")
-            raise Exception("Overtime payment service unavailable")
\ No newline at end of file
+            raise Exception("Overtime payment service unavailable")
+    
+    def issue_overtime_intent(self, booking_id, booking, owed):
+        """Start an overtime payment for what a booking owes and point the booking at it"""
+        email = self.firebase.get_db_reference('users').child(booking['user_id']).child('email').get()
+        if not email:
+            raise ValueError('User has no email')
+        
+        intent = self.process_overtime_payment(booking_id, email, owed)
+        self.bookings_ref.child(booking_id).update({
+            'overtime_payment_reference': intent['reference'],
+            'overtime_authorization_url': intent['authorization_url'],
+            'overtime_intent_amount': intent['overtime_amount'],
+            # Paid total the intent was sized against; a later payment makes it stale
+            'overtime_intent_paid': owed.get('paid_amount', 0),
+            'overtime_intent_at': datetime.utcnow().isoformat()
+        })
+        return intent
+    
+    def issue_overtime_intents(self, now=None):
+        """Start overtime payments ahead of the exit scan for every overdue booking
+        
+        Bookings with a recent unpaid intent keep it; older intents, and
+        intents sized before a later payment, are replaced so the amount
+        follows what is still owed.
+        """
+        refresh_after = timedelta(minutes=Config.OVERTIME_INTENT_REFRESH_MINUTES)
+        stats = {'overdue': 0, 'issued': 0, 'kept': 0, 'failed': 0}
+        
+        for overdue in self.overtime_service.get_overdue(now):
+            stats['overdue'] += 1
+            if overdue['overtime_paid']:
+                continue
+            
+            issued_at = overdue['overtime_intent_at']
+            if (issued_at and datetime.utcnow() - datetime.fromisoformat(issued_at) < refresh_after
+                    and overdue['overtime_intent_paid'] == overdue['paid_amount']):
+                stats['kept'] += 1
+                continue
+            
+            try:
+                self.issue_overtime_intent(overdue['booking_id'], overdue, dict(overdue, overtime_required=True))
+                stats['issued'] += 1
+            except Exception as e:
+                logger.error(f"Overtime intent failed for booking {overdue['booking_id']}: {str(e)}")
+                stats['failed'] += 1
+        
+        logger.info(f"Overtime intents for lot {self.lot_id or 'default'}: {stats}")
+        return stats
@@ -1,17 +1,22 @@
-import qrcode # type: ignore
 import io
 import base64
-from PIL import Image, ImageDraw, ImageFont
 from config import Config
+from utils.lazy_import import LazyModule
+from utils.metrics import track_backend
 import logging
 
 logger = logging.getLogger(__name__)
 
+# qrcode and Pillow load on the first QR code rather than at startup
+qrcode = LazyModule('qrcode')
+Image = LazyModule('PIL.Image')
+ImageDraw = LazyModule('PIL.ImageDraw')
+ImageFont = LazyModule('PIL.ImageFont')
+
 class QRService:
     def __init__(self):
         self.qr_settings = {
             'version': 1,
-            'error_correction': qrcode.constants.ERROR_CORRECT_L,
             'box_size': 10,
             'border': 4,
         }
@@ -19,17 +24,18 @@ class QRService:
     def generate_qr_code(self, data, booking_details=None):
         """Generate QR code image with optional booking details overlay"""
         try:
-            # Create QR code
-            qr = qrcode.QRCode(**self.qr_settings)
-            qr.add_data(data)
-            qr.make(fit=True)
-            
-            # Create QR code image
-            qr_img = qr.make_image(fill_color="black", back_color="white")
-            
-            # If booking details provided, add them to the image
-            if booking_details:
-                qr_img = self._add_booking_details(qr_img, booking_details)
+            with track_backend('qr', 'render'):
+                # Create QR code
+                qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_L, **self.qr_settings)
+                qr.add_data(data)
+                qr.make(fit=True)
+                
+                # Create QR code image
+                qr_img = qr.make_image(fill_color="black", back_color="white")
+                
+                # If booking details provided, add them to the image
+                if booking_details:
+                    qr_img = self._add_booking_details(qr_img, booking_details)
             
             return qr_img
             
@@ -96,11 +102,12 @@ class QRService:
     
     def qr_to_base64(self, qr_img):
         """Convert QR code image to base64 string"""
-        buffer = io.BytesIO()
-        qr_img.save(buffer, format='PNG')
-        buffer.seek(0)
-        
-        img_base64 = base64.b64encode(buffer.getvalue()).decode()
+        with track_backend('qr', 'encode'):
+            buffer = io.BytesIO()
+            qr_img.save(buffer, format='PNG')
+            buffer.seek(0)
+            
+            img_base64 = base64.b64encode(buffer.getvalue()).decode()
         return f"data:image/png;base64,{img_base64}"
     
     def qr_to_bytes(self, qr_img):
@@ -0,0 +1,188 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import datetime
+import time
+from services.firebase_service import FirebaseService
+from services.booking_service import BookingService
+from services.payment_service import PaymentService
+from services.rollup_service import merge_updates
+from utils.rate_limit import TokenBucket
+from config import Config
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Paystack statuses after which a transaction will never succeed
+FAILED_TRANSACTION_STATUSES = ['failed', 'reversed']
+# Paystack reports a checkout that is still open as abandoned, and may not know
+# one that never started; both only mean failure once the checkout has timed out
+UNFINISHED_TRANSACTION_STATUSES = ['abandoned']
+
+class ReconciliationService:
+    """Settles payments whose Paystack callback never arrived
+
+    Paystack lookups run on a bounded thread pool behind a shared rate
+    limiter; all database writes stay on the calling thread and go out in
+    batched multi-path updates.
+    """
+
+    def __init__(self, workers=None, rate_per_second=None):
+        self.firebase = FirebaseService()
+        self.payments_ref = self.firebase.get_db_reference('payments')
+        self.payment_service = PaymentService()
+        self.workers = workers or Config.RECONCILE_WORKERS
+        self.limiter = TokenBucket(rate_per_second or Config.PAYSTACK_RATE_LIMIT_PER_SECOND)
+
+    def iter_stale_pending(self, older_than_minutes=None, now=None):
+        """Pending payment records created before the threshold, as (reference, record)"""
+        older_than_minutes = older_than_minutes if older_than_minutes is not None else Config.RECONCILE_AFTER_MINUTES
+        cutoff = ((now or datetime.datetime.utcnow()) - datetime.timedelta(minutes=older_than_minutes)).isoformat()
+
+        # Reconciliation keeps the pending set small, so one status query stays cheap
+        pending = self.payments_ref.order_by_child('status').equal_to('pending').get() or {}
+        for reference, record in pending.items():
+            if record.get('created_at') and record['created_at'] <= cutoff:
+                yield reference, record
+
+    def reconcile(self, older_than_minutes=None, now=None):
+        """Verify stale pending payments against Paystack and settle them"""
+        started = time.monotonic()
+        stats = {'checked': 0, 'completed': 0, 'failed': 0, 'still_pending': 0, 'needs_refund': 0, 'errors': 0}
+        updates = {}
+        pending_writes = 0
+
+        for reference, record, payment_data, error in self._verify_all(self.iter_stale_pending(older_than_minutes, now)):
+            stats['checked'] += 1
+            if error is not None:
+                logger.error(f"Reconciliation lookup failed for {reference}: {error}")
+                stats['errors'] += 1
+                continue
+
+            try:
+                outcome, record_updates = self._settle(reference, record, payment_data)
+            except Exception as e:
+                logger.error(f"Reconciliation failed for {reference}: {str(e)}")
+                stats['errors'] += 1
+                continue
+
+            stats[outcome] += 1
+            if record_updates:
+                merge_updates(updates, record_updates)
+                pending_writes += 1
+
+            if pending_writes >= Config.MAINTENANCE_BATCH_SIZE:
+                self.firebase.get_db_reference().update(updates)
+                updates, pending_writes = {}, 0
+
+        if updates:
+            self.firebase.get_db_reference().update(updates)
+
+        elapsed = time.monotonic() - started
+        stats['seconds'] = round(elapsed, 3)
+        stats['checked_per_second'] = round(stats['checked'] / elapsed, 1) if elapsed else 0.0
+        logger.info(f"Reconciled pending payments: {stats}")
+        return stats
+
+    def _verify_all(self, records):
+        """Look records up on Paystack concurrently, yielding (reference, record, data, error)
+
+        At most twice the pool size lookups are in flight, so a large
+        backlog is never loaded into memory at once.
+        """
+        max_in_flight = self.workers * 2
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            in_flight = {}
+            for reference, record in records:
+                in_flight[pool.submit(self._verify, reference)] = (reference, record)
+                if len(in_flight) >= max_in_flight:
+                    yield from self._drain(in_flight)
+
+            while in_flight:
+                yield from self._drain(in_flight)
+
+    def _drain(self, in_flight):
+        done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+        for future in done:
+            reference, record = in_flight.pop(future)
+            try:
+                yield reference, record, future.result(), None
+            except Exception as e:
+                yield reference, record, None, str(e)
+
+    def _verify(self, reference):
+        self.limiter.acquire()
+        return self.payment_service.verify_transaction(reference)
+
+    def _settle(self, reference, record, payment_data):
+        """Outcome and root-relative updates for one verified payment"""
+        now = datetime.datetime.utcnow().isoformat()
+
+        if payment_data is not None and payment_data.get('status') == 'success':
+            # Bookings cancelled for timing out come back as needing a refund
+            updates, result = self.payment_service._build_finalization(reference, record, payment_data)
+            updates[f'payments/{reference}/reconciled_at'] = now
+            return ('needs_refund' if result.get('status') == 'needs_refund' else 'completed'), updates
+
+        status = payment_data.get('status') if payment_data else None
+        unfinished = payment_data is None or status in UNFINISHED_TRANSACTION_STATUSES
+        if status in FAILED_TRANSACTION_STATUSES or (unfinished and self._checkout_expired(record)):
+            updates = {
+                f'payments/{reference}/status': 'failed',
+                f'payments/{reference}/failure_reason': status or 'not_found',
+                f'payments/{reference}/reconciled_at': now
+            }
+            merge_updates(updates, self._release_bookings(reference, record, now))
+            return 'failed', updates
+
+        return 'still_pending', {}
+
+    def _checkout_expired(self, record, now=None):
+        """Check a payment is past the point where its checkout could still complete
+        
+        Booking payments last as long as their pending booking. Overtime
+        intents are pre-issued, so they last until the worker replaces them.
+        """
+        timeout = Config.PENDING_PAYMENT_TIMEOUT_MINUTES
+        if record.get('type') == 'overtime':
+            timeout = max(timeout, Config.OVERTIME_INTENT_REFRESH_MINUTES)
+        cutoff = (now or datetime.datetime.utcnow()) - datetime.timedelta(minutes=timeout)
+        return bool(record.get('created_at')) and record['created_at'] <= cutoff.isoformat()
+    
+    def _record_bookings(self, record):
+        """Booking service and booking IDs a payment record covers"""
+        booking_service = BookingService(record.get('lot_id'))
+        if record.get('booking_ids'):
+            return booking_service, list(record['booking_ids'])
+        return booking_service, [record['booking_id']] if record.get('booking_id') else []
+
+    def _release_bookings(self, reference, record, now):
+        """Cancel the still pending bookings of a failed payment, freeing their slots"""
+        # Overtime payments belong to a booking that is already in use, and
+        # the user may have started a fresh checkout for the same booking
+        if record.get('type') == 'overtime' or self._has_other_live_payment(reference, record):
+            return {}
+
+        booking_service, booking_ids = self._record_bookings(record)
+        updates = {}
+        for booking_id in booking_ids:
+            booking = booking_service.bookings_ref.child(booking_id).get()
+            if booking and booking.get('status') == 'pending':
+                merge_updates(updates, booking_service.build_status_updates(booking_id, 'cancelled', {
+                    'cancel_reason': 'payment_failed',
+                    'cancelled_at': now
+                }, booking=booking))
+        return updates
+
+    def _has_other_live_payment(self, reference, record):
+        """Check if another pending or completed payment covers the same bookings"""
+        if record.get('booking_group_id'):
+            field, value = 'booking_group_id', record['booking_group_id']
+        elif record.get('booking_id'):
+            field, value = 'booking_id', record['booking_id']
+        else:
+            return False
+
+        others = self.payments_ref.order_by_child(field).equal_to(value).get() or {}
+        return any(
+            other_reference != reference and other.get('status') in ['pending', 'completed']
+            for other_reference, other in others.items()
+        )
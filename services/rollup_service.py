@@ -0,0 +1,217 @@
+import datetime
+import gzip
+import json
+import os
+import time
+from services.firebase_service import FirebaseService
+from services.export_service import ExportService
+from utils.pagination import iter_by_key
+from config import Config
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Counters kept per day and per slot per day, all keyed by the day a booking starts
+ROLLUP_COUNTERS = [
+    'confirmed', 'booked_minutes', 'entries', 'completed', 'cancelled',
+    'occupied_minutes', 'overtime_minutes', 'revenue', 'overtime_revenue'
+]
+
+def _parse(value):
+    """Parse an ISO timestamp to naive UTC, or None"""
+    if not value:
+        return None
+    try:
+        dt = datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (ValueError, AttributeError):
+        return None
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return dt
+
+def _minutes_between(start, end):
+    start, end = _parse(start), _parse(end)
+    if start is None or end is None or end <= start:
+        return 0
+    return round((end - start).total_seconds() / 60, 2)
+
+def rollup_day(booking, fallback=None):
+    """Day a booking is counted under (YYYY-MM-DD)"""
+    moment = _parse(booking.get('start_time')) or _parse(fallback)
+    return moment.strftime('%Y-%m-%d') if moment else None
+
+def transition_deltas(booking, status, changes=None):
+    """Counter deltas for a booking moving into a status
+
+    changes holds the fields written with the transition, e.g. the exit
+    time when a booking completes.
+    """
+    merged = dict(booking, **(changes or {}))
+    if status == 'confirmed':
+        return {'confirmed': 1, 'booked_minutes': _minutes_between(merged.get('start_time'), merged.get('end_time'))}
+    if status == 'in_use':
+        return {'entries': 1}
+    if status == 'completed':
+        return {
+            'completed': 1,
+            'occupied_minutes': _minutes_between(merged.get('actual_entry_time'), merged.get('actual_exit_time')),
+            'overtime_minutes': _minutes_between(merged.get('end_time'), merged.get('actual_exit_time'))
+        }
+    if status == 'cancelled':
+        return {'cancelled': 1}
+    return {}
+
+def payment_deltas(payment_type, amount):
+    """Counter deltas for a completed payment, or its share for one booking"""
+    counter = 'overtime_revenue' if payment_type == 'overtime' else 'revenue'
+    return {counter: round(float(amount or 0), 2)}
+
+def increment_updates(lot_id, day, slot_id, deltas):
+    """Root-relative server-side increments of a day's and a slot's counters"""
+    updates = {}
+    if not day:
+        return updates
+
+    for counter, amount in deltas.items():
+        if not amount:
+            continue
+        increment = {'.sv': {'increment': amount}}
+        updates[FirebaseService.lot_path(lot_id, f'rollups/daily/{day}/{counter}')] = increment
+        if slot_id:
+            updates[FirebaseService.lot_path(lot_id, f'rollups/slot_daily/{day}/{slot_id}/{counter}')] = increment
+    return updates
+
+def merge_updates(target, updates):
+    """Add a multi-path update into another, summing increments that hit the same counter"""
+    for path, value in updates.items():
+        existing = target.get(path)
+        if _is_increment(existing) and _is_increment(value):
+            total = existing['.sv']['increment'] + value['.sv']['increment']
+            target[path] = {'.sv': {'increment': round(total, 2)}}
+        else:
+            target[path] = value
+    return target
+
+def _is_increment(value):
+    return isinstance(value, dict) and isinstance(value.get('.sv'), dict) and 'increment' in value['.sv']
+
+class RollupService:
+    """Reads and rebuilds a lot's daily and per-slot counters"""
+
+    def __init__(self, lot_id=None):
+        self.firebase = FirebaseService()
+        self.lot_id = lot_id
+        self.daily_ref = self.firebase.get_db_reference(self.firebase.lot_path(lot_id, 'rollups/daily'))
+        self.slot_daily_ref = self.firebase.get_db_reference(self.firebase.lot_path(lot_id, 'rollups/slot_daily'))
+
+    def get_daily(self, start_day, end_day):
+        """Counters for each day in [start_day, end_day], plus their totals"""
+        days = self.daily_ref.order_by_key().start_at(start_day).end_at(end_day).get() or {}
+
+        totals = dict.fromkeys(ROLLUP_COUNTERS, 0)
+        for counters in days.values():
+            for counter, amount in counters.items():
+                totals[counter] = round(totals.get(counter, 0) + amount, 2)
+
+        return {
+            'days': [dict(counters, day=day) for day, counters in sorted(days.items())],
+            'totals': totals
+        }
+
+    def get_slot_usage(self, start_day, end_day, slot_id=None):
+        """Per-slot counters summed over [start_day, end_day], with occupancy rates"""
+        days = self.slot_daily_ref.order_by_key().start_at(start_day).end_at(end_day).get() or {}
+
+        slots = {}
+        for day_slots in days.values():
+            for day_slot_id, counters in day_slots.items():
+                if slot_id and day_slot_id != slot_id:
+                    continue
+                summed = slots.setdefault(day_slot_id, dict.fromkeys(ROLLUP_COUNTERS, 0))
+                for counter, amount in counters.items():
+                    summed[counter] = round(summed.get(counter, 0) + amount, 2)
+
+        window_minutes = self._day_span(start_day, end_day) * 24 * 60
+        return [
+            dict(counters, slot_id=usage_slot_id, occupancy_rate=round(counters['occupied_minutes'] / window_minutes, 4))
+            for usage_slot_id, counters in sorted(slots.items())
+        ]
+
+    def rebuild(self, page_size=None, archive_dir=None):
+        """Recompute every counter from bookings and payments in one streaming pass
+
+        Reads the hot bookings, the RTDB archive and, with archive_dir, local
+        archive segments, then replaces the lot's rollups. Increments made
+        while the rebuild runs are lost, so run it when traffic is quiet.
+        """
+        page_size = page_size or Config.MAINTENANCE_BATCH_SIZE
+        started = time.monotonic()
+        updates = {}
+        stats = {'bookings': 0, 'payment_rows': 0}
+
+        for booking in self._iter_all_bookings(page_size, archive_dir):
+            stats['bookings'] += 1
+            day, slot_id = rollup_day(booking), booking.get('slot_id')
+            for status in self._replayed_statuses(booking):
+                merge_updates(updates, increment_updates(self.lot_id, day, slot_id, transition_deltas(booking, status)))
+
+        # Bookings a payment covers can be archived; the payment time stands in for their day
+        for row in ExportService(page_size).iter_payment_rows([self.lot_id], statuses=['completed']):
+            stats['payment_rows'] += 1
+            # Bulk payments are split across their bookings at each booking's own price
+            amount = row['booking_amount'] if row.get('booking_group_id') else row['amount']
+            deltas = payment_deltas(row.get('type'), amount)
+            merge_updates(updates, increment_updates(self.lot_id, rollup_day(row, row.get('completed_at')), row.get('slot_id'), deltas))
+
+        prefix = self.firebase.lot_path(self.lot_id, 'rollups/')
+        rollups = {}
+        for path, value in updates.items():
+            node = rollups
+            parts = path[len(prefix):].split('/')
+            for part in parts[:-1]:
+                node = node.setdefault(part, {})
+            node[parts[-1]] = value['.sv']['increment']
+
+        self.firebase.get_db_reference(self.firebase.lot_path(self.lot_id, 'rollups')).set(rollups)
+
+        stats['days'] = len(rollups.get('daily', {}))
+        stats['seconds'] = round(time.monotonic() - started, 3)
+        logger.info(f"Rebuilt rollups for lot {self.lot_id or 'default'}: {stats}")
+        return stats
+
+    def _replayed_statuses(self, booking):
+        """Transitions a booking went through, judged from its final record"""
+        status = booking.get('status')
+        statuses = []
+        if booking.get('paid_at') or status in ['confirmed', 'in_use', 'completed']:
+            statuses.append('confirmed')
+        if booking.get('actual_entry_time') or status in ['in_use', 'completed']:
+            statuses.append('in_use')
+        if status in ['completed', 'cancelled']:
+            statuses.append(status)
+        return statuses
+
+    def _iter_all_bookings(self, page_size, archive_dir):
+        """Every booking record of the lot, hot or archived"""
+        bookings_ref = self.firebase.get_db_reference(self.firebase.lot_path(self.lot_id, 'bookings'))
+        for _, booking in iter_by_key(bookings_ref, page_size):
+            yield booking
+
+        archive_ref = self.firebase.get_db_reference(self.firebase.lot_path(self.lot_id, 'bookings_archive'))
+        for month in (archive_ref.get(shallow=True) or {}):
+            for _, booking in iter_by_key(archive_ref.child(month), page_size):
+                yield booking
+
+        if archive_dir and os.path.isdir(archive_dir):
+            prefix = f'bookings-{self.lot_id or "default"}-'
+            for name in sorted(os.listdir(archive_dir)):
+                if not name.startswith(prefix):
+                    continue
+                with gzip.open(os.path.join(archive_dir, name), 'rt', encoding='utf-8') as segment:
+                    for line in segment:
+                        yield json.loads(line)
+
+    def _day_span(self, start_day, end_day):
+        start = datetime.datetime.strptime(start_day, '%Y-%m-%d')
+        end = datetime.datetime.strptime(end_day, '%Y-%m-%d')
+        return max((end - start).days + 1, 1)
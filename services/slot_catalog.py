@@ -0,0 +1,260 @@
+from bisect import bisect_left, bisect_right
+import re
+import threading
+import time
+from services.firebase_service import FirebaseService
+from utils.shared_cache import SharedCache
+from utils.geo import cells_within, grid_cell, haversine_m, METERS_PER_DEGREE_LAT
+from config import Config
+import logging
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+# Shared cache namespace of the slot records, keyed by lot ('' for the default lot)
+SHARED_NAMESPACE = 'slot_catalog'
+
+def tokenize(text):
+    """Split text into lowercase search tokens"""
+    return TOKEN_PATTERN.findall((text or '').lower())
+
+class SlotCatalog:
+    """In-memory copy of a lot's slots with search indexes, shared per process
+
+    After SLOT_CATALOG_TTL_SECONDS, or as soon as a slot changes through this
+    process (see invalidate), the lot's slots_version stamp is read. The
+    slots are only read again if the stamp moved or the last full read is
+    older than SLOT_CATALOG_MAX_AGE_SECONDS. Every write to slots must bump
+    the stamp (see version_bump); edits made outside the API should run
+    scripts/bump_slots_version.py, or they show up only after the max age.
+
+    With a shared cache, a reload first looks for slots another worker
+    already read at the same stamp, and invalidations reach every worker on
+    the host instead of waiting for the TTL.
+    """
+    _catalogs = {}
+    _lock = threading.Lock()
+
+    def __init__(self, lot_id=None):
+        self.lot_id = lot_id
+        self.firebase = FirebaseService()
+        self.slots_ref = self.firebase.get_db_reference(self.firebase.lot_path(lot_id, 'slots'))
+        self.version_ref = self.firebase.get_db_reference(self.firebase.lot_path(lot_id, 'slots_version'))
+        self.loaded_at = None
+        # Stamp and wall-clock time of the last full read of the slots
+        self.version = None
+        self.fetched_at = None
+        self.shared = SharedCache.get_default()
+        self.shared_key = lot_id or ''
+        # Last shared invalidation generation this catalog has caught up with
+        self.generation = None
+        self._refresh_lock = threading.Lock()
+        self._build({})
+
+    @classmethod
+    def for_lot(cls, lot_id=None):
+        """Get the up-to-date catalog of a lot"""
+        with cls._lock:
+            catalog = cls._catalogs.get(lot_id)
+            if catalog is None:
+                catalog = cls._catalogs[lot_id] = cls(lot_id)
+
+        catalog.refresh_if_stale()
+        return catalog
+
+    @classmethod
+    def invalidate(cls, lot_id=None):
+        """Force the next lookup of a lot's catalog to reload it"""
+        catalog = cls._catalogs.get(lot_id)
+        if catalog is not None:
+            catalog.version = None
+            catalog.loaded_at = None
+
+        shared = SharedCache.get_default()
+        if shared is not None:
+            shared.invalidate(SHARED_NAMESPACE, lot_id or '')
+
+    @staticmethod
+    def version_bump(lot_id=None):
+        """Root-relative update that bumps a lot's slots_version; send it with every slot write"""
+        return {FirebaseService.lot_path(lot_id, 'slots_version'): {'.sv': {'increment': 1}}}
+
+    @classmethod
+    def snapshot(cls):
+        """Fully read catalogs as plain data, keyed by lot ('' for the default lot)"""
+        with cls._lock:
+            catalogs = list(cls._catalogs.values())
+        return {
+            catalog.lot_id or '': {'version': catalog.version, 'fetched_at': catalog.fetched_at, 'slots': catalog.slots}
+            for catalog in catalogs
+            if catalog.fetched_at is not None and catalog.version is not None
+        }
+
+    @classmethod
+    def restore(cls, state):
+        """Seed catalogs from a snapshot; each is checked against its stamp on first use"""
+        restored = 0
+        for key, entry in state.items():
+            catalog = cls(key or None)
+            catalog._build(entry['slots'])
+            catalog.version, catalog.fetched_at = entry['version'], entry['fetched_at']
+            with cls._lock:
+                # A catalog this process already loaded is at least as new
+                if catalog.lot_id not in cls._catalogs:
+                    cls._catalogs[catalog.lot_id] = catalog
+                    restored += 1
+        return restored
+
+    def refresh_if_stale(self):
+        """Reload the slots if the catalog has expired"""
+        if self._is_fresh():
+            return
+
+        with self._refresh_lock:
+            # Another thread may have reloaded while we waited
+            if self._is_fresh():
+                return
+
+            generation = self._shared_generation()
+            # The stamp is read before the slots, so a write in between only causes an extra reload
+            version = self.version_ref.get() or 0
+            if not (version == self.version and self._within_max_age(self.fetched_at)):
+                self._load(version)
+            self.generation = generation
+            self.loaded_at = time.monotonic()
+
+    def _load(self, version):
+        """Rebuild from the slots at a stamp, from the shared cache if another worker has them"""
+        entry = self.shared.get(SHARED_NAMESPACE, self.shared_key, version) if self.shared else None
+        if entry is not None and self._within_max_age(entry.stored_at):
+            self._build(entry.value)
+            self.version, self.fetched_at = version, entry.stored_at
+            return
+
+        self._build(self.slots_ref.get() or {})
+        self.version, self.fetched_at = version, time.time()
+        if self.shared:
+            self.shared.set(SHARED_NAMESPACE, self.shared_key, self.slots, version, self.fetched_at)
+        logger.info(f"Slot catalog loaded for lot {self.lot_id or 'default'}: {len(self.slots)} slots")
+
+    def _within_max_age(self, fetched_at):
+        return fetched_at is not None and time.time() - fetched_at < Config.SLOT_CATALOG_MAX_AGE_SECONDS
+
+    def _shared_generation(self):
+        return self.shared.generation(SHARED_NAMESPACE, self.shared_key) if self.shared else None
+
+    def _is_fresh(self):
+        if self.loaded_at is None or time.monotonic() - self.loaded_at >= Config.SLOT_CATALOG_TTL_SECONDS:
+            return False
+        # Another worker invalidated the lot since this catalog last caught up
+        generation = self._shared_generation()
+        return generation is None or generation == self.generation
+
+    def _build(self, slots):
+        """Build the search indexes over a slots snapshot"""
+        tokens = {}
+        locations = []
+        prices = []
+        cells = {}
+        cell_deg = Config.SPATIAL_CELL_METERS / METERS_PER_DEGREE_LAT
+
+        for slot_id, slot in slots.items():
+            for token in set(tokenize(slot.get('location')) + tokenize(slot.get('description'))):
+                tokens.setdefault(token, set()).add(slot_id)
+            locations.append(((slot.get('location') or '').lower(), slot_id))
+            prices.append((float(slot.get('rate_per_hour', Config.DEFAULT_PARKING_RATE)), slot_id))
+            
+            if slot.get('latitude') is not None and slot.get('longitude') is not None:
+                latitude, longitude = float(slot['latitude']), float(slot['longitude'])
+                cells.setdefault(grid_cell(latitude, longitude, cell_deg), []).append((slot_id, latitude, longitude))
+
+        # Swap the whole index in with one assignment so readers never mix snapshots
+        price_index = sorted(prices)
+        self._index = {
+            'slots': slots,
+            'order': list(slots),
+            'tokens': tokens,
+            'sorted_tokens': sorted(tokens),
+            'locations': sorted(locations),
+            'prices': price_index,
+            'price_values': [rate for rate, _ in price_index],
+            'cells': cells,
+            'cell_deg': cell_deg
+        }
+
+    @property
+    def slots(self):
+        return self._index['slots']
+
+    def get(self, slot_id):
+        """Get a slot record from the catalog"""
+        return self._index['slots'].get(slot_id)
+
+    def search(self, location=None, term=None, max_rate=None):
+        """Return the active slot IDs matching every given filter
+
+        location matches the start of the slot's location, term matches
+        word prefixes in location and description, and max_rate caps
+        rate_per_hour. With max_rate the result is ordered cheapest first,
+        otherwise in catalog order.
+        """
+        index = self._index
+        candidates = None
+
+        if location:
+            candidates = self._match_location_prefix(index, location.lower())
+
+        for token in tokenize(term):
+            matches = self._match_token_prefix(index, token)
+            candidates = matches if candidates is None else candidates & matches
+
+        if max_rate is not None:
+            cutoff = bisect_right(index['price_values'], float(max_rate))
+            ordered = [slot_id for _, slot_id in index['prices'][:cutoff]]
+            if candidates is not None:
+                ordered = [slot_id for slot_id in ordered if slot_id in candidates]
+        elif candidates is not None:
+            ordered = [slot_id for slot_id in index['order'] if slot_id in candidates]
+        else:
+            ordered = index['order']
+
+        return [slot_id for slot_id in ordered if index['slots'][slot_id].get('is_active', True)]
+
+    def nearby(self, latitude, longitude, radius_m):
+        """Active slots within radius_m of a point as (distance_m, slot_id), nearest first
+
+        Only slots in the grid cells overlapping the circle are measured.
+        """
+        index = self._index
+        found = []
+        for cell in cells_within(latitude, longitude, radius_m, index['cell_deg']):
+            for slot_id, slot_lat, slot_lng in index['cells'].get(cell, []):
+                if not index['slots'][slot_id].get('is_active', True):
+                    continue
+                distance = haversine_m(latitude, longitude, slot_lat, slot_lng)
+                if distance <= radius_m:
+                    found.append((distance, slot_id))
+
+        found.sort()
+        return found
+
+    def _match_location_prefix(self, index, prefix):
+        """Slot IDs whose location starts with the prefix"""
+        locations = index['locations']
+        matches = set()
+        position = bisect_left(locations, (prefix,))
+        while position < len(locations) and locations[position][0].startswith(prefix):
+            matches.add(locations[position][1])
+            position += 1
+        return matches
+
+    def _match_token_prefix(self, index, prefix):
+        """Slot IDs with a word starting with the prefix"""
+        sorted_tokens = index['sorted_tokens']
+        matches = set()
+        position = bisect_left(sorted_tokens, prefix)
+        while position < len(sorted_tokens) and sorted_tokens[position].startswith(prefix):
+            matches |= index['tokens'][sorted_tokens[position]]
+            position += 1
+        return matches
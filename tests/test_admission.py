@@ -0,0 +1,58 @@
+import unittest
+from unittest import mock
+
+from utils.admission import AdmissionController, parse_class_limits
+
+class AdmissionControllerTest(unittest.TestCase):
+
+    def setUp(self):
+        limits = parse_class_limits('gate=4, browse=4, write=2, stream=2')
+        self.controller = AdmissionController(limits, max_in_flight=6, reserve=2, client_rate=1, client_burst=2,
+                                              max_clients=2)
+
+    def test_parse_class_limits(self):
+        self.assertEqual(parse_class_limits('gate=8, browse=4,,bad'), {'gate': 8, 'browse': 4})
+
+    def test_class_budget(self):
+        self.assertEqual([self.controller.try_enter('write') for _ in range(3)], [True, True, False])
+
+        self.controller.leave('write')
+        self.assertTrue(self.controller.try_enter('write'))
+
+    def test_reserve_kept_for_gate(self):
+        self.assertEqual([self.controller.try_enter('browse') for _ in range(4)], [True] * 4)
+        self.assertFalse(self.controller.try_enter('write'))
+
+        # Gate validation may use the reserved capacity
+        self.assertTrue(self.controller.try_enter('gate'))
+        self.assertTrue(self.controller.try_enter('gate'))
+        self.assertEqual(self.controller.total_in_flight, 6)
+
+    def test_streams_use_their_own_pool(self):
+        self.assertEqual([self.controller.try_enter('stream') for _ in range(3)], [True, True, False])
+
+        # Open streams don't take capacity from short requests
+        self.assertEqual(self.controller.total_in_flight, 0)
+        self.assertEqual([self.controller.try_enter('browse') for _ in range(4)], [True] * 4)
+
+        self.controller.leave('stream')
+        self.assertEqual(self.controller.in_flight['stream'], 1)
+        self.assertEqual(self.controller.total_in_flight, 4)
+
+    def test_client_rate_limit(self):
+        with mock.patch('utils.rate_limit.time.monotonic', return_value=100.0):
+            results = [self.controller.check_rate('10.0.0.1')[0] for _ in range(3)]
+            allowed, wait = self.controller.check_rate('10.0.0.1')
+
+        self.assertEqual(results, [True, True, False])
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(wait, 1.0)
+
+    def test_least_recent_clients_evicted(self):
+        for client in ('a', 'b', 'a', 'c'):
+            self.controller.check_rate(client)
+
+        self.assertEqual(list(self.controller._clients), ['a', 'c'])
+
+if __name__ == '__main__':
+    unittest.main()
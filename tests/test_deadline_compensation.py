@@ -0,0 +1,64 @@
+import datetime
+import unittest
+from unittest import mock
+
+from services.booking_service import BookingService
+from services.firebase_service import FirebaseService
+from utils.deadline import DeadlineExceeded, check_deadline, current_deadline, end_deadline, start_deadline
+
+class DeadlineCompensationTest(unittest.TestCase):
+    """Claims taken before the deadline expired are released even though the budget is spent"""
+
+    def setUp(self):
+        self.refs = {}
+        self.deleted = 0
+        get_ref = mock.patch.object(FirebaseService, 'get_db_reference', side_effect=self._ref)
+        get_ref.start()
+        self.addCleanup(get_ref.stop)
+
+        self.deadline, token = start_deadline(5)
+        self.addCleanup(end_deadline, token)
+
+    def _ref(self, path=''):
+        if path not in self.refs:
+            ref = self.refs[path] = mock.MagicMock(name=path or 'root')
+            # Every backend call checks the deadline first, as track_backend does
+            ref.update.side_effect = lambda *args, **kwargs: check_deadline('firebase.update')
+            ref.child.return_value.child.return_value.delete.side_effect = self._delete
+        return self.refs[path]
+
+    def _delete(self):
+        check_deadline('firebase.delete')
+        self.deleted += 1
+
+    def _expire(self, *args, **kwargs):
+        self.deadline.expires_at = 0
+
+    def test_create_booking_releases_claim_when_deadline_expires_before_write(self):
+        service = BookingService()
+        service.slots_ref.child.return_value.get.return_value = {'is_active': True, 'location': 'A1'}
+        start = datetime.datetime.utcnow() + datetime.timedelta(hours=1)
+
+        with mock.patch.object(service, '_load_busy_intervals', return_value={}), \
+                mock.patch.object(service, '_claim_slot', side_effect=self._expire), \
+                mock.patch.object(service, '_build_booking_data', return_value={'user_id': 'user-1'}), \
+                mock.patch.object(service, '_booking_write_updates', return_value={'bookings/b1': {}}):
+            with self.assertRaises(DeadlineExceeded):
+                service.create_booking('user-1', 'slot-1', start.isoformat(), (start + datetime.timedelta(hours=2)).isoformat())
+
+        self.assertEqual(self.deleted, 1)
+        service.locks_ref.child.assert_called_with('slot-1')
+        # The deadline is back in force once the release is done
+        self.assertIs(current_deadline(), self.deadline)
+
+    def test_release_claims_runs_after_deadline_expired(self):
+        service = BookingService()
+        self._expire()
+        windows = {'slot-1': [('b1', None, None)], 'slot-2': [('b2', None, None)]}
+
+        service._release_claims(windows)
+
+        service.locks_ref.update.assert_called_once_with({'slot-1/b1': None, 'slot-2/b2': None})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+from unittest import mock
+
+from services.event_bus import EventBus
+
+class EventBusReplayTest(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.multiple(EventBus, _subscribers={}, _history={}, _sequences={})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        history_size = mock.patch('services.event_bus.Config.SSE_HISTORY_SIZE', 3)
+        history_size.start()
+        self.addCleanup(history_size.stop)
+
+    def _publish(self, lot_id, count):
+        for index in range(count):
+            EventBus.publish(lot_id, 'occupancy', {'slot_id': f'A{index}', 'occupied': True})
+
+    def test_events_after_last_id(self):
+        self._publish('lot-1', 3)
+
+        self.assertEqual([event['id'] for event in EventBus.replay('lot-1', 1)], [2, 3])
+        self.assertEqual(EventBus.replay('lot-1', 3), [])
+
+    def test_ids_run_per_lot(self):
+        self._publish('lot-1', 2)
+        self._publish('lot-2', 1)
+
+        self.assertEqual([event['data']['lot_id'] for event in EventBus.replay('lot-2', 0)], ['lot-2'])
+        self.assertEqual([event['id'] for event in EventBus.replay('lot-2', 0)], [1])
+
+    def test_none_when_history_no_longer_reaches_back(self):
+        self._publish('lot-1', 5)
+
+        # History holds events 3 to 5, so a client that saw 2 can still catch up but one at 1 can't
+        self.assertEqual([event['id'] for event in EventBus.replay('lot-1', 2)], [3, 4, 5])
+        self.assertIsNone(EventBus.replay('lot-1', 1))
+
+    def test_none_for_ids_from_before_a_restart(self):
+        self._publish('lot-1', 1)
+
+        self.assertIsNone(EventBus.replay('lot-1', 7))
+        self.assertIsNone(EventBus.replay('lot-9', 2))
+        self.assertEqual(EventBus.replay('lot-9', 0), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import datetime
+import unittest
+
+from utils.intervals import allocate_best_fit, find_gap, merge_intervals, rank_best_fit
+
+def at(hour):
+    return datetime.datetime(2026, 1, 5) + datetime.timedelta(hours=hour)
+
+class FindGapTest(unittest.TestCase):
+
+    def test_merges_touching_intervals(self):
+        self.assertEqual(merge_intervals([(at(3), at(4)), (at(1), at(2)), (at(2), at(3))]), [(at(1), at(4))])
+
+    def test_gap_bounds_and_busy_window(self):
+        busy = [(at(1), at(2)), (at(5), at(6))]
+
+        self.assertEqual(find_gap(busy, at(2), at(5)), (at(2), at(5)))
+        self.assertEqual(find_gap(busy, at(7), at(8)), (at(6), None))
+        self.assertIsNone(find_gap(busy, at(1), at(3)))
+        self.assertIsNone(find_gap(busy, at(4), at(6)))
+
+class RankBestFitTest(unittest.TestCase):
+
+    def test_tightest_gap_first_and_busy_slots_dropped(self):
+        busy = {
+            'loose': [(at(0), at(1))],
+            'tight': [(at(8), at(10)), (at(12), at(14))],
+            'busy': [(at(9), at(13))],
+        }
+
+        self.assertEqual(rank_best_fit(['loose', 'busy', 'tight', 'empty'], busy, at(10), at(12)),
+                         ['tight', 'loose', 'empty'])
+
+    def test_ties_keep_slot_order(self):
+        self.assertEqual(rank_best_fit(['b', 'a', 'c'], {}, at(1), at(2)), ['b', 'a', 'c'])
+
+class AllocateBestFitTest(unittest.TestCase):
+
+    def test_long_demands_placed_first_and_busy_updated(self):
+        busy = {'a': [(at(0), at(4))]}
+        # The short demand comes first but must not take the slot the long one needs
+        demands = [(at(4), at(5), 1), (at(4), at(12), 1)]
+
+        allocations, shortfall = allocate_best_fit(['a', 'b'], busy, demands)
+
+        self.assertEqual(sorted(allocations), [(0, 'b'), (1, 'a')])
+        self.assertEqual(shortfall, {})
+        self.assertEqual(busy, {'a': [(at(0), at(12))], 'b': [(at(4), at(5))]})
+
+    def test_reports_shortfall(self):
+        allocations, shortfall = allocate_best_fit(['a', 'b'], {'b': [(at(0), at(24))]}, [(at(1), at(2), 3)])
+
+        self.assertEqual(allocations, [(0, 'a')])
+        self.assertEqual(shortfall, {0: 2})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+
+from config import Config
+from utils.pagination import decode_cursor, encode_cursor, iter_by_key, parse_limit
+
+class FakeQuery:
+    """Key-ordered query over a dict, as the RTDB client applies it"""
+
+    def __init__(self, data, reads):
+        self.data = data
+        self.reads = reads
+        self.start = None
+        self.limit = None
+
+    def order_by_key(self):
+        return self
+
+    def start_at(self, key):
+        self.start = key
+        return self
+
+    def limit_to_first(self, limit):
+        self.limit = limit
+        return self
+
+    def get(self):
+        self.reads.append((self.start, self.limit))
+        keys = sorted(key for key in self.data if self.start is None or key >= self.start)
+        return {key: self.data[key] for key in keys[:self.limit]} or None
+
+class FakeRef:
+
+    def __init__(self, data):
+        self.data = data
+        self.reads = []
+
+    def order_by_key(self):
+        return FakeQuery(self.data, self.reads).order_by_key()
+
+class CursorTest(unittest.TestCase):
+
+    def test_round_trip(self):
+        position = {'c': '2026-01-05T09:00:00', 'k': 'booking/1'}
+        cursor = encode_cursor(position)
+
+        self.assertNotIn('=', cursor)
+        self.assertEqual(decode_cursor(cursor), position)
+
+    def test_rejects_bad_cursors(self):
+        for cursor in ('not a cursor!', encode_cursor([1, 2]), encode_cursor('k')):
+            with self.assertRaises(ValueError):
+                decode_cursor(cursor)
+
+    def test_parse_limit(self):
+        self.assertEqual(parse_limit(None), Config.PAGE_SIZE_DEFAULT)
+        self.assertEqual(parse_limit('3'), 3)
+        self.assertEqual(parse_limit(str(Config.PAGE_SIZE_MAX + 1)), Config.PAGE_SIZE_MAX)
+        for value in ('0', 'ten'):
+            with self.assertRaises(ValueError):
+                parse_limit(value)
+
+class IterByKeyTest(unittest.TestCase):
+
+    def test_yields_every_key_once_in_order(self):
+        ref = FakeRef({f'k{index:02d}': index for index in range(7)})
+
+        items = list(iter_by_key(ref, 3))
+
+        self.assertEqual(items, [(f'k{index:02d}', index) for index in range(7)])
+        # Later pages start at the last key seen and ask for one extra to make up for it
+        self.assertEqual(ref.reads, [(None, 3), ('k02', 4), ('k05', 4), ('k06', 4)])
+
+    def test_empty_reference(self):
+        ref = FakeRef({})
+
+        self.assertEqual(list(iter_by_key(ref, 3)), [])
+        self.assertEqual(ref.reads, [(None, 3)])
+
+if __name__ == '__main__':
+    unittest.main()
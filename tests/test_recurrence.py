@@ -0,0 +1,61 @@
+import datetime
+import unittest
+
+from utils.recurrence import expand_occurrences, parse_weekdays
+
+class ParseWeekdaysTest(unittest.TestCase):
+
+    def test_accepts_names_and_numbers(self):
+        self.assertEqual(parse_weekdays(['Friday', 'mon', 2, ' WED ']), [0, 2, 4])
+
+    def test_rejects_booleans(self):
+        for day in (True, False):
+            with self.assertRaises(ValueError):
+                parse_weekdays([day])
+
+    def test_rejects_out_of_range(self):
+        with self.assertRaises(ValueError):
+            parse_weekdays([7])
+
+class ExpandOccurrencesTest(unittest.TestCase):
+    # A Monday
+    start = datetime.datetime(2026, 1, 5, 9, 0)
+    end = datetime.datetime(2026, 1, 5, 11, 0)
+
+    def test_daily_keeps_duration_and_includes_until(self):
+        occurrences = expand_occurrences(self.start, self.end, 'daily', datetime.datetime(2026, 1, 9, 9, 0), interval=2)
+
+        self.assertEqual([start.day for start, _ in occurrences], [5, 7, 9])
+        self.assertTrue(all(end - start == datetime.timedelta(hours=2) for start, end in occurrences))
+
+    def test_weekly_on_weekdays_in_order(self):
+        occurrences = expand_occurrences(self.start, self.end, 'weekly', datetime.datetime(2026, 1, 15), weekdays=['wed', 0])
+
+        self.assertEqual([start.day for start, _ in occurrences], [5, 7, 12, 14])
+
+    def test_weekly_skips_days_before_first_window(self):
+        start = self.start + datetime.timedelta(days=2)
+        occurrences = expand_occurrences(start, start + datetime.timedelta(hours=1), 'weekly',
+                                         datetime.datetime(2026, 1, 13), weekdays=['mon', 'wed'])
+
+        self.assertEqual([start.day for start, _ in occurrences], [7, 12])
+
+    def test_weekly_defaults_to_first_weekday(self):
+        occurrences = expand_occurrences(self.start, self.end, 'weekly', datetime.datetime(2026, 1, 31), interval=2)
+
+        self.assertEqual([start.day for start, _ in occurrences], [5, 19])
+
+    def test_too_many_occurrences(self):
+        with self.assertRaises(ValueError):
+            expand_occurrences(self.start, self.end, 'daily', datetime.datetime(2026, 2, 5), max_occurrences=10)
+
+    def test_invalid_rules(self):
+        until = datetime.datetime(2026, 1, 31)
+        for kwargs in ({'frequency': 'monthly'}, {'frequency': 'daily', 'interval': 0}):
+            with self.assertRaises(ValueError):
+                expand_occurrences(self.start, self.end, until_dt=until, **kwargs)
+        with self.assertRaises(ValueError):
+            expand_occurrences(self.start, self.end, 'daily', self.start - datetime.timedelta(days=1))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from utils.shared_cache import SharedCache
+
+class SharedCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'cache', 'shared.db')
+        self.cache = SharedCache(self.path)
+
+    def test_entries_served_only_for_their_version(self):
+        self.cache.set('slots', 'default', {'A1': {'is_active': True}}, version=3, stored_at=10.0)
+
+        entry = self.cache.get('slots', 'default', version=3)
+        self.assertEqual(entry.value, {'A1': {'is_active': True}})
+        self.assertEqual((entry.version, entry.stored_at), (3, 10.0))
+        self.assertIsNone(self.cache.get('slots', 'default', version=4))
+        self.assertEqual(self.cache.get('slots', 'default').version, 3)
+
+    def test_set_replaces_entry(self):
+        self.cache.set('slots', 'default', {'v': 1}, version=1)
+        self.cache.set('slots', 'default', {'v': 2}, version=2)
+
+        self.assertIsNone(self.cache.get('slots', 'default', version=1))
+        self.assertEqual(self.cache.get('slots', 'default', version=2).value, {'v': 2})
+
+    def test_invalidation_seen_by_other_workers(self):
+        other = SharedCache(self.path)
+        self.cache.set('slots', 'lot-1', {'v': 1}, version=1)
+        self.assertEqual(other.generation('slots', 'lot-1'), 0)
+
+        self.cache.invalidate('slots', 'lot-1')
+        self.cache.invalidate('slots', 'lot-1')
+
+        self.assertIsNone(other.get('slots', 'lot-1'))
+        self.assertEqual(other.generation('slots', 'lot-1'), 2)
+        # Generations are per key
+        self.assertEqual(other.generation('slots', 'lot-2'), 0)
+
+if __name__ == '__main__':
+    unittest.main()
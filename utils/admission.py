@@ -0,0 +1,71 @@
+from collections import OrderedDict
+import threading
+from utils.rate_limit import TokenBucket
+
+def parse_class_limits(spec):
+    """Concurrency budgets per route class from "gate=8,browse=4" style settings"""
+    limits = {}
+    for item in spec.split(','):
+        if '=' in item:
+            route_class, limit = item.split('=', 1)
+            limits[route_class.strip()] = int(limit)
+    return limits
+
+class AdmissionController:
+    """Decides which requests are served now and which are shed
+
+    Each route class has its own concurrency budget. Every class except the
+    priority one also shares the process's in-flight capacity minus a
+    reserve, so a burst of browsing never takes the last slots gate
+    validation needs. Long-lived classes (streams) are kept out of the
+    shared capacity and bounded by their own budget alone, so open streams
+    never crowd out short requests. Clients are rate limited with one token
+    bucket each, evicting the least recently seen clients beyond max_clients.
+    """
+
+    def __init__(self, class_limits, max_in_flight, reserve, client_rate, client_burst,
+                 max_clients=10000, priority_class='gate', separate_classes=('stream',)):
+        self.class_limits = class_limits
+        self.max_in_flight = max_in_flight
+        self.reserve = reserve
+        self.priority_class = priority_class
+        self.separate_classes = set(separate_classes)
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.max_clients = max_clients
+        self.in_flight = dict.fromkeys(class_limits, 0)
+        self.total_in_flight = 0
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+
+    def check_rate(self, client_key):
+        """Take a token from the client's bucket; returns (allowed, seconds until it would be)"""
+        with self._lock:
+            bucket = self._clients.get(client_key)
+            if bucket is None:
+                bucket = self._clients[client_key] = TokenBucket(self.client_rate, self.client_burst)
+                if len(self._clients) > self.max_clients:
+                    self._clients.popitem(last=False)
+            else:
+                self._clients.move_to_end(client_key)
+        return bucket.try_acquire()
+
+    def try_enter(self, route_class):
+        """Claim a concurrency slot for a request of the class; False means shed it"""
+        separate = route_class in self.separate_classes
+        with self._lock:
+            if self.in_flight.get(route_class, 0) >= self.class_limits.get(route_class, self.max_in_flight):
+                return False
+            if (not separate and route_class != self.priority_class
+                    and self.total_in_flight >= self.max_in_flight - self.reserve):
+                return False
+            self.in_flight[route_class] = self.in_flight.get(route_class, 0) + 1
+            if not separate:
+                self.total_in_flight += 1
+            return True
+
+    def leave(self, route_class):
+        with self._lock:
+            self.in_flight[route_class] -= 1
+            if route_class not in self.separate_classes:
+                self.total_in_flight -= 1
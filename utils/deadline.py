@@ -0,0 +1,62 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+import time
+
+_current_deadline = ContextVar('request_deadline', default=None)
+
+class DeadlineExceeded(Exception):
+    """Raised instead of starting an outbound call once the request's time budget is spent"""
+
+class Deadline:
+    """Time budget of one request, measured on the monotonic clock"""
+
+    def __init__(self, seconds):
+        self.budget = seconds
+        self.expires_at = time.monotonic() + seconds
+        # Operation that found the budget spent, if any
+        self.exceeded_by = None
+
+    def remaining(self):
+        return self.expires_at - time.monotonic()
+
+    def lift(self):
+        """Stop enforcing the deadline, e.g. once a streamed response has started"""
+        self.expires_at = float('inf')
+
+def start_deadline(seconds):
+    """Give the current request a budget; returns the deadline and a token for end_deadline"""
+    deadline = Deadline(seconds)
+    return deadline, _current_deadline.set(deadline)
+
+def end_deadline(token):
+    _current_deadline.reset(token)
+
+def current_deadline():
+    return _current_deadline.get()
+
+@contextmanager
+def suspended_deadline():
+    """Run a block without the request's deadline
+
+    For work that must finish once started, such as releasing claims after
+    a failed write or recording a payment Paystack already confirmed; the
+    backend's own HTTP timeout still bounds each call.
+    """
+    token = _current_deadline.set(None)
+    try:
+        yield
+    finally:
+        _current_deadline.reset(token)
+
+def check_deadline(operation):
+    """Raise DeadlineExceeded if the current request has no time left for the operation"""
+    deadline = current_deadline()
+    if deadline is not None and deadline.remaining() <= 0:
+        deadline.exceeded_by = operation
+        raise DeadlineExceeded(f'Request deadline exceeded before {operation}')
+
+def call_timeout(default, operation):
+    """Timeout for an outbound call: the default, cut down to what is left of the request's budget"""
+    check_deadline(operation)
+    deadline = current_deadline()
+    return default if deadline is None else min(default, deadline.remaining())
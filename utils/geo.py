@@ -0,0 +1,42 @@
+import math
+
+EARTH_RADIUS_M = 6371000.0
+METERS_PER_DEGREE_LAT = 111320.0
+
+def validate_coordinates(latitude, longitude):
+    """Parse and range-check a latitude/longitude pair"""
+    try:
+        latitude = float(latitude)
+        longitude = float(longitude)
+    except (ValueError, TypeError):
+        raise ValueError('Latitude and longitude must be numbers')
+
+    if not -90 <= latitude <= 90 or not -180 <= longitude <= 180:
+        raise ValueError('Latitude or longitude out of range')
+
+    return latitude, longitude
+
+def haversine_m(lat1, lng1, lat2, lng2):
+    """Great-circle distance between two points in meters"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+def grid_cell(latitude, longitude, cell_deg):
+    """Grid cell holding a point, for a square grid of cell_deg degrees"""
+    return math.floor(latitude / cell_deg), math.floor(longitude / cell_deg)
+
+def cells_within(latitude, longitude, radius_m, cell_deg):
+    """Grid cells covering the bounding box of a circle"""
+    lat_span = radius_m / METERS_PER_DEGREE_LAT
+    # Degrees of longitude shrink towards the poles, so the box gets wider
+    cos_lat = max(math.cos(math.radians(latitude)), 0.01)
+    lng_span = min(radius_m / (METERS_PER_DEGREE_LAT * cos_lat), 180.0)
+
+    min_row, min_col = grid_cell(latitude - lat_span, longitude - lng_span, cell_deg)
+    max_row, max_col = grid_cell(latitude + lat_span, longitude + lng_span, cell_deg)
+
+    return [(row, col) for row in range(min_row, max_row + 1) for col in range(min_col, max_col + 1)]
@@ -0,0 +1,141 @@
+from bisect import bisect_left
+import datetime
+
+# Booking statuses that hold a slot for their time window
+BLOCKING_STATUSES = ('confirmed', 'in_use')
+
+# Idle time charged for a side of the window with no neighbouring booking
+DEFAULT_FIT_HORIZON = datetime.timedelta(hours=24)
+
+def days_touched(start, end):
+    """List the 'YYYY-MM-DD' days a half-open window touches"""
+    days = []
+    day = start.date()
+    last = (end - datetime.timedelta(microseconds=1)).date() if end > start else start.date()
+    while day <= last:
+        days.append(day.isoformat())
+        day += datetime.timedelta(days=1)
+    return days
+
+def overlaps(start_a, end_a, start_b, end_b):
+    """Check if two half-open time windows overlap"""
+    return start_a < end_b and start_b < end_a
+
+def merge_intervals(intervals):
+    """Sort intervals and merge the ones that overlap or touch"""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+def build_busy_intervals(bookings, parse_datetime, statuses=BLOCKING_STATUSES):
+    """Group bookings into sorted, merged (start, end) intervals per slot"""
+    busy = {}
+    for booking in bookings.values():
+        if booking.get('status') not in statuses:
+            continue
+
+        start = parse_datetime(booking['start_time'])
+        end = parse_datetime(booking['end_time'])
+        busy.setdefault(booking['slot_id'], []).append((start, end))
+
+    return {slot_id: merge_intervals(intervals) for slot_id, intervals in busy.items()}
+
+def find_gap(intervals, start, end):
+    """Return the free gap (gap_start, gap_end) containing the window, or None if it is busy
+
+    intervals must be sorted and merged. A side with no neighbouring
+    booking is returned as None.
+    """
+    # Index of the first interval starting at or after the window end
+    index = bisect_left(intervals, (end,))
+
+    previous = intervals[index - 1] if index > 0 else None
+    if previous and previous[1] > start:
+        return None
+
+    gap_start = previous[1] if previous else None
+    gap_end = intervals[index][0] if index < len(intervals) else None
+    return gap_start, gap_end
+
+def is_free(intervals, start, end):
+    """Check a window against a slot's sorted, merged busy intervals"""
+    return find_gap(intervals, start, end) is not None
+
+def find_conflicts(intervals, windows):
+    """Return the indexes of windows that overlap the busy intervals
+
+    Both sides are walked once in start order, so checking many windows
+    costs O(len(intervals) + len(windows)) after sorting.
+    """
+    conflicts = set()
+    order = sorted(range(len(windows)), key=lambda index: windows[index][0])
+    position = 0
+
+    for index in order:
+        start, end = windows[index]
+        # Skip busy intervals that finish before this window starts
+        while position < len(intervals) and intervals[position][1] <= start:
+            position += 1
+        if position < len(intervals) and intervals[position][0] < end:
+            conflicts.add(index)
+
+    return conflicts
+
+def add_interval(intervals, start, end):
+    """Insert a window into sorted, merged busy intervals in place"""
+    intervals.append((start, end))
+    intervals[:] = merge_intervals(intervals)
+
+def fit_score(gap, start, end, horizon=DEFAULT_FIT_HORIZON):
+    """Idle seconds left around a window inside its gap (lower is a tighter fit)"""
+    gap_start, gap_end = gap
+    before = min(start - gap_start, horizon) if gap_start is not None else horizon
+    after = min(gap_end - end, horizon) if gap_end is not None else horizon
+    return (before + after).total_seconds()
+
+def rank_best_fit(slot_ids, busy, start, end, horizon=DEFAULT_FIT_HORIZON):
+    """Order the slots that are free for a window from tightest to loosest fit
+
+    Placing a booking in the smallest gap that holds it keeps large gaps
+    intact for later long bookings (best-fit interval packing).
+    """
+    scored = []
+    for position, slot_id in enumerate(slot_ids):
+        gap = find_gap(busy.get(slot_id, []), start, end)
+        if gap is None:
+            continue
+        scored.append((fit_score(gap, start, end, horizon), position, slot_id))
+
+    scored.sort()
+    return [slot_id for _, _, slot_id in scored]
+
+def allocate_best_fit(slot_ids, busy, demands, horizon=DEFAULT_FIT_HORIZON):
+    """Allocate slots for many (start, end, count) demands in one in-memory pass
+
+    Longer windows are placed first since they are the hardest to fit.
+    busy is updated in place with every allocation. Returns the list of
+    (demand_index, slot_id) allocations and a {demand_index: missing_count}
+    map of demands that could not be met in full.
+    """
+    order = sorted(range(len(demands)), key=lambda index: demands[index][0] - demands[index][1])
+    allocations = []
+    shortfall = {}
+
+    for index in order:
+        start, end, count = demands[index]
+        for _ in range(count):
+            ranked = rank_best_fit(slot_ids, busy, start, end, horizon)
+            if not ranked:
+                shortfall[index] = shortfall.get(index, 0) + 1
+                continue
+
+            slot_id = ranked[0]
+            add_interval(busy.setdefault(slot_id, []), start, end)
+            allocations.append((index, slot_id))
+
+    return allocations, shortfall
@@ -0,0 +1,23 @@
+import importlib
+
+class LazyModule:
+    """Stand-in for a module that imports it on first attribute access
+
+    Keeps heavy libraries off the startup path: `requests = LazyModule('requests')`
+    behaves like the module, but nothing is loaded until `requests.post` or
+    similar is first used. importlib's module locks make the first access
+    safe from several threads.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attribute):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attribute)
+
+    def __repr__(self):
+        state = 'loaded' if self._module is not None else 'not loaded'
+        return f'<lazy module {self._name!r} ({state})>'
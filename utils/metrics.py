@@ -0,0 +1,75 @@
+from contextlib import contextmanager
+import os
+import time
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+from prometheus_client import REGISTRY
+from utils.deadline import check_deadline
+from utils.tracing import current_trace, payload_size
+
+# Under gunicorn, PROMETHEUS_MULTIPROC_DIR is set (see gunicorn.conf.py) and every
+# worker writes its samples there, so /metrics reports all workers together
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Request latency by endpoint',
+    ['blueprint', 'endpoint', 'method'], buckets=LATENCY_BUCKETS
+)
+REQUEST_COUNT = Counter(
+    'http_requests_total', 'Requests by endpoint and status code',
+    ['blueprint', 'endpoint', 'method', 'status']
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    'http_requests_in_flight', 'Requests being handled', ['endpoint'], multiprocess_mode='livesum'
+)
+BACKEND_LATENCY = Histogram(
+    'backend_call_duration_seconds', 'Firebase, Paystack and QR rendering call latency',
+    ['backend', 'operation'], buckets=LATENCY_BUCKETS
+)
+BACKEND_ERRORS = Counter(
+    'backend_call_errors_total', 'Failed backend calls', ['backend', 'operation']
+)
+ADMISSION_REJECTED = Counter(
+    'admission_rejected_total', 'Requests shed by admission control', ['route_class', 'reason']
+)
+
+class BackendCall:
+    """Handle for reporting what a tracked call sent or received"""
+
+    def __init__(self):
+        self.size = 0
+
+    def payload(self, value):
+        """Record the payload of the call and pass it through"""
+        self.size += payload_size(value)
+        return value
+
+@contextmanager
+def track_backend(backend, operation):
+    """Time a call to a backend, count it if it fails and add it to the request trace
+
+    Raises DeadlineExceeded without making the call when the current request
+    is already past its deadline.
+    """
+    check_deadline(f'{backend}.{operation}')
+    call = BackendCall()
+    started = time.perf_counter()
+    try:
+        yield call
+    except Exception:
+        BACKEND_ERRORS.labels(backend, operation).inc()
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        BACKEND_LATENCY.labels(backend, operation).observe(elapsed)
+        trace = current_trace()
+        if trace is not None:
+            trace.record(backend, operation, elapsed, call.size)
+
+def render_metrics():
+    """Prometheus text exposition of every worker's metrics, and its content type"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,74 @@
+import base64
+import csv
+import io
+import json
+from config import Config
+
+def encode_cursor(position):
+    """Encode a page position as an opaque URL-safe cursor"""
+    raw = json.dumps(position, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Decode a cursor made by encode_cursor"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+
+    if not isinstance(position, dict):
+        raise ValueError('Invalid cursor')
+    return position
+
+def parse_limit(value):
+    """Parse a page size, defaulting to PAGE_SIZE_DEFAULT and capped at PAGE_SIZE_MAX"""
+    if value in (None, ''):
+        return Config.PAGE_SIZE_DEFAULT
+
+    try:
+        limit = int(value)
+    except (ValueError, TypeError):
+        raise ValueError('limit must be a number')
+
+    if limit < 1:
+        raise ValueError('limit must be at least 1')
+    return min(limit, Config.PAGE_SIZE_MAX)
+
+def ndjson_lines(records):
+    """Serialize records lazily as newline-delimited JSON"""
+    for record in records:
+        yield json.dumps(record, separators=(',', ':'), default=str) + '\n'
+
+def csv_lines(rows, fields):
+    """Serialize dict rows lazily as CSV, header first"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction='ignore')
+
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+
+    # Only reached with no rows, when the header is still buffered
+    if buffer.getvalue():
+        yield buffer.getvalue()
+
+def iter_by_key(ref, page_size):
+    """Yield (key, value) pairs under a reference, reading one key-ordered page at a time"""
+    last_key = None
+    while True:
+        query = ref.order_by_key()
+        if last_key is not None:
+            # start_at is inclusive, so ask for one extra to skip the last key seen
+            query = query.start_at(last_key)
+        page = query.limit_to_first(page_size + (1 if last_key is not None else 0)).get() or {}
+
+        items = [(key, value) for key, value in page.items() if key != last_key]
+        if not items:
+            return
+
+        yield from items
+        last_key = items[-1][0]
@@ -0,0 +1,94 @@
+import cProfile
+import datetime
+import os
+import re
+import threading
+import tracemalloc
+from config import Config
+
+# cProfile can't run two profilers at once on Python 3.12+, and one at a time bounds the overhead
+_cpu_lock = threading.Lock()
+
+def dump_path(kind, label, extension):
+    """New file under PROFILE_DIR, named so dumps sort by time and group by worker and label"""
+    os.makedirs(Config.PROFILE_DIR, exist_ok=True)
+    stamp = datetime.datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')
+    label = re.sub(r'[^A-Za-z0-9_.-]', '_', label or 'unknown')
+    return os.path.join(Config.PROFILE_DIR, f'{kind}-{stamp}-{os.getpid()}-{label}.{extension}')
+
+def resolve_dump(name):
+    """Path of a dump in PROFILE_DIR; only bare file names are accepted"""
+    if not name or os.path.basename(name) != name:
+        raise ValueError('Invalid profile name')
+    path = os.path.join(Config.PROFILE_DIR, name)
+    if not os.path.isfile(path):
+        raise ValueError(f'Profile {name} not found')
+    return path
+
+class CpuProfile:
+    """cProfile run covering one request, skipped while another is running"""
+
+    def __init__(self):
+        self.profile = None
+
+    def start(self):
+        if not _cpu_lock.acquire(blocking=False):
+            return False
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+        return True
+
+    def stop(self, label=None):
+        """Stop profiling; with a label the stats are dumped and their path returned"""
+        if self.profile is None:
+            return None
+        profile, self.profile = self.profile, None
+        profile.disable()
+        _cpu_lock.release()
+        if label is None:
+            return None
+        path = dump_path('cpu', label, 'prof')
+        profile.dump_stats(path)
+        return path
+
+def take_memory_snapshot(label=None):
+    """Dump a tracemalloc snapshot of this process, starting tracing first if needed
+
+    Only allocations made after tracing starts are seen, so the first
+    snapshot of a session is the baseline for later ones.
+    """
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start(Config.PROFILE_TRACEMALLOC_FRAMES)
+    path = dump_path('memory', label, 'snap')
+    tracemalloc.take_snapshot().dump(path)
+    current, peak = tracemalloc.get_traced_memory()
+    return {
+        'snapshot': os.path.basename(path),
+        'tracing_started': started,
+        'traced_bytes': current,
+        'peak_traced_bytes': peak
+    }
+
+def memory_diff(before_path, after_path, top=20, key_type='lineno'):
+    """Largest allocation changes between two snapshots, largest first"""
+    before = _filtered(tracemalloc.Snapshot.load(before_path))
+    after = _filtered(tracemalloc.Snapshot.load(after_path))
+    return [
+        {
+            'location': str(stat.traceback),
+            'size_diff': stat.size_diff,
+            'size': stat.size,
+            'count_diff': stat.count_diff,
+            'count': stat.count
+        }
+        for stat in after.compare_to(before, key_type)[:top]
+    ]
+
+def _filtered(snapshot):
+    # tracemalloc's own bookkeeping and import machinery only add noise
+    return snapshot.filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>')
+    ])
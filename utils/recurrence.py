@@ -0,0 +1,59 @@
+import datetime
+
+FREQUENCIES = ('daily', 'weekly')
+WEEKDAY_NAMES = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+
+def parse_weekdays(weekdays):
+    """Normalize weekday names ('mon') or numbers (0 = Monday) to sorted numbers"""
+    days = set()
+    for day in weekdays:
+        # bool is an int subclass, but True/False are not weekdays
+        if isinstance(day, int) and not isinstance(day, bool) and 0 <= day <= 6:
+            days.add(day)
+        elif isinstance(day, str) and day.strip().lower()[:3] in WEEKDAY_NAMES:
+            days.add(WEEKDAY_NAMES.index(day.strip().lower()[:3]))
+        else:
+            raise ValueError(f"Invalid weekday: {day}")
+    return sorted(days)
+
+def expand_occurrences(start_dt, end_dt, frequency, until_dt, interval=1, weekdays=None, max_occurrences=100):
+    """Expand a recurrence rule into (start, end) windows in chronological order
+
+    daily repeats every `interval` days. weekly repeats every `interval`
+    weeks on the given weekdays, or on the first window's weekday when
+    none are given. Occurrences start no later than until_dt.
+    """
+    if frequency not in FREQUENCIES:
+        raise ValueError(f"Invalid frequency. Must be one of: {list(FREQUENCIES)}")
+
+    if interval < 1:
+        raise ValueError("Interval must be at least 1")
+
+    if until_dt < start_dt:
+        raise ValueError("Recurrence end date must be after the first booking")
+
+    duration = end_dt - start_dt
+    occurrences = []
+
+    if frequency == 'daily':
+        step = datetime.timedelta(days=interval)
+        current = start_dt
+        while current <= until_dt:
+            occurrences.append((current, current + duration))
+            if len(occurrences) > max_occurrences:
+                break
+            current += step
+    else:
+        days = parse_weekdays(weekdays) if weekdays else [start_dt.weekday()]
+        week_start = start_dt - datetime.timedelta(days=start_dt.weekday())
+        while week_start <= until_dt and len(occurrences) <= max_occurrences:
+            for day in days:
+                current = week_start + datetime.timedelta(days=day)
+                if start_dt <= current <= until_dt:
+                    occurrences.append((current, current + duration))
+            week_start += datetime.timedelta(weeks=interval)
+
+    if len(occurrences) > max_occurrences:
+        raise ValueError(f"Recurrence expands to more than {max_occurrences} bookings")
+
+    return occurrences
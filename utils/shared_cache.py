@@ -0,0 +1,127 @@
+from collections import namedtuple
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from config import Config
+import logging
+
+logger = logging.getLogger(__name__)
+
+CacheEntry = namedtuple('CacheEntry', ['value', 'version', 'stored_at'])
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS entries (
+        namespace TEXT NOT NULL,
+        key TEXT NOT NULL,
+        version INTEGER NOT NULL,
+        stored_at REAL NOT NULL,
+        value BLOB NOT NULL,
+        PRIMARY KEY (namespace, key)
+    )""",
+    """CREATE TABLE IF NOT EXISTS generations (
+        namespace TEXT NOT NULL,
+        key TEXT NOT NULL,
+        generation INTEGER NOT NULL,
+        PRIMARY KEY (namespace, key)
+    )"""
+]
+
+class SharedCache:
+    """Cache shared by every worker process on a host, stored in SQLite in WAL mode
+
+    Each entry carries the version of the data it was built from, and
+    readers ask for the version they expect, so an outdated entry is never
+    served. An invalidation bumps a generation counter that the other
+    workers check on their next lookup. Storage errors are logged and
+    treated as misses; the cache never fails a request.
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = self._connection()
+        with connection:
+            for statement in SCHEMA:
+                connection.execute(statement)
+
+    @classmethod
+    def get_default(cls):
+        """Process-wide cache at SHARED_CACHE_PATH, or None when it is disabled or unusable"""
+        if not Config.SHARED_CACHE_PATH:
+            return None
+        with cls._instance_lock:
+            if cls._instance is None:
+                try:
+                    cls._instance = cls(Config.SHARED_CACHE_PATH)
+                except (sqlite3.Error, OSError) as e:
+                    logger.warning(f"Shared cache disabled, {Config.SHARED_CACHE_PATH} is unusable: {str(e)}")
+                    cls._instance = False
+            return cls._instance or None
+
+    def get(self, namespace, key, version=None):
+        """Entry stored under the key, or None if missing or built from another version"""
+        try:
+            row = self._connection().execute(
+                'SELECT value, version, stored_at FROM entries WHERE namespace = ? AND key = ?', (namespace, key)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache read failed for {namespace}/{key}: {str(e)}")
+            return None
+        if row is None or (version is not None and row[1] != version):
+            return None
+        return CacheEntry(json.loads(zlib.decompress(row[0])), row[1], row[2])
+
+    def set(self, namespace, key, value, version, stored_at=None):
+        """Store a value built from the given version, replacing the previous entry"""
+        blob = zlib.compress(json.dumps(value, separators=(',', ':'), default=str).encode('utf-8'))
+        try:
+            with self._connection() as connection:
+                connection.execute(
+                    'INSERT OR REPLACE INTO entries (namespace, key, version, stored_at, value) VALUES (?, ?, ?, ?, ?)',
+                    (namespace, key, version, stored_at or time.time(), blob)
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache write failed for {namespace}/{key}: {str(e)}")
+
+    def invalidate(self, namespace, key):
+        """Drop an entry and tell every worker it changed"""
+        try:
+            with self._connection() as connection:
+                connection.execute('DELETE FROM entries WHERE namespace = ? AND key = ?', (namespace, key))
+                connection.execute(
+                    'INSERT INTO generations (namespace, key, generation) VALUES (?, ?, 1) '
+                    'ON CONFLICT (namespace, key) DO UPDATE SET generation = generation + 1',
+                    (namespace, key)
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache invalidation failed for {namespace}/{key}: {str(e)}")
+
+    def generation(self, namespace, key):
+        """Invalidation counter of a key; compare it with the last one seen to spot other workers' changes"""
+        try:
+            row = self._connection().execute(
+                'SELECT generation FROM generations WHERE namespace = ? AND key = ?', (namespace, key)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache generation read failed for {namespace}/{key}: {str(e)}")
+            return None
+        return row[0] if row else 0
+
+    def _connection(self):
+        """This thread's connection; SQLite connections can't be shared between threads or forks"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=Config.SHARED_CACHE_TIMEOUT_SECONDS)
+            connection.execute('PRAGMA journal_mode=WAL')
+            # WAL with NORMAL sync loses at most the last commits on power loss, which a cache can afford
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return connection
@@ -0,0 +1,22 @@
+import time
+
+class StartupTimer:
+    """Durations of the startup phases, timed from when this module is first imported"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._last_mark = self.started
+        self.phases = {}
+
+    def mark(self, phase):
+        """Close a phase that ran since the previous mark"""
+        now = time.perf_counter()
+        self.phases[phase] = round((now - self._last_mark) * 1000, 1)
+        self._last_mark = now
+
+    def summary(self):
+        """Phase durations in milliseconds, plus the total so far"""
+        return dict(self.phases, total=round((time.perf_counter() - self.started) * 1000, 1))
+
+# Imported first by app.py, so 'imports' covers loading Flask, the services and the routes
+startup_timer = StartupTimer()
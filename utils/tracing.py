@@ -0,0 +1,60 @@
+from contextvars import ContextVar
+import json
+from config import Config
+
+_current_trace = ContextVar('request_trace', default=None)
+
+class RequestTrace:
+    """Backend calls made while handling one request, summed per backend and operation"""
+
+    def __init__(self):
+        self.operations = {}
+        self.calls = 0
+        self.seconds = 0.0
+        self.bytes = 0
+
+    def record(self, backend, operation, seconds, size=0):
+        entry = self.operations.setdefault(f'{backend}.{operation}', {'count': 0, 'ms': 0.0, 'bytes': 0})
+        entry['count'] += 1
+        entry['ms'] += seconds * 1000
+        entry['bytes'] += size
+        self.calls += 1
+        self.seconds += seconds
+        self.bytes += size
+
+    def by_backend(self):
+        """Calls, milliseconds and bytes per backend"""
+        totals = {}
+        for key, entry in self.operations.items():
+            backend = key.split('.', 1)[0]
+            total = totals.setdefault(backend, {'count': 0, 'ms': 0.0, 'bytes': 0})
+            for field in ['count', 'ms', 'bytes']:
+                total[field] += entry[field]
+        return totals
+
+    def summary(self):
+        return {
+            'calls': self.calls,
+            'ms': round(self.seconds * 1000, 2),
+            'bytes': self.bytes,
+            'operations': {
+                key: dict(entry, ms=round(entry['ms'], 2)) for key, entry in sorted(self.operations.items())
+            }
+        }
+
+def start_trace():
+    """Begin tracing the current request; returns the trace and a token for end_trace"""
+    trace = RequestTrace()
+    return trace, _current_trace.set(trace)
+
+def end_trace(token):
+    _current_trace.reset(token)
+
+def current_trace():
+    return _current_trace.get()
+
+def payload_size(value):
+    """Approximate wire size of a JSON payload, or 0 when not measured"""
+    if value is None or not Config.TRACE_MEASURE_BYTES or current_trace() is None:
+        return 0
+    return len(json.dumps(value, separators=(',', ':'), default=str))